@@ -0,0 +1,145 @@
+# Ethyïos
+# Armazenamento do modelo DOCX importado: o arquivo .docx original é guardado
+# como está (modelo.docx) junto de um manifesto pequeno (modelo.json) com o
+# hash do conteúdo, o nome original e os placeholders encontrados. O manifesto
+# permite saber se o modelo mudou sem reler o .docx; se o próprio .docx mudar
+# (mtime ou tamanho), ele é relido e o hash é recalculado a partir dos bytes.
+# O formato antigo (declaracao_base_bytes.py com DOCX_BYTES) continua sendo
+# lido e é migrado automaticamente.
+import os
+import sys
+import json
+import hashlib
+import datetime
+import importlib.util
+import saida_atomica
+
+MODEL_DOCX_BASENAME = "modelo.docx"
+MANIFEST_BASENAME = "modelo.json"
+LEGACY_MODEL_BASENAME = "declaracao_base_bytes.py"
+LEGACY_MODULE_NAME = "declaracao_base_bytes_dinamico" # Nome único para evitar conflitos
+
+
+def calcular_hash(conteudo):
+    return hashlib.sha256(conteudo).hexdigest()
+
+def salvar_modelo(pasta_modelo, docx_bytes, nome_original, placeholders=()):
+    """
+    Grava o blob do modelo e o manifesto em 'pasta_modelo'. O blob é gravado
+    antes do manifesto: um manifesto sempre descreve um blob completo.
+    'placeholders' é a lista de marcadores presentes no modelo. Retorna o manifesto gravado.
+    """
+    os.makedirs(pasta_modelo, exist_ok=True)
+    manifesto = {
+        "hash": calcular_hash(docx_bytes),
+        "nome_original": os.path.basename(nome_original),
+        "tamanho": len(docx_bytes),
+        "placeholders": list(placeholders),
+        "importado_em": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+    saida_atomica.substituir(os.path.join(pasta_modelo, MODEL_DOCX_BASENAME), docx_bytes)
+    saida_atomica.substituir(os.path.join(pasta_modelo, MANIFEST_BASENAME),
+                           json.dumps(manifesto, ensure_ascii=False, indent=2).encode("utf-8"))
+    return manifesto
+
+def ler_manifesto(pasta_modelo):
+    """Retorna o manifesto do modelo armazenado, ou None se não houver."""
+    caminho = os.path.join(pasta_modelo, MANIFEST_BASENAME)
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def ler_blob(caminho_docx):
+    """Lê o arquivo .docx inteiro (uma única leitura para um objeto bytes)."""
+    with open(caminho_docx, "rb") as f:
+        return f.read()
+
+def assinatura_blob(pasta_modelo):
+    """(mtime, tamanho) do modelo.docx em 'pasta_modelo', ou None se ele não existe."""
+    try:
+        info = os.stat(os.path.join(pasta_modelo, MODEL_DOCX_BASENAME))
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return (info.st_mtime_ns, info.st_size)
+
+def ler_modelo_legado(caminho_py):
+    """Lê DOCX_BYTES de um declaracao_base_bytes.py do formato antigo."""
+    spec = importlib.util.spec_from_file_location(LEGACY_MODULE_NAME, caminho_py)
+    if spec is None:
+        raise ImportError(f"Não foi possível encontrar o spec para {LEGACY_MODULE_NAME} em {caminho_py}")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[LEGACY_MODULE_NAME] = module # Adiciona ao sys.modules ANTES de executar
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        del sys.modules[LEGACY_MODULE_NAME] # Não mantém o literal de bytes vivo no sys.modules
+    return module.DOCX_BYTES
+
+
+class ModeloArmazenado:
+    """
+    Bytes do modelo carregado, o manifesto que os descreve e a assinatura do
+    blob lido (ver assinatura_blob; None para o formato antigo).
+    """
+
+    def __init__(self, docx_bytes, manifesto, assinatura=None):
+        self.docx_bytes = docx_bytes
+        self.manifesto = manifesto
+        self.assinatura = assinatura
+
+    @property
+    def hash(self):
+        return self.manifesto["hash"]
+
+
+def carregar_modelo(pasta_modelo, extrair_placeholders=None):
+    """
+    Carrega o modelo de 'pasta_modelo'. Usa o blob + manifesto quando existem;
+    caso contrário lê o formato antigo (.py) e o migra para o novo formato.
+    'extrair_placeholders(docx_bytes)', se informado, preenche o manifesto na migração.
+    Lança FileNotFoundError se não houver modelo, e ImportError/AttributeError
+    se o arquivo antigo estiver inválido.
+    """
+    manifesto = ler_manifesto(pasta_modelo)
+    caminho_docx = os.path.join(pasta_modelo, MODEL_DOCX_BASENAME)
+    if manifesto is not None and os.path.exists(caminho_docx):
+        assinatura = assinatura_blob(pasta_modelo) # Antes de ler: uma troca durante a leitura é vista depois
+        docx_bytes = ler_blob(caminho_docx)
+        hash_blob = calcular_hash(docx_bytes)
+        if manifesto.get("hash") != hash_blob:
+            # O .docx foi trocado sem passar pela importação: vale o conteúdo, não o manifesto
+            manifesto = dict(manifesto, hash=hash_blob, tamanho=len(docx_bytes))
+            if extrair_placeholders:
+                manifesto["placeholders"] = list(extrair_placeholders(docx_bytes))
+        return ModeloArmazenado(docx_bytes, manifesto, assinatura)
+
+    caminho_legado = os.path.join(pasta_modelo, LEGACY_MODEL_BASENAME)
+    if not os.path.exists(caminho_legado):
+        raise FileNotFoundError(caminho_docx)
+    docx_bytes = ler_modelo_legado(caminho_legado)
+    placeholders = extrair_placeholders(docx_bytes) if extrair_placeholders else ()
+    try:
+        manifesto = salvar_modelo(pasta_modelo, docx_bytes, LEGACY_MODEL_BASENAME, placeholders)
+    except OSError:
+        # Pasta somente leitura: usa o modelo antigo sem migrar
+        manifesto = {"hash": calcular_hash(docx_bytes), "nome_original": LEGACY_MODEL_BASENAME,
+                     "tamanho": len(docx_bytes), "placeholders": list(placeholders)}
+    return ModeloArmazenado(docx_bytes, manifesto)
+
+def carregar_se_mudou(pasta_modelo, hash_atual, extrair_placeholders=None, assinatura_atual=None):
+    """
+    Retorna None se o modelo ainda tem o hash 'hash_atual', ou o novo
+    ModeloArmazenado caso contrário. O .docx só deixa de ser relido quando o
+    manifesto traz 'hash_atual' e o blob tem a mesma assinatura de quando foi
+    lido ('assinatura_atual', ver ModeloArmazenado.assinatura); se o blob
+    mudou, o hash é recalculado a partir dos bytes.
+    """
+    manifesto = ler_manifesto(pasta_modelo)
+    if manifesto is not None and hash_atual is not None and manifesto.get("hash") == hash_atual \
+            and assinatura_atual is not None and assinatura_blob(pasta_modelo) == assinatura_atual:
+        return None
+    modelo = carregar_modelo(pasta_modelo, extrair_placeholders)
+    if hash_atual is not None and modelo.hash == hash_atual:
+        return None
+    return modelo
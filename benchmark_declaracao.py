@@ -0,0 +1,280 @@
+# Ethyïos
+# Benchmark do pipeline de geração, etapa por etapa, sobre modelos sintéticos
+# de tamanho crescente (muitos parágrafos, tabelas grandes, imagens).
+# Mede, para cada modelo: carga do modelo armazenado, Document() do
+# python-docx, apply_replacements, doc.save, compilação e renderização OOXML,
+# conversão e gravação do PDF; e a vazão de lotes (sequencial e com
+# processos). Os resultados podem ser guardados como referência, e as
+# execuções seguintes apontam as etapas que ficaram mais lentas.
+#
+#   python benchmark_declaracao.py --salvar-referencia   # grava a referência
+#   python benchmark_declaracao.py                       # compara com ela
+import io
+import os
+import sys
+import json
+import time
+import struct
+import zlib
+import shutil
+import argparse
+import platform
+import tempfile
+import datetime
+import tracemalloc
+import armazenamento_modelo
+import saida_atomica
+import motor_declaracao
+from conversores import CONVERSORES, obter_conversor
+
+REFERENCIA_PADRAO = "benchmark_referencia.json"
+TOLERANCIA_PADRAO = 0.25 # Aumento relativo da mediana considerado regressão
+DIFERENCA_MINIMA_MS = 1.0 # Etapas muito curtas oscilam mais que isso por ruído
+REGISTRO_EXEMPLO = {
+    "nome_responsavel": "Maria Aparecida da Silva",
+    "nome_filho": "João Pedro da Silva",
+    "serie": "5º ano B",
+    "data": "08/05/2025",
+    "periodo": "matutino",
+}
+TEXTO_DECLARACAO = ("Declaramos, para os devidos fins, que {{NOME_RESPONSAVEL}} esteve presente nesta "
+                    "instituição no dia {{DATA}}, no período {{PERIODO}}, acompanhando {{NOME_FILHO}}, "
+                    "aluno(a) do {{SERIE}}.")
+
+
+# --- Modelos sintéticos ---
+
+def _png_ruido(largura, altura):
+    """PNG RGB de ruído (praticamente incompressível), sem depender de bibliotecas de imagem."""
+    def bloco(tipo, dados):
+        return struct.pack(">I", len(dados)) + tipo + dados + struct.pack(">I", zlib.crc32(tipo + dados))
+    linhas = b"".join(b"\x00" + os.urandom(largura * 3) for _ in range(altura))
+    return (b"\x89PNG\r\n\x1a\n" + bloco(b"IHDR", struct.pack(">IIBBBBB", largura, altura, 8, 2, 0, 0, 0))
+            + bloco(b"IDAT", zlib.compress(linhas, 1)) + bloco(b"IEND", b""))
+
+def gerar_modelo_sintetico(paragrafos=10, linhas_tabela=0, imagens=0):
+    """
+    Monta um modelo .docx com os placeholders da declaração: 'paragrafos'
+    parágrafos de texto (um terço com placeholders), uma tabela com
+    'linhas_tabela' linhas e 'imagens' imagens de 512x512.
+    """
+    from docx import Document
+    from docx.shared import Cm
+    documento = Document()
+    documento.sections[0].header.paragraphs[0].text = "Escola Municipal - {{SERIE}}"
+    for numero in range(paragrafos):
+        documento.add_paragraph(TEXTO_DECLARACAO if numero % 3 == 0 else
+                                f"Parágrafo {numero} de conteúdo fixo do modelo, sem marcadores.")
+    if linhas_tabela:
+        tabela = documento.add_table(rows=linhas_tabela, cols=4)
+        for numero, linha in enumerate(tabela.rows):
+            linha.cells[0].text = "{{NOME_FILHO}}" if numero % 10 == 0 else f"Linha {numero}"
+            linha.cells[1].text = "{{DATA}}"
+            linha.cells[2].text = "texto fixo"
+            linha.cells[3].text = str(numero)
+    for _ in range(imagens):
+        documento.add_picture(io.BytesIO(_png_ruido(512, 512)), width=Cm(4))
+    saida = io.BytesIO()
+    documento.save(saida)
+    return saida.getvalue()
+
+MODELOS_SINTETICOS = {
+    "pequeno": dict(paragrafos=10),
+    "paragrafos": dict(paragrafos=2000),
+    "tabela": dict(paragrafos=10, linhas_tabela=500),
+    "imagens": dict(paragrafos=10, imagens=8),
+}
+
+
+# --- Medição ---
+
+def medir(funcao, repeticoes, preparar=None):
+    """
+    Executa 'funcao' 'repeticoes' vezes e retorna (medição, último resultado),
+    com a mediana do tempo em ms e o pico de memória em KiB. Se 'preparar' for
+    informado, cada execução recebe um preparar() novo, feito fora da medição.
+    O pico é medido em uma execução à parte, com tracemalloc, para não distorcer os tempos.
+    """
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        argumentos = (preparar(),) if preparar else ()
+        inicio = time.perf_counter()
+        resultado = funcao(*argumentos)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    argumentos = (preparar(),) if preparar else ()
+    tracemalloc.start()
+    try:
+        funcao(*argumentos)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    tempos.sort()
+    return {"mediana_ms": round(tempos[len(tempos) // 2], 3), "pico_kib": round(pico / 1024, 1)}, resultado
+
+def medir_etapas(docx_bytes, conversor, repeticoes, pasta):
+    """Mede cada etapa do pipeline para um modelo. Retorna {etapa: medição}."""
+    from modelo_compilado import abrir_documento
+    etapas = {}
+    substituicoes = motor_declaracao.montar_substituicoes(REGISTRO_EXEMPLO)
+
+    # Carga do modelo armazenado (o que a GUI faz ao abrir)
+    pasta_modelo = os.path.join(pasta, "modelo")
+    armazenamento_modelo.salvar_modelo(pasta_modelo, docx_bytes, "sintetico.docx")
+    etapas["carregar_modelo"], _ = medir(lambda: motor_declaracao.carregar_modelo_armazenado(pasta_modelo),
+                                         repeticoes)
+
+    # Pipeline python-docx (renderizador "python-docx" e apply_replacements original)
+    etapas["document_parse"], _ = medir(lambda: abrir_documento(docx_bytes), repeticoes)
+    etapas["apply_replacements"], documento = medir(
+        lambda documento: motor_declaracao.apply_replacements(documento, substituicoes) or documento,
+        repeticoes, preparar=lambda: abrir_documento(docx_bytes))
+    etapas["doc_save"], _ = medir(lambda: documento.save(io.BytesIO()), repeticoes)
+
+    # Pipeline padrão (renderizador OOXML)
+    motor_declaracao._modelos_compilados.clear() # Força a compilação a cada repetição
+    etapas["compilar_ooxml"], _ = medir(
+        lambda: motor_declaracao._classe_renderizador("ooxml")(docx_bytes, motor_declaracao.PLACEHOLDERS.values()),
+        repeticoes)
+    modelo = motor_declaracao.compilar_modelo(docx_bytes)
+    etapas["renderizar_ooxml"], docx_preenchido = medir(lambda: modelo.renderizar_bytes(substituicoes), repeticoes)
+
+    etapas["converter"], pdf_bytes = medir(lambda: conversor.converter_bytes(docx_preenchido), repeticoes)
+    pasta_saida = os.path.join(pasta, "saida")
+    etapas["gravar_pdf"], _ = medir(
+        lambda: saida_atomica.publicar(pasta_saida, "Declaracao_benchmark", ".pdf", pdf_bytes), repeticoes)
+    return etapas
+
+def medir_lotes(docx_bytes, nome_conversor, registros, processos, pasta):
+    """Vazão (declarações/s) de um lote sequencial no processo e de um lote com processos."""
+    lista = [dict(REGISTRO_EXEMPLO, nome_filho=f"Aluno {numero}") for numero in range(registros)]
+    resultados = {}
+
+    pasta_saida = os.path.join(pasta, "lote_sequencial")
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        for registro in lista:
+            motor_declaracao.gerar_documento_pdf(docx_bytes, registro, pasta_saida,
+                                                 conversor=nome_conversor, cache=False)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    duracao = time.perf_counter() - inicio
+    resultados["sequencial"] = {"declaracoes_por_s": round(registros / duracao, 2), "pico_kib": round(pico / 1024, 1)}
+
+    pasta_saida = os.path.join(pasta, "lote_processos")
+    inicio = time.perf_counter()
+    falhas = [r for r in motor_declaracao.gerar_lote(lista, docx_bytes, pasta_saida, processos,
+                                                     conversor=nome_conversor, usar_cache=False)
+              if not r.sucesso]
+    duracao = time.perf_counter() - inicio
+    if falhas:
+        raise RuntimeError(f"Lote com falhas: {falhas[0].erro}")
+    resultados["processos"] = {"declaracoes_por_s": round(registros / duracao, 2), "processos": processos}
+    try:
+        import resource # Indisponível no Windows
+        resultados["processos"]["pico_rss_filhos_kib"] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    except ImportError:
+        pass
+    return resultados
+
+
+# --- Referência ---
+
+def comparar(atual, referencia, tolerancia):
+    """Lista as medições de 'atual' mais lentas que a referência além da tolerância."""
+    regressoes = []
+    for modelo, etapas in atual["etapas"].items():
+        for etapa, medicao in etapas.items():
+            anterior = referencia.get("etapas", {}).get(modelo, {}).get(etapa)
+            if anterior and medicao["mediana_ms"] > anterior["mediana_ms"] * (1 + tolerancia) \
+                    and medicao["mediana_ms"] - anterior["mediana_ms"] > DIFERENCA_MINIMA_MS:
+                regressoes.append(f"{modelo}/{etapa}: {anterior['mediana_ms']} ms -> {medicao['mediana_ms']} ms")
+    for modelo, lotes in atual["lotes"].items():
+        for tipo, medicao in lotes.items():
+            anterior = referencia.get("lotes", {}).get(modelo, {}).get(tipo)
+            if anterior and medicao["declaracoes_por_s"] < anterior["declaracoes_por_s"] / (1 + tolerancia):
+                regressoes.append(f"{modelo}/lote_{tipo}: {anterior['declaracoes_por_s']} -> "
+                                  f"{medicao['declaracoes_por_s']} declarações/s")
+    return regressoes
+
+def imprimir(resultado):
+    for modelo, etapas in resultado["etapas"].items():
+        print(f"\n{modelo} ({resultado['tamanhos_kib'][modelo]} KiB)")
+        for etapa, medicao in etapas.items():
+            print(f"  {etapa:<20} {medicao['mediana_ms']:>10.3f} ms  pico {medicao['pico_kib']:>10.1f} KiB")
+        for tipo, medicao in resultado["lotes"].get(modelo, {}).items():
+            print(f"  lote {tipo:<15} {medicao['declaracoes_por_s']:>10.2f} declarações/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark por etapa do pipeline de geração de declarações.")
+    parser.add_argument("--modelos", default=",".join(MODELOS_SINTETICOS),
+                        help="Modelos sintéticos a medir, separados por vírgula (padrão: %(default)s).")
+    parser.add_argument("--repeticoes", type=int, default=5, help="Repetições por etapa (padrão: %(default)s).")
+    parser.add_argument("--registros", type=int, default=20, help="Declarações por lote (padrão: %(default)s; 0 pula os lotes).")
+    parser.add_argument("--processos", type=int, default=2, help="Processos do lote paralelo (padrão: %(default)s).")
+    parser.add_argument("--conversor", choices=sorted(CONVERSORES), default="falso",
+                        help="Backend de conversão medido (padrão: %(default)s, que isola o custo do próprio código).")
+    parser.add_argument("--referencia", default=REFERENCIA_PADRAO, help="Arquivo de referência (padrão: %(default)s).")
+    parser.add_argument("--salvar-referencia", action="store_true", help="Grava os resultados como nova referência.")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_PADRAO,
+                        help="Aumento relativo tolerado antes de acusar regressão (padrão: %(default)s).")
+    parser.add_argument("--saida-json", default=None, help="Grava os resultados desta execução em JSON.")
+    args = parser.parse_args(argv)
+
+    nomes = [nome.strip() for nome in args.modelos.split(",") if nome.strip()]
+    desconhecidos = [nome for nome in nomes if nome not in MODELOS_SINTETICOS]
+    if desconhecidos:
+        parser.error(f"Modelos desconhecidos: {', '.join(desconhecidos)}")
+
+    conversor = obter_conversor(args.conversor)
+    resultado = {
+        "data": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "conversor": args.conversor,
+        "tamanhos_kib": {}, "etapas": {}, "lotes": {},
+    }
+    pasta = tempfile.mkdtemp(prefix="declaracoes_benchmark_")
+    # O cache de PDFs e o PDF base do modo carimbo ficam na pasta temporária, não na da aplicação
+    motor_declaracao.get_application_path = lambda: pasta
+    try:
+        for nome in nomes:
+            print(f"Medindo '{nome}'...", file=sys.stderr)
+            docx_bytes = gerar_modelo_sintetico(**MODELOS_SINTETICOS[nome])
+            resultado["tamanhos_kib"][nome] = round(len(docx_bytes) / 1024, 1)
+            resultado["etapas"][nome] = medir_etapas(docx_bytes, conversor, args.repeticoes,
+                                                     os.path.join(pasta, nome))
+            if args.registros > 0:
+                resultado["lotes"][nome] = medir_lotes(docx_bytes, args.conversor, args.registros,
+                                                       args.processos, os.path.join(pasta, nome))
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    imprimir(resultado)
+    if args.saida_json:
+        with open(args.saida_json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+    if args.salvar_referencia:
+        saida_atomica.substituir(args.referencia, json.dumps(resultado, ensure_ascii=False, indent=2).encode("utf-8"))
+        print(f"\nReferência gravada em '{args.referencia}'.")
+        return 0
+    if not os.path.exists(args.referencia):
+        print(f"\nSem referência em '{args.referencia}'; use --salvar-referencia para criá-la.")
+        return 0
+    with open(args.referencia, "r", encoding="utf-8") as f:
+        referencia = json.load(f)
+    regressoes = comparar(resultado, referencia, args.tolerancia)
+    if regressoes:
+        print(f"\nRegressões em relação a '{args.referencia}' (tolerância {args.tolerancia:.0%}):")
+        for regressao in regressoes:
+            print(f"  {regressao}")
+        return 1
+    print(f"\nSem regressões em relação a '{args.referencia}' ({referencia.get('data')}).")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
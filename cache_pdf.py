@@ -0,0 +1,143 @@
+# Ethyïos
+# Cache dos PDFs já gerados, endereçado pelo conteúdo: a chave é o hash do
+# modelo mais os valores preenchidos, então a reemissão de uma declaração
+# idêntica devolve o PDF guardado sem renderizar nem converter de novo.
+# Os PDFs ficam em uma pasta (um arquivo por chave) com limite de tamanho em
+# disco; ao passar do limite, os menos usados recentemente (mtime) são removidos.
+import os
+import json
+import hashlib
+import threading
+import saida_atomica
+
+LIMITE_PADRAO_MB = 200
+VARIAVEL_LIMITE = "DECLARACAO_CACHE_MB" # 0 desativa o cache
+_SUFIXO = ".pdf"
+
+
+def limite_configurado():
+    """Limite do cache em bytes, lido de DECLARACAO_CACHE_MB (padrão: LIMITE_PADRAO_MB)."""
+    try:
+        megabytes = float(os.environ.get(VARIAVEL_LIMITE, LIMITE_PADRAO_MB))
+    except ValueError:
+        megabytes = LIMITE_PADRAO_MB
+    return max(0, int(megabytes * 1024 * 1024))
+
+def chave_cache(hash_modelo, substituicoes, variante=""):
+    """
+    Chave de um PDF: hash do modelo, valores de 'substituicoes' (já normalizados)
+    e 'variante' (modo/conversor, que também mudam o PDF produzido).
+    """
+    itens = sorted((placeholder, str(valor)) for placeholder, valor in substituicoes.items())
+    texto = json.dumps([hash_modelo, variante, itens], ensure_ascii=False)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+class CachePdf:
+    """
+    PDFs guardados em 'pasta', até 'limite_bytes' no total (0 desativa o cache).
+    Os contadores 'acertos', 'falhas' e 'remocoes' são do processo atual.
+    Vários processos podem usar a mesma pasta: as gravações são atômicas.
+    """
+
+    def __init__(self, pasta, limite_bytes=None):
+        self.pasta = pasta
+        self.limite_bytes = limite_configurado() if limite_bytes is None else limite_bytes
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+        self._trava = threading.Lock()
+        self._tamanho_total = None # Calculado na primeira gravação
+
+    @property
+    def ativo(self):
+        return self.limite_bytes > 0
+
+    def _caminho(self, chave):
+        return os.path.join(self.pasta, chave + _SUFIXO)
+
+    def _entradas(self):
+        """Lista (mtime, tamanho, caminho) dos PDFs guardados."""
+        entradas = []
+        try:
+            nomes = os.listdir(self.pasta)
+        except FileNotFoundError:
+            return entradas
+        for nome in nomes:
+            if not nome.endswith(_SUFIXO):
+                continue
+            caminho = os.path.join(self.pasta, nome)
+            try:
+                info = os.stat(caminho)
+            except FileNotFoundError: # Removido por outro processo
+                continue
+            entradas.append((info.st_mtime, info.st_size, caminho))
+        return entradas
+
+    def obter(self, chave):
+        """Retorna os bytes do PDF guardado para 'chave', ou None."""
+        if not self.ativo:
+            return None
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, "rb") as f:
+                dados = f.read()
+            os.utime(caminho) # Marca como usado recentemente
+        except FileNotFoundError:
+            with self._trava:
+                self.falhas += 1
+            return None
+        with self._trava:
+            self.acertos += 1
+        return dados
+
+    def guardar(self, chave, pdf_bytes):
+        """Guarda o PDF de 'chave' e remove os menos usados se o limite for ultrapassado."""
+        if not self.ativo or len(pdf_bytes) > self.limite_bytes:
+            return
+        os.makedirs(self.pasta, exist_ok=True)
+        saida_atomica.substituir(self._caminho(chave), pdf_bytes)
+        with self._trava:
+            if self._tamanho_total is None:
+                self._tamanho_total = sum(tamanho for _, tamanho, _ in self._entradas())
+            else:
+                self._tamanho_total += len(pdf_bytes)
+            if self._tamanho_total > self.limite_bytes:
+                self._podar()
+
+    def _podar(self):
+        # Relista a pasta: outros processos podem ter gravado ou removido entradas
+        entradas = sorted(self._entradas())
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        for _, tamanho, caminho in entradas:
+            if total <= self.limite_bytes:
+                break
+            try:
+                os.remove(caminho)
+                self.remocoes += 1
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+        self._tamanho_total = total
+
+    def limpar(self):
+        """Remove todos os PDFs guardados (ex.: quando um novo modelo é importado)."""
+        with self._trava:
+            for _, _, caminho in self._entradas():
+                try:
+                    os.remove(caminho)
+                except FileNotFoundError:
+                    pass
+            self._tamanho_total = 0
+
+    def estatisticas(self):
+        """Contadores do processo e ocupação atual da pasta."""
+        entradas = self._entradas()
+        return {
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "remocoes": self.remocoes,
+            "entradas": len(entradas),
+            "tamanho_bytes": sum(tamanho for _, tamanho, _ in entradas),
+            "limite_bytes": self.limite_bytes,
+        }
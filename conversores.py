@@ -0,0 +1,467 @@
+# Ethyïos
+# Backends de conversão DOCX -> PDF.
+# - "docx2pdf": Microsoft Word via docx2pdf (Windows/macOS), como antes.
+# - "libreoffice": LibreOffice headless mantido aberto e reutilizado entre conversões
+#   (ver ponte_libreoffice.py).
+# - "falso": gera um PDF simples no próprio processo, para testes e ambientes sem Office.
+import os
+import re
+import sys
+import html
+import json
+import time
+import queue
+import shutil
+import atexit
+import warnings
+import zipfile
+import tempfile
+import threading
+import subprocess
+
+
+PONTE_LIBREOFFICE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ponte_libreoffice.py")
+VARIAVEL_PYTHON_UNO = "DECLARACAO_PYTHON_UNO" # Python com o módulo 'uno', se não for encontrado sozinho
+
+
+class ErroConversao(Exception):
+    """Falha ao converter um documento DOCX em PDF."""
+
+
+def pasta_temporaria_base():
+    """
+    Pasta onde ficam os arquivos intermediários das conversões. Usa a memória
+    compartilhada (/dev/shm) quando existe, para não passar pelo disco; caso
+    contrário, a pasta temporária do sistema (nunca a pasta de saída).
+    """
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK | os.X_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+def pasta_temporaria_privada(prefixo="declaracoes_"):
+    """Cria uma pasta temporária exclusiva (visível só para o usuário atual) e retorna o TemporaryDirectory."""
+    return tempfile.TemporaryDirectory(prefix=prefixo, dir=pasta_temporaria_base())
+
+
+class Conversor:
+    """Interface comum dos conversores. Pode ser usado como gerenciador de contexto."""
+
+    nome = None
+
+    def converter(self, docx_path, pdf_path):
+        """Converte um único arquivo .docx em 'pdf_path'."""
+        raise NotImplementedError
+
+    def converter_varios(self, pares):
+        """
+        Converte vários arquivos. 'pares' é uma lista de (docx_path, pdf_path).
+        Backends que conseguem converter em uma única sessão sobrescrevem este método.
+        """
+        for docx_path, pdf_path in pares:
+            self.converter(docx_path, pdf_path)
+
+    def converter_bytes(self, docx_bytes):
+        """
+        Converte o .docx em memória e retorna os bytes do PDF. Os arquivos
+        intermediários ficam em uma pasta temporária privada, removida em seguida.
+        """
+        with pasta_temporaria_privada() as pasta:
+            docx_path = os.path.join(pasta, "declaracao.docx")
+            pdf_path = os.path.join(pasta, "declaracao.pdf")
+            with open(docx_path, "wb") as f:
+                f.write(docx_bytes)
+            self.converter(docx_path, pdf_path)
+            with open(pdf_path, "rb") as f:
+                return f.read()
+
+    def fechar(self):
+        """Libera os recursos do backend (processos, sessões)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+class ConversorDocx2Pdf(Conversor):
+    """Conversão via Microsoft Word (pacote docx2pdf)."""
+
+    nome = "docx2pdf"
+
+    def __init__(self):
+        from docx2pdf import convert # Importado só quando este backend é usado
+        self._convert = convert
+        self._threads_com = threading.local()
+
+    def _inicializar_com(self):
+        # No Windows, o Word é acessado via COM, que precisa ser inicializado
+        # em cada thread (a GUI converte em threads de segundo plano).
+        if sys.platform == "win32" and not getattr(self._threads_com, "iniciado", False):
+            import pythoncom
+            pythoncom.CoInitialize()
+            self._threads_com.iniciado = True
+
+    def converter(self, docx_path, pdf_path):
+        self._inicializar_com()
+        self._convert(docx_path, pdf_path)
+
+    def converter_varios(self, pares):
+        # docx2pdf converte uma pasta inteira em uma única sessão do Word
+        if len(pares) <= 1:
+            return super().converter_varios(pares)
+        with tempfile.TemporaryDirectory(prefix="declaracoes_docx2pdf_") as pasta:
+            entrada = os.path.join(pasta, "entrada")
+            saida = os.path.join(pasta, "saida")
+            os.makedirs(entrada)
+            os.makedirs(saida)
+            for indice, (docx_path, _) in enumerate(pares):
+                shutil.copyfile(docx_path, os.path.join(entrada, f"{indice:06d}.docx"))
+            self._inicializar_com()
+            self._convert(entrada, saida)
+            for indice, (_, pdf_path) in enumerate(pares):
+                shutil.move(os.path.join(saida, f"{indice:06d}.pdf"), pdf_path)
+
+
+def _localizar_soffice():
+    for candidato in ("soffice", "libreoffice"):
+        caminho = shutil.which(candidato)
+        if caminho:
+            return caminho
+    if sys.platform == "win32":
+        padrao = os.path.join(os.environ.get("PROGRAMFILES", r"C:\Program Files"),
+                              "LibreOffice", "program", "soffice.exe")
+        if os.path.exists(padrao):
+            return padrao
+    elif sys.platform == "darwin":
+        padrao = "/Applications/LibreOffice.app/Contents/MacOS/soffice"
+        if os.path.exists(padrao):
+            return padrao
+    return None
+
+def _localizar_python_uno(soffice):
+    """
+    Um Python capaz de importar 'uno', para executar a ponte com o LibreOffice:
+    o da variável DECLARACAO_PYTHON_UNO, o que acompanha o LibreOffice
+    (Windows/macOS) ou o python3 do sistema (pacote python3-uno). None se não houver.
+    """
+    programa = os.path.dirname(os.path.realpath(soffice))
+    candidatos = [os.environ.get(VARIAVEL_PYTHON_UNO),
+                  os.path.join(programa, "python.exe"), os.path.join(programa, "python"),
+                  os.path.join(programa, os.pardir, "Resources", "python")] # LibreOffice.app no macOS
+    if sys.platform != "win32":
+        candidatos.append(shutil.which("python3"))
+    for candidato in candidatos:
+        if not candidato or not os.path.isfile(candidato):
+            continue
+        try:
+            if subprocess.run([candidato, "-c", "import uno"], stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL, timeout=30).returncode == 0:
+                return candidato
+        except (OSError, subprocess.TimeoutExpired):
+            continue
+    return None
+
+
+class _PonteUno:
+    """
+    Processo 'ponte_libreoffice.py' executado por um Python com UNO: mantém um
+    único soffice aberto e converte os documentos pedidos pela entrada padrão.
+    """
+
+    def __init__(self, python, soffice, perfil_url, tempo_limite):
+        self.tempo_limite = tempo_limite
+        self._processo = subprocess.Popen([python, PONTE_LIBREOFFICE, soffice, perfil_url, str(tempo_limite)],
+                                          stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                          text=True, encoding="utf-8")
+        self._respostas = queue.Queue()
+        threading.Thread(target=self._ler_respostas, name="ponte-libreoffice", daemon=True).start()
+        if self._aguardar() != "pronto":
+            raise ErroConversao("A ponte com o LibreOffice respondeu de forma inesperada.")
+
+    @property
+    def ativa(self):
+        return self._processo.poll() is None
+
+    def _ler_respostas(self):
+        for linha in self._processo.stdout:
+            self._respostas.put(linha.strip())
+        self._respostas.put(None) # Fim da saída: a ponte terminou
+
+    def _aguardar(self):
+        try:
+            resposta = self._respostas.get(timeout=self.tempo_limite)
+        except queue.Empty:
+            self.fechar()
+            raise ErroConversao(f"O LibreOffice não respondeu em {self.tempo_limite} segundos.")
+        if resposta is None:
+            self._processo.wait()
+            erro = self._processo.stderr.read().strip()
+            raise ErroConversao(f"A ponte com o LibreOffice terminou: {erro or 'sem mensagem de erro'}")
+        return resposta
+
+    def converter(self, docx_path, pdf_path):
+        pedido = {"docx": os.path.abspath(docx_path), "pdf": os.path.abspath(pdf_path)}
+        try:
+            self._processo.stdin.write(json.dumps(pedido) + "\n")
+            self._processo.stdin.flush()
+        except OSError as e:
+            raise ErroConversao(f"A ponte com o LibreOffice não está respondendo: {e}") from e
+        resposta = json.loads(self._aguardar())
+        if not resposta.get("ok"):
+            raise ErroConversao(f"LibreOffice não gerou o PDF: {resposta.get('erro')}")
+
+    def fechar(self):
+        try:
+            self._processo.stdin.close() # A ponte encerra o soffice ao fim da entrada
+        except OSError:
+            pass
+        try:
+            self._processo.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self._processo.kill()
+
+
+class ConversorLibreOffice(Conversor):
+    """
+    LibreOffice headless persistente: um único processo soffice fica escutando
+    em um socket local e todas as conversões são feitas por ele, via UNO no
+    próprio processo (se o módulo 'uno' estiver disponível) ou via uma ponte
+    executada pelo Python com UNO (ver ponte_libreoffice.py). Sem nenhum dos
+    dois, cada chamada de converter_varios executa o soffice de novo; isso é
+    avisado com um RuntimeWarning ao criar o conversor ('persistente' é False).
+    """
+
+    nome = "libreoffice"
+
+    def __init__(self, soffice=None, tempo_limite=60):
+        from ponte_libreoffice import SessaoUno, argumentos_soffice
+        self.soffice = soffice or _localizar_soffice()
+        if self.soffice is None:
+            raise ErroConversao("LibreOffice (soffice) não encontrado no PATH.")
+        self.tempo_limite = tempo_limite
+        # Cada instância tem seu próprio perfil: processos paralelos não disputam o mesmo
+        self._perfil = tempfile.mkdtemp(prefix="declaracoes_lo_perfil_")
+        self._perfil_url = "file:///" + self._perfil.replace(os.sep, "/").lstrip("/")
+        self._argumentos = argumentos_soffice(self.soffice, self._perfil_url)
+        self._trava = threading.Lock()
+        self._ponte = None
+        self._python_uno = None
+        try:
+            self._sessao = SessaoUno(self._argumentos, tempo_limite) # 'uno' disponível neste Python
+        except ImportError:
+            self._sessao = None
+            if os.path.exists(PONTE_LIBREOFFICE): # Pode faltar em um executável empacotado
+                self._python_uno = _localizar_python_uno(self.soffice)
+        self.persistente = self._sessao is not None or self._python_uno is not None
+        if not self.persistente:
+            warnings.warn("Nenhum Python com o módulo 'uno' foi encontrado: cada conversão vai iniciar um novo "
+                          "LibreOffice, o que leva segundos por declaração. Instale o pacote python3-uno ou "
+                          f"indique um Python com UNO na variável {VARIAVEL_PYTHON_UNO}.", RuntimeWarning,
+                          stacklevel=2)
+
+    def _converter_via_ponte(self, pares):
+        if self._ponte is None or not self._ponte.ativa:
+            self._ponte = _PonteUno(self._python_uno, self.soffice, self._perfil_url, self.tempo_limite)
+        for docx_path, pdf_path in pares:
+            self._ponte.converter(docx_path, pdf_path)
+
+    def _converter_via_linha_de_comando(self, pares):
+        with tempfile.TemporaryDirectory(prefix="declaracoes_lo_") as pasta:
+            entradas = []
+            for indice, (docx_path, _) in enumerate(pares):
+                entrada = os.path.join(pasta, f"{indice:06d}.docx")
+                shutil.copyfile(docx_path, entrada)
+                entradas.append(entrada)
+            resultado = subprocess.run(
+                self._argumentos + ["--convert-to", "pdf", "--outdir", pasta] + entradas,
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=self.tempo_limite * max(1, len(pares)))
+            for indice, (_, pdf_path) in enumerate(pares):
+                gerado = os.path.join(pasta, f"{indice:06d}.pdf")
+                if not os.path.exists(gerado):
+                    raise ErroConversao("LibreOffice não gerou o PDF: "
+                                        + resultado.stderr.decode(errors="replace").strip())
+                shutil.move(gerado, pdf_path)
+
+    def converter(self, docx_path, pdf_path):
+        self.converter_varios([(docx_path, pdf_path)])
+
+    def converter_varios(self, pares):
+        with self._trava: # Uma conversão por vez na mesma instância do soffice
+            if self._sessao is not None:
+                for docx_path, pdf_path in pares:
+                    try:
+                        self._sessao.converter(os.path.abspath(docx_path), os.path.abspath(pdf_path))
+                    except RuntimeError as e:
+                        raise ErroConversao(str(e)) from e
+            elif self._python_uno is not None:
+                self._converter_via_ponte(pares)
+            elif pares:
+                self._converter_via_linha_de_comando(pares)
+
+    def fechar(self):
+        with self._trava:
+            if self._sessao is not None:
+                self._sessao.fechar()
+            if self._ponte is not None:
+                self._ponte.fechar()
+                self._ponte = None
+            shutil.rmtree(self._perfil, ignore_errors=True)
+
+
+def _texto_do_docx(docx_path):
+    """
+    Extrai o texto dos parágrafos do documento principal, sem python-docx.
+    Retorna uma lista de páginas (listas de linhas): cada quebra de seção ou
+    de página começa uma nova página. Cada linha é uma lista de (cor, texto),
+    um item por 'run', com a cor da 'run' ("RRGGBB") ou None.
+    """
+    with zipfile.ZipFile(docx_path) as zf:
+        xml = zf.read("word/document.xml").decode("utf-8")
+    paginas = [[]]
+    for paragrafo in re.findall(r"<w:p[ >].*?</w:p>", xml, flags=re.S):
+        if '<w:br w:type="page"/>' in paragrafo and paginas[-1]:
+            paginas.append([])
+        linha = []
+        for run in re.findall(r"<w:r[ >].*?</w:r>", paragrafo, flags=re.S):
+            texto = "".join(re.findall(r"<w:t(?: [^>]*)?>([^<]*)</w:t>", run))
+            if texto:
+                cor = re.search(r'<w:color w:val="([0-9A-Fa-f]{6})"', run)
+                linha.append((cor.group(1).upper() if cor else None, html.unescape(texto)))
+        paginas[-1].append(linha)
+        if "<w:sectPr" in paragrafo:
+            paginas.append([])
+    return [pagina for pagina in paginas if pagina] or [[]]
+
+def escapar_texto_pdf(texto):
+    """Codifica 'texto' em WinAnsi e escapa os caracteres especiais de strings PDF."""
+    texto = texto.encode("cp1252", errors="replace")
+    return texto.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+def montar_pdf(paginas, fontes=("Helvetica",)):
+    """
+    Monta um PDF mínimo. 'paginas' é uma lista de (largura, altura, conteudo),
+    onde 'conteudo' é o content stream da página. As fontes padrão do PDF
+    listadas em 'fontes' (WinAnsi) ficam disponíveis como /F1, /F2... em todas
+    as páginas; por padrão, só a Helvetica.
+    """
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None, # /Pages, preenchido após conhecer os números dos objetos das páginas
+    ]
+    recursos_fontes = b""
+    for numero, fonte in enumerate(fontes, start=1):
+        objetos.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>"
+                       % fonte.encode("ascii"))
+        recursos_fontes += b"/F%d %d 0 R " % (numero, len(objetos))
+    paginas_ref = []
+    for largura, altura, conteudo in paginas:
+        numero_pagina = len(objetos) + 1
+        paginas_ref.append(b"%d 0 R" % numero_pagina)
+        objetos.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %s %s] "
+                       b"/Resources << /Font << %s>> >> /Contents %d 0 R >>"
+                       % (str(largura).encode(), str(altura).encode(), recursos_fontes, numero_pagina + 1))
+        objetos.append(b"<< /Length %d >>\nstream\n" % len(conteudo) + conteudo + b"\nendstream")
+    objetos[1] = b"<< /Type /Pages /Kids [" + b" ".join(paginas_ref) + b"] /Count %d >>" % len(paginas)
+
+    saida = bytearray(b"%PDF-1.4\n")
+    deslocamentos = []
+    for numero, objeto in enumerate(objetos, start=1):
+        deslocamentos.append(len(saida))
+        saida += b"%d 0 obj\n" % numero + objeto + b"\nendobj\n"
+    inicio_xref = len(saida)
+    saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for deslocamento in deslocamentos:
+        saida += b"%010d 00000 n \n" % deslocamento
+    saida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref)
+    return bytes(saida)
+
+def _pdf_simples(paginas):
+    """Monta um PDF mínimo (A4, Helvetica) com uma linha de texto por parágrafo, em cada página."""
+    conteudos = []
+    for linhas in paginas:
+        conteudo = b"BT /F1 11 Tf 14 TL 56 790 Td\n"
+        for linha in linhas:
+            for cor, texto in linha:
+                if cor is None:
+                    conteudo += b"0 g "
+                else:
+                    conteudo += b"%.4f %.4f %.4f rg " % tuple(int(cor[i:i + 2], 16) / 255 for i in (0, 2, 4))
+                conteudo += b"(" + escapar_texto_pdf(texto) + b") Tj "
+            conteudo += b"T*\n"
+        conteudos.append(conteudo + b"ET")
+    return montar_pdf([(595, 842, conteudo) for conteudo in conteudos])
+
+
+class ConversorFalso(Conversor):
+    """
+    Conversor em processo que escreve um PDF simples com o texto do documento.
+    Não depende de Office; 'atraso' (segundos) simula o tempo de uma conversão real.
+    """
+
+    nome = "falso"
+
+    def __init__(self, atraso=0.0):
+        self.atraso = atraso
+        self.conversoes = 0
+        self._trava = threading.Lock()
+
+    def converter(self, docx_path, pdf_path):
+        if self.atraso:
+            time.sleep(self.atraso)
+        pdf = _pdf_simples(_texto_do_docx(docx_path))
+        with open(pdf_path, "wb") as f:
+            f.write(pdf)
+        with self._trava:
+            self.conversoes += 1
+
+
+CONVERSORES = {
+    ConversorDocx2Pdf.nome: ConversorDocx2Pdf,
+    ConversorLibreOffice.nome: ConversorLibreOffice,
+    ConversorFalso.nome: ConversorFalso,
+}
+
+def nome_conversor_padrao():
+    """Word (docx2pdf) no Windows e macOS; LibreOffice nos demais sistemas."""
+    nome = os.environ.get("DECLARACAO_CONVERSOR")
+    if nome:
+        return nome
+    if sys.platform in ("win32", "darwin"):
+        return ConversorDocx2Pdf.nome
+    return ConversorLibreOffice.nome
+
+def criar_conversor(nome=None):
+    """Cria uma nova instância do conversor 'nome' (ou do padrão da plataforma)."""
+    nome = nome or nome_conversor_padrao()
+    if nome not in CONVERSORES:
+        raise ValueError(f"Conversor desconhecido: {nome}")
+    return CONVERSORES[nome]()
+
+_conversores_ativos = {}
+_trava_ativos = threading.Lock()
+
+def obter_conversor(nome=None):
+    """
+    Retorna a instância compartilhada do conversor neste processo, criando-a na
+    primeira chamada. A instância é mantida viva (ex.: o soffice continua aberto)
+    e é fechada automaticamente ao final do processo.
+    """
+    nome = nome or nome_conversor_padrao()
+    with _trava_ativos:
+        conversor = _conversores_ativos.get(nome)
+        if conversor is None:
+            conversor = criar_conversor(nome)
+            _conversores_ativos[nome] = conversor
+        return conversor
+
+def fechar_conversores():
+    with _trava_ativos:
+        for conversor in _conversores_ativos.values():
+            try:
+                conversor.fechar()
+            except Exception:
+                pass
+        _conversores_ativos.clear()
+
+atexit.register(fechar_conversores)
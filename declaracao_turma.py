@@ -0,0 +1,178 @@
+# Ethyïos
+# Modo turma: todas as declarações de uma turma em um único PDF, pronto para
+# impressão. Os registros são renderizados em um só .docx (uma seção por
+# aluno, cada uma começando em nova página) e convertidos com uma única
+# chamada ao conversor. Junto do PDF é gravado um índice (JSON) com as páginas
+# de cada aluno e, opcionalmente, o PDF é separado de volta em um arquivo por
+# aluno. O índice de páginas e a separação requerem o pacote opcional 'pypdf'.
+import io
+import json
+import saida_atomica
+import metricas_etapas
+from conversores import Conversor, obter_conversor
+from indice_declaracoes import subpasta_por_data
+from motor_declaracao import (
+    OUTPUT_FOLDER_NAME, carregar_docx_bytes, compilar_modelo, indexar_declaracao, montar_substituicoes,
+    nome_arquivo_seguro, nome_base_declaracao, validar_registro,
+)
+
+
+class ErroTurma(Exception):
+    """Falha ao gerar ou indexar o PDF de uma turma."""
+
+
+def _importar_pypdf():
+    try:
+        import pypdf
+    except ImportError as e:
+        raise ErroTurma("O índice de páginas e a separação por aluno requerem o pacote 'pypdf' "
+                        "(pip install pypdf).") from e
+    return pypdf
+
+def localizar_paginas(pdf_bytes, nomes):
+    """
+    Localiza a página inicial (base 0) de cada declaração no PDF combinado,
+    na ordem de 'nomes' (o nome de cada aluno). Retorna (total de páginas, inícios).
+    """
+    pypdf = _importar_pypdf()
+    leitor = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+    total = len(leitor.pages)
+    if total == len(nomes):
+        # Cada declaração começa em uma nova página: uma página por aluno
+        return total, list(range(total))
+
+    textos = [" ".join((pagina.extract_text() or "").split()) for pagina in leitor.pages]
+    inicios = []
+    pagina = 0
+    for nome in nomes:
+        alvo = " ".join(nome.split())
+        while pagina < total and alvo not in textos[pagina]:
+            pagina += 1
+        if pagina >= total:
+            raise ErroTurma(f"Não foi possível localizar a declaração de '{nome}' no PDF da turma.")
+        inicios.append(pagina)
+        pagina += 1
+    return total, inicios
+
+def separar_paginas(pdf_bytes, intervalos):
+    """Retorna os bytes de um PDF para cada (início, fim) de 'intervalos' (páginas base 0, fim exclusivo)."""
+    pypdf = _importar_pypdf()
+    leitor = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+    partes = []
+    for inicio, fim in intervalos:
+        escritor = pypdf.PdfWriter()
+        for numero in range(inicio, fim):
+            escritor.add_page(leitor.pages[numero])
+        saida = io.BytesIO()
+        escritor.write(saida)
+        partes.append(saida.getvalue())
+    return partes
+
+
+class ResultadoTurma:
+    """PDF combinado, índice gravado e registros que ficaram de fora (com o motivo)."""
+
+    def __init__(self, caminho_pdf, caminho_indice, entradas, erros, aviso=None):
+        self.caminho_pdf = caminho_pdf
+        self.caminho_indice = caminho_indice
+        self.entradas = entradas
+        self.erros = erros
+        self.aviso = aviso
+
+    def para_dict(self):
+        return {
+            "caminho_pdf": self.caminho_pdf,
+            "declaracoes": self.entradas,
+            "erros": self.erros,
+            "aviso": self.aviso,
+        }
+
+
+def gerar_pdf_turma(registros, docx_bytes=None, pasta_saida=OUTPUT_FOLDER_NAME, nome_base=None,
+                    conversor=None, separar=False, ao_progredir=None):
+    """
+    Gera um único PDF com as declarações de 'registros' e grava ao lado dele
+    o índice <nome>.json. Registros inválidos ficam de fora e são listados em
+    'erros'. Com 'separar', grava também um Declaracao_<nome>_<data>.pdf por aluno.
+    Os arquivos vão para a subpasta <ano>/<mês> de 'pasta_saida' e cada aluno é registrado no índice.
+    'nome_base' é o nome do PDF combinado (padrão: Declaracoes_<série>_<data> do primeiro registro).
+    Retorna um ResultadoTurma.
+    """
+    if not isinstance(conversor, Conversor):
+        conversor = obter_conversor(conversor)
+
+    def progredir(valor, mensagem):
+        if ao_progredir is not None:
+            ao_progredir(valor, mensagem)
+
+    validos = []
+    erros = []
+    for indice, registro in enumerate(registros):
+        faltando = validar_registro(registro)
+        if faltando:
+            erros.append({"indice": indice, "nome_filho": registro.get("nome_filho"),
+                          "erro": f"Campos obrigatórios ausentes: {', '.join(faltando)}"})
+        else:
+            validos.append((indice, registro))
+    if not validos:
+        raise ErroTurma("Nenhum registro válido para gerar o PDF da turma.")
+
+    if docx_bytes is None:
+        docx_bytes = carregar_docx_bytes()
+    modelo = compilar_modelo(docx_bytes, "ooxml") # Só o renderizador OOXML monta várias seções
+    progredir(10, "Modelo carregado...")
+
+    try:
+        with metricas_etapas.medir("preencher_turma", registros=len(validos)):
+            docx_turma = modelo.renderizar_varios_bytes([montar_substituicoes(r) for _, r in validos])
+    except ValueError as e:
+        raise ErroTurma(str(e)) from e
+    progredir(30, f"{len(validos)} declarações preenchidas no documento da turma...")
+
+    progredir(40, "Convertendo para PDF...")
+    with metricas_etapas.medir("converter_turma", conversor=conversor.nome, registros=len(validos)):
+        pdf_bytes = conversor.converter_bytes(docx_turma)
+    progredir(80, "PDF da turma gerado...")
+
+    if nome_base is None:
+        primeiro = validos[0][1]
+        nome_base = "Declaracoes_{}_{}".format(nome_arquivo_seguro(primeiro["serie"]),
+                                               nome_arquivo_seguro(primeiro["data"].replace("/", "-")))
+    pasta_destino = subpasta_por_data(pasta_saida, validos[0][1]["data"])
+    with metricas_etapas.medir("gravar_pdf"):
+        caminho_pdf = saida_atomica.publicar(pasta_destino, nome_base, ".pdf", pdf_bytes)
+
+    # Índice de páginas (e separação por aluno, se pedida)
+    entradas = [{"indice": indice, "nome_filho": registro["nome_filho"]} for indice, registro in validos]
+    aviso = None
+    try:
+        with metricas_etapas.medir("indexar_turma"):
+            total, inicios = localizar_paginas(pdf_bytes, [registro["nome_filho"] for _, registro in validos])
+    except ErroTurma as e:
+        if separar:
+            raise
+        aviso = f"Índice sem números de página: {e}"
+    else:
+        fins = inicios[1:] + [total]
+        for entrada, inicio, fim in zip(entradas, inicios, fins):
+            entrada["pagina_inicial"] = inicio + 1
+            entrada["paginas"] = fim - inicio
+        if separar:
+            partes = separar_paginas(pdf_bytes, list(zip(inicios, fins)))
+            for entrada, (_, registro), parte in zip(entradas, validos, partes):
+                # Cada aluno vai para a pasta do ano/mês da sua própria declaração
+                entrada["caminho_pdf"] = saida_atomica.publicar(subpasta_por_data(pasta_saida, registro["data"]),
+                                                                nome_base_declaracao(registro), ".pdf", parte)
+
+    # Cada aluno entra no índice das declarações: o PDF separado ou a página no PDF da turma
+    for entrada, (_, registro) in zip(entradas, validos):
+        if "caminho_pdf" in entrada:
+            indexar_declaracao(entrada["caminho_pdf"], registro, modelo.hash)
+        else:
+            indexar_declaracao(caminho_pdf, registro, modelo.hash, entrada.get("pagina_inicial"))
+
+    resultado = ResultadoTurma(caminho_pdf, caminho_pdf[:-len(".pdf")] + ".json", entradas, erros, aviso)
+    saida_atomica.substituir(resultado.caminho_indice,
+                             json.dumps(resultado.para_dict(), ensure_ascii=False, indent=2).encode("utf-8"))
+    progredir(90, "Índice da turma gravado...")
+    return resultado
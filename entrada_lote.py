@@ -0,0 +1,282 @@
+# Ethyïos
+# Entrada do modo em lote para listas grandes (milhares de alunos): as linhas
+# do .csv/.xlsx/.jsonl são lidas uma a uma por um gerador, validadas como no
+# formulário da GUI (todos os campos obrigatórios) e enviadas ao pool aos
+# poucos, sem carregar a lista inteira na memória. Um diário (JSON lines) na
+# pasta de saída registra cada linha concluída: se o lote for interrompido,
+# a próxima execução com a mesma entrada e o mesmo modelo continua de onde
+# parou. O .xlsx requer o pacote opcional 'openpyxl'.
+import os
+import csv
+import json
+import datetime
+import armazenamento_modelo
+import saida_atomica
+from motor_declaracao import (
+    MODO_PADRAO, OUTPUT_FOLDER_NAME, PLACEHOLDERS, RENDERIZADOR_PADRAO, ResultadoRegistro,
+    gerar_lote_indexado_iter, nome_arquivo_seguro, validar_registro,
+)
+
+VERSAO_DIARIO = 1
+INTERVALO_FSYNC = 100 # Linhas do diário entre duas sincronizações com o disco
+
+
+class ErroEntrada(Exception):
+    """Arquivo de entrada ilegível ou em formato não suportado."""
+
+
+# --- Leitura das linhas ---
+
+def _texto_da_celula(valor):
+    """Valor de uma célula do .xlsx como o usuário o vê (datas em dd/mm/aaaa)."""
+    if valor is None:
+        return ""
+    if isinstance(valor, (datetime.datetime, datetime.date)):
+        return valor.strftime("%d/%m/%Y")
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+def _campos_do_cabecalho(cabecalho):
+    campos = [str(coluna or "").strip().lower() for coluna in cabecalho]
+    if not any(campo in PLACEHOLDERS for campo in campos):
+        raise ErroEntrada("O cabeçalho não tem nenhuma das colunas esperadas: " + ", ".join(PLACEHOLDERS))
+    return campos
+
+def _linhas_csv(caminho):
+    with open(caminho, "r", encoding="utf-8-sig", newline="") as f:
+        amostra = f.read(4096)
+        f.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=",;")
+        except csv.Error:
+            dialeto = csv.excel
+        leitor = csv.reader(f, dialect=dialeto)
+        campos = _campos_do_cabecalho(next(leitor, []))
+        for linha in leitor:
+            if any(valor.strip() for valor in linha): # Ignora linhas em branco
+                yield dict(zip(campos, linha))
+
+def _linhas_xlsx(caminho):
+    try:
+        import openpyxl
+    except ImportError as e:
+        raise ErroEntrada("A leitura de planilhas .xlsx requer o pacote 'openpyxl' (pip install openpyxl).") from e
+    # Modo somente leitura: as linhas são lidas sob demanda, sem carregar a planilha inteira
+    pasta_de_trabalho = openpyxl.load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        linhas = pasta_de_trabalho.active.iter_rows(values_only=True)
+        campos = _campos_do_cabecalho(next(linhas, ()))
+        for linha in linhas:
+            valores = [_texto_da_celula(valor) for valor in linha]
+            if any(valor.strip() for valor in valores):
+                yield dict(zip(campos, valores))
+    finally:
+        pasta_de_trabalho.close()
+
+def _linhas_jsonl(caminho):
+    with open(caminho, "r", encoding="utf-8") as f:
+        for numero, linha in enumerate(f, 1):
+            if linha.strip():
+                try:
+                    yield json.loads(linha)
+                except ValueError as e:
+                    raise ErroEntrada(f"Linha {numero} de '{caminho}' não é um JSON válido: {e}") from e
+
+def _linhas_json(caminho):
+    with open(caminho, "r", encoding="utf-8") as f:
+        yield from json.load(f) # Uma lista JSON precisa ser lida inteira; para listas grandes, use .jsonl
+
+_LEITORES = {".csv": _linhas_csv, ".txt": _linhas_csv, ".xlsx": _linhas_xlsx,
+             ".jsonl": _linhas_jsonl, ".json": _linhas_json}
+
+def iterar_registros(caminho):
+    """
+    Produz (índice, registro) para cada linha de dados de um .csv (separado por
+    ',' ou ';'), .xlsx (primeira planilha), .jsonl (um objeto por linha) ou
+    .json (lista de objetos). Os índices começam em 0; linhas em branco são ignoradas.
+    """
+    extensao = os.path.splitext(caminho)[1].lower()
+    leitor = _LEITORES.get(extensao)
+    if leitor is None:
+        raise ErroEntrada(f"Formato de entrada não suportado: '{extensao}' (use .csv, .xlsx, .jsonl ou .json).")
+    for indice, linha in enumerate(leitor(caminho)):
+        if not isinstance(linha, dict):
+            raise ErroEntrada(f"O registro {indice} de '{caminho}' não é um objeto com os campos da declaração.")
+        yield indice, {campo: str(linha.get(campo) if linha.get(campo) is not None else "")
+                       for campo in PLACEHOLDERS}
+
+def pares_validos(pares, invalidos):
+    """
+    Repassa os pares (índice, registro) que passam na validação do formulário.
+    Os demais não ocupam o pool: entram em 'invalidos' como ResultadoRegistro
+    com o erro, para quem consome o lote os intercalar com os resultados.
+    """
+    for indice, registro in pares:
+        faltando = validar_registro(registro)
+        if faltando:
+            invalidos.append(ResultadoRegistro(
+                indice, registro, erro=f"Campos obrigatórios ausentes: {', '.join(faltando)}"))
+            continue
+        yield indice, registro
+
+
+# --- Diário de retomada ---
+
+class DiarioLote:
+    """
+    Diário de um lote em JSON lines. A primeira linha identifica a execução
+    (entrada, modelo, opções); cada linha seguinte registra um registro
+    terminado, e uma linha "fim" marca uma execução que chegou ao final (o
+    diário fica quando sobram falhas). Um diário de outra entrada ou de outro
+    modelo é descartado.
+    """
+
+    def __init__(self, caminho, identificacao, reiniciar=False):
+        self.caminho = caminho
+        self.concluidos = set() # Índices que não precisam ser gerados de novo
+        self.terminado = False # A última execução chegou ao final (não foi interrompida)
+        self.retomado = not reiniciar and self._ler(identificacao)
+        if not self.retomado:
+            self.concluidos.clear()
+            self.terminado = False
+            cabecalho = json.dumps(identificacao, ensure_ascii=False) + "\n"
+            saida_atomica.substituir(caminho, cabecalho.encode("utf-8"))
+        self._arquivo = open(caminho, "a", encoding="utf-8")
+        self._desde_fsync = 0
+
+    def _ler(self, identificacao):
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                try:
+                    if json.loads(f.readline()) != identificacao:
+                        return False
+                except ValueError:
+                    return False
+                for linha in f:
+                    try:
+                        entrada = json.loads(linha)
+                    except ValueError:
+                        continue # Linha cortada por uma interrupção: o registro é gerado de novo
+                    self.terminado = entrada.get("estado") == "fim"
+                    if entrada.get("estado") == "ok":
+                        self.concluidos.add(entrada["indice"])
+        except FileNotFoundError:
+            return False
+        # Garante que a próxima linha não seja emendada a uma linha cortada
+        with open(self.caminho, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+        return True
+
+    def registrar(self, indice, estado, caminho_pdf=None, erro=None):
+        entrada = {"indice": indice, "estado": estado}
+        if caminho_pdf:
+            entrada["caminho_pdf"] = caminho_pdf
+        if erro:
+            entrada["erro"] = erro
+        self._arquivo.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+        self._arquivo.flush() # Basta para sobreviver ao fim do processo; o fsync protege de quedas do sistema
+        self._desde_fsync += 1
+        if self._desde_fsync >= INTERVALO_FSYNC:
+            os.fsync(self._arquivo.fileno())
+            self._desde_fsync = 0
+
+    def fechar(self, remover=False, terminado=False):
+        """Fecha o diário; com 'remover', apaga-o, e com 'terminado', marca o fim da execução."""
+        if terminado and not remover and not self._arquivo.closed:
+            self._arquivo.write(json.dumps({"estado": "fim"}) + "\n")
+            self.terminado = True
+        if not self._arquivo.closed:
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+            self._arquivo.close()
+        if remover:
+            try:
+                os.remove(self.caminho)
+            except FileNotFoundError:
+                pass
+
+
+def caminho_diario_padrao(caminho_entrada, pasta_saida=OUTPUT_FOLDER_NAME):
+    nome = nome_arquivo_seguro(os.path.basename(caminho_entrada))
+    return os.path.join(pasta_saida, f".diario_{nome}.jsonl")
+
+
+class LoteRetomavel:
+    """
+    Lote lido de um arquivo, em fluxo, com diário de retomada. Itere
+    resultados() para gerar; registros concluídos em uma execução anterior
+    interrompida são pulados (contados em 'pulados'). Todo PDF publicado entra
+    no diário, inclusive os que terminam durante uma interrupção. Quando o
+    lote termina sem falhas o diário é apagado; com falhas ele fica, e a
+    próxima execução tenta de novo apenas os registros que falharam na
+    geração ('erros_de_geracao') ou não chegaram a ser gerados. Linhas
+    inválidas são validadas e informadas de novo a cada execução, até a
+    entrada ser corrigida; enquanto isso, nada é gerado em duplicado.
+    """
+
+    def __init__(self, caminho_entrada, docx_bytes, pasta_saida=OUTPUT_FOLDER_NAME, processos=None,
+                 renderizador=RENDERIZADOR_PADRAO, conversor=None, modo=MODO_PADRAO, usar_cache=True,
+                 caminho_diario=None, reiniciar=False, max_em_andamento=None):
+        self.caminho_entrada = caminho_entrada
+        self.docx_bytes = docx_bytes
+        self.pasta_saida = pasta_saida
+        self.opcoes = (processos, renderizador, conversor, modo, usar_cache)
+        self.max_em_andamento = max_em_andamento
+        self.pulados = 0
+        self.falhas = 0
+        self.erros_de_geracao = 0 # Falhas que a próxima execução tenta de novo (as demais são linhas inválidas)
+        info = os.stat(caminho_entrada)
+        identificacao = {
+            "versao": VERSAO_DIARIO,
+            "entrada": os.path.abspath(caminho_entrada),
+            "tamanho": info.st_size,
+            "mtime_ns": info.st_mtime_ns,
+            "modelo": armazenamento_modelo.calcular_hash(docx_bytes),
+            "renderizador": renderizador,
+            "modo": modo,
+        }
+        os.makedirs(pasta_saida, exist_ok=True)
+        self.diario = DiarioLote(caminho_diario or caminho_diario_padrao(caminho_entrada, pasta_saida),
+                                 identificacao, reiniciar)
+
+    def _pendentes(self):
+        for indice, registro in iterar_registros(self.caminho_entrada):
+            if indice in self.diario.concluidos:
+                self.pulados += 1
+                continue
+            yield indice, registro
+
+    def _registrar(self, resultado, invalido=False):
+        if resultado.sucesso:
+            self.diario.registrar(resultado.indice, "ok", caminho_pdf=resultado.caminho_pdf)
+        else:
+            self.falhas += 1
+            if not invalido:
+                self.erros_de_geracao += 1
+            self.diario.registrar(resultado.indice, "invalido" if invalido else "erro", erro=resultado.erro)
+        return resultado
+
+    def resultados(self):
+        """Gera os registros pendentes, produzindo um ResultadoRegistro à medida que cada um termina."""
+        invalidos = []
+        concluido = False
+        # Registros que terminam depois de uma interrupção também publicaram o PDF: vão para o diário
+        lote = gerar_lote_indexado_iter(pares_validos(self._pendentes(), invalidos), self.docx_bytes,
+                                        self.pasta_saida, *self.opcoes, max_em_andamento=self.max_em_andamento,
+                                        ao_interromper=self._registrar)
+        try:
+            for resultado in lote:
+                while invalidos:
+                    yield self._registrar(invalidos.pop(0), invalido=True)
+                yield self._registrar(resultado)
+            while invalidos:
+                yield self._registrar(invalidos.pop(0), invalido=True)
+            concluido = True
+        finally:
+            lote.close() # Espera os registros em execução e os registra antes de fechar o diário
+            self.diario.fechar(remover=concluido and not self.falhas, terminado=concluido)
@@ -0,0 +1,139 @@
+# Ethyïos
+# Exportação do lote em um único arquivo ZIP (para enviar por e-mail ou
+# publicar), sem passar pela pasta de saída: cada PDF é escrito no ZIP assim
+# que o processo de trabalho o devolve, e descartado em seguida. Os PDFs já
+# são comprimidos, então entram sem nova compressão (ZIP_STORED). A memória
+# fica limitada aos registros em andamento no pool, qualquer que seja o
+# tamanho da lista. O destino pode ser a saída padrão ('-'), para encadear
+# com outro programa:
+#
+#   python motor_declaracao.py registros.csv --zip declaracoes.zip
+#   python motor_declaracao.py registros.csv --zip - | ssh servidor "cat > declaracoes.zip"
+import os
+import sys
+import time
+import uuid
+import zipfile
+from entrada_lote import iterar_registros, pares_validos
+from motor_declaracao import MODO_PADRAO, RENDERIZADOR_PADRAO, gerar_lote_indexado_iter, nome_base_declaracao
+
+SAIDA_PADRAO = "-"
+
+
+class _SaidaDescartavel:
+    """
+    Repassa as gravações do zipfile ao arquivo de destino até descartar() ser
+    chamado; depois disso, nada mais é escrito. Assim um ZIP interrompido é
+    fechado normalmente, sem que o diretório central chegue à saída.
+    """
+
+    def __init__(self, arquivo):
+        self._arquivo = arquivo
+        self.descartada = False
+
+    def descartar(self):
+        self.descartada = True
+
+    def write(self, dados):
+        if not self.descartada:
+            self._arquivo.write(dados)
+        return len(dados)
+
+    def tell(self):
+        return self._arquivo.tell() # Na saída padrão (pipe) lança OSError: o zipfile grava sem voltar atrás
+
+    def seek(self, *args):
+        return self._arquivo.seek(*args)
+
+    def flush(self):
+        if not self.descartada:
+            self._arquivo.flush()
+
+
+class ZipEmFluxo:
+    """
+    ZIP escrito à medida que os arquivos chegam, em 'destino' (caminho, ou '-'
+    para a saída padrão). Um arquivo só aparece com o nome final depois de
+    fechar(); interrompido, o temporário é apagado.
+    """
+
+    def __init__(self, destino):
+        self.destino = destino
+        self._temporario = None
+        if destino == SAIDA_PADRAO:
+            self._arquivo = sys.stdout.buffer # Se for um pipe, o zipfile grava sem voltar atrás (data descriptors)
+        else:
+            pasta = os.path.dirname(os.path.abspath(destino))
+            os.makedirs(pasta, exist_ok=True)
+            self._temporario = os.path.join(pasta, f".tmp_{uuid.uuid4().hex}")
+            self._arquivo = open(self._temporario, "wb")
+        self._saida = _SaidaDescartavel(self._arquivo)
+        self._zip = zipfile.ZipFile(self._saida, "w", compression=zipfile.ZIP_STORED)
+        self._nomes = set()
+
+    def adicionar(self, nome_base, extensao, dados):
+        """Acrescenta um arquivo (com sufixo _2, _3... se o nome já existir) e retorna o nome usado no ZIP."""
+        nome = f"{nome_base}{extensao}"
+        numero = 2
+        while nome in self._nomes:
+            nome = f"{nome_base}_{numero}{extensao}"
+            numero += 1
+        self._nomes.add(nome)
+        info = zipfile.ZipInfo(nome, date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        info.external_attr = 0o644 << 16
+        self._zip.writestr(info, dados)
+        return nome
+
+    @property
+    def quantidade(self):
+        return len(self._nomes)
+
+    def fechar(self, concluido=True):
+        """Grava o diretório central do ZIP e publica o arquivo (ou, sem 'concluido', descarta o temporário)."""
+        if not concluido:
+            # Sem diretório central: um ZIP interrompido na saída padrão não passa por completo
+            self._saida.descartar()
+        self._zip.close() # Escreve o diretório central; o arquivo em si continua aberto
+        if self._temporario is None:
+            self._arquivo.flush()
+            return
+        with self._arquivo:
+            if concluido:
+                self._arquivo.flush()
+                os.fsync(self._arquivo.fileno())
+        if concluido:
+            os.replace(self._temporario, self.destino)
+        else:
+            os.remove(self._temporario)
+
+
+def exportar_lote_zip(caminho_entrada, docx_bytes, destino=SAIDA_PADRAO, processos=None,
+                      renderizador=RENDERIZADOR_PADRAO, conversor=None, modo=MODO_PADRAO, usar_cache=True,
+                      max_em_andamento=None):
+    """
+    Gera as declarações de um arquivo de registros (ver entrada_lote) direto
+    para um ZIP em 'destino', produzindo um ResultadoRegistro à medida que cada
+    uma termina ('caminho_pdf' é o nome do arquivo dentro do ZIP). O ZIP só é
+    finalizado quando a iteração chega ao fim. As declarações exportadas não
+    entram no índice, pois não há um PDF em disco para apontar.
+    """
+    arquivo_zip = ZipEmFluxo(destino)
+    invalidos = []
+    concluido = False
+    pares = pares_validos(iterar_registros(caminho_entrada), invalidos) # Linhas inválidas não ocupam o pool
+    try:
+        for resultado in gerar_lote_indexado_iter(pares, docx_bytes, None, processos, renderizador, conversor, modo,
+                                                  usar_cache, max_em_andamento=max_em_andamento, devolver_pdf=True):
+            while invalidos:
+                yield invalidos.pop(0)
+            if resultado.sucesso:
+                resultado.caminho_pdf = arquivo_zip.adicionar(nome_base_declaracao(resultado.registro), ".pdf",
+                                                              resultado.pdf_bytes)
+                resultado.pdf_bytes = None # Já está no ZIP: não fica retido por quem guarda os resultados
+            yield resultado
+        while invalidos:
+            yield invalidos.pop(0)
+        concluido = True
+    finally:
+        arquivo_zip.fechar(concluido)
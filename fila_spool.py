@@ -0,0 +1,500 @@
+# Ethyïos
+# Fila de trabalhos em uma pasta compartilhada ("spool"), para dividir a
+# geração entre vários processos e várias máquinas da secretaria. Produtores
+# (GUI, linha de comando, serviço HTTP) gravam um arquivo por declaração em
+# pendentes/; trabalhadores reivindicam cada arquivo com um rename atômico
+# para em_andamento/, geram a declaração com o pipeline de motor_declaracao e
+# movem o arquivo para concluidos/ ou falhas/, com o resultado.
+#
+#   <spool>/pendentes/<id>.json
+#   <spool>/em_andamento/<id>@<trabalhador>.json   (mtime = última renovação da concessão)
+#   <spool>/concluidos/<id>.json                    (+ caminho do PDF, relativo ao spool se estiver nele)
+#   <spool>/falhas/<id>.json                        (+ erro)
+#   <spool>/modelos/<hash>.docx                     (modelos usados pelos trabalhos)
+#   <spool>/saida/<ano>/<mês>/...pdf                (PDFs, se o trabalhador não indicar outra pasta)
+#
+# Enquanto gera, o trabalhador renova a concessão (lease) tocando o arquivo.
+# Se ele morrer, a concessão expira e qualquer trabalhador devolve o trabalho
+# a pendentes/ (até MAX_TENTATIVAS vezes). As máquinas precisam ter os
+# relógios sincronizados (a expiração compara o mtime com a hora local).
+# Cada máquina pode montar o spool em um caminho diferente (/mnt/secretaria,
+# S:\spool...): um PDF gravado dentro do spool é registrado pelo caminho
+# relativo a ele, e quem lê o resultado o resolve com a sua própria montagem.
+# Pelo mesmo motivo, quem indexa a declaração (ver indice_declaracoes) é a
+# máquina que a pediu, ao receber o resultado: é na busca dela que a
+# declaração deve aparecer, com o caminho que ela enxerga.
+#
+#   python fila_spool.py trabalhador --spool /mnt/secretaria/spool --processos 2
+#   python fila_spool.py enviar --spool /mnt/secretaria/spool registros.csv --aguardar
+#   python fila_spool.py estado --spool /mnt/secretaria/spool
+import os
+import sys
+import json
+import time
+import uuid
+import signal
+import socket
+import argparse
+import datetime
+import threading
+import armazenamento_modelo
+import metricas_etapas
+import saida_atomica
+from motor_declaracao import (
+    MODO_PADRAO, RENDERIZADOR_PADRAO, configurar_log_etapas, gerar_pdf_bytes, indexar_declaracao, nome_arquivo_seguro,
+    publicar_declaracao, validar_registro,
+)
+
+PENDENTES = "pendentes"
+EM_ANDAMENTO = "em_andamento"
+CONCLUIDOS = "concluidos"
+FALHAS = "falhas"
+MODELOS = "modelos"
+SAIDA = "saida"
+TEMPO_CONCESSAO_PADRAO = 120 # Segundos sem renovação até um trabalho ser considerado abandonado
+MAX_TENTATIVAS = 3 # Vezes que um trabalho abandonado volta para a fila antes de ir para falhas/
+INTERVALO_CONSULTA = 0.5 # Segundos entre duas verificações da pasta (trabalhadores e produtores)
+LIMITE_MODELOS_EM_MEMORIA = 8
+VARIAVEL_SPOOL = "DECLARACAO_SPOOL" # Se definida, a GUI e o serviço HTTP enviam os trabalhos para esta pasta
+
+
+class ErroSpool(Exception):
+    """Um trabalho da fila terminou com erro (a mensagem é a do trabalhador)."""
+
+
+def _agora():
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+def _ler_json(caminho):
+    with open(caminho, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _json_bytes(dados):
+    return json.dumps(dados, ensure_ascii=False, indent=2).encode("utf-8")
+
+def identificacao_trabalhador():
+    """Nome único do trabalhador (máquina, processo e um sufixo aleatório), usado no nome dos arquivos."""
+    return nome_arquivo_seguro(f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}")
+
+
+class TrabalhoSpool:
+    """Um trabalho reivindicado por este trabalhador: o arquivo em em_andamento/ e o seu conteúdo."""
+
+    def __init__(self, caminho, dados):
+        self.caminho = caminho
+        self.dados = dados
+
+    @property
+    def id(self):
+        return self.dados["id"]
+
+
+class FilaSpool:
+    """
+    Fila em 'pasta' (pode ser um compartilhamento de rede). 'tempo_concessao'
+    é o tempo sem renovação após o qual um trabalho em andamento é devolvido à fila.
+    """
+
+    def __init__(self, pasta, tempo_concessao=TEMPO_CONCESSAO_PADRAO, max_tentativas=MAX_TENTATIVAS):
+        self.pasta = pasta
+        self.tempo_concessao = tempo_concessao
+        self.max_tentativas = max_tentativas
+        for subpasta in (PENDENTES, EM_ANDAMENTO, CONCLUIDOS, FALHAS, MODELOS):
+            os.makedirs(os.path.join(pasta, subpasta), exist_ok=True)
+        self._modelos = {} # hash -> bytes, para os trabalhadores
+
+    def _caminho(self, subpasta, nome):
+        return os.path.join(self.pasta, subpasta, nome)
+
+    def _arquivos(self, subpasta):
+        """Nomes dos arquivos de trabalho em 'subpasta' (ignora os temporários '.tmp_*'), em ordem."""
+        return sorted(nome for nome in os.listdir(os.path.join(self.pasta, subpasta))
+                      if nome.endswith(".json") and not nome.startswith("."))
+
+    # --- Produtores ---
+
+    def guardar_modelo(self, docx_bytes):
+        """Copia o modelo para a pasta da fila (uma vez por conteúdo) e retorna o seu hash."""
+        hash_modelo = armazenamento_modelo.calcular_hash(docx_bytes)
+        caminho = self._caminho(MODELOS, f"{hash_modelo}.docx")
+        if not os.path.exists(caminho):
+            saida_atomica.substituir(caminho, docx_bytes)
+        return hash_modelo
+
+    def enviar(self, registro, docx_bytes, renderizador=RENDERIZADOR_PADRAO, modo=MODO_PADRAO):
+        """Coloca uma declaração na fila e retorna o id do trabalho."""
+        faltando = validar_registro(registro)
+        if faltando:
+            raise ValueError(f"Campos obrigatórios ausentes: {', '.join(faltando)}")
+        # Ids crescentes no tempo: a ordem dos nomes é a ordem de chegada
+        id_trabalho = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        dados = {
+            "id": id_trabalho,
+            "registro": registro,
+            "modelo": self.guardar_modelo(docx_bytes),
+            "renderizador": renderizador,
+            "modo": modo,
+            "tentativas": 0,
+            "criado_em": _agora(),
+            "produtor": socket.gethostname(),
+        }
+        saida_atomica.substituir(self._caminho(PENDENTES, f"{id_trabalho}.json"), _json_bytes(dados))
+        return id_trabalho
+
+    def estado(self, id_trabalho):
+        """
+        Retorna (estado, dados): estado é "concluido", "falha", "pendente",
+        "em_andamento" ou None (id desconhecido, ou resultado já consumido).
+        """
+        for _ in range(2): # Segunda volta: o trabalho pode ter mudado de pasta durante a primeira
+            for subpasta, estado in ((CONCLUIDOS, "concluido"), (FALHAS, "falha"), (PENDENTES, "pendente")):
+                try:
+                    dados = _ler_json(self._caminho(subpasta, f"{id_trabalho}.json"))
+                except (FileNotFoundError, ValueError):
+                    continue # Ausente, ou lido no instante em que era movido
+                if ((estado == "concluido" and "caminho_pdf" not in dados and "pdf_no_spool" not in dados)
+                        or (estado == "falha" and "erro" not in dados)):
+                    return "em_andamento", dados # Movido, mas o resultado ainda está sendo gravado
+                return estado, dados
+            # Reivindicado (<id>@<trabalhador>.json) ou sendo devolvido à fila (.<id>@....recolocando)
+            if any(id_trabalho in nome for nome in os.listdir(os.path.join(self.pasta, EM_ANDAMENTO))):
+                return "em_andamento", None
+        return None, None
+
+    def caminho_pdf(self, dados):
+        """Caminho do PDF de um trabalho concluído, como esta máquina o vê."""
+        if "pdf_no_spool" in dados:
+            return os.path.join(self.pasta, *dados["pdf_no_spool"].split("/"))
+        return dados["caminho_pdf"] # Pasta de saída própria do trabalhador (--saida)
+
+    def cancelar(self, id_trabalho):
+        """Retira da fila um trabalho que ainda não foi reivindicado. Retorna False se já não estava pendente."""
+        try:
+            os.remove(self._caminho(PENDENTES, f"{id_trabalho}.json"))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def aguardar(self, id_trabalho, tempo_limite=None, intervalo=INTERVALO_CONSULTA, ao_mudar=None, remover=True):
+        """
+        Espera o trabalho terminar e retorna o caminho do PDF (ver caminho_pdf). Lança ErroSpool
+        se ele falhou e TimeoutError após 'tempo_limite' segundos.
+        'ao_mudar(estado)' é chamado quando o estado muda. Com 'remover', o
+        arquivo de resultado é apagado da fila depois de lido.
+        """
+        limite = time.monotonic() + tempo_limite if tempo_limite is not None else None
+        anterior = None
+        while True:
+            estado, dados = self.estado(id_trabalho)
+            if estado != anterior and ao_mudar is not None:
+                ao_mudar(estado)
+            anterior = estado
+            if estado in ("concluido", "falha"):
+                if remover:
+                    subpasta = CONCLUIDOS if estado == "concluido" else FALHAS
+                    try:
+                        os.remove(self._caminho(subpasta, f"{id_trabalho}.json"))
+                    except FileNotFoundError:
+                        pass
+                if estado == "falha":
+                    raise ErroSpool(dados.get("erro") or "Falha desconhecida.")
+                return self.caminho_pdf(dados)
+            if estado is None:
+                raise KeyError(id_trabalho)
+            if limite is not None and time.monotonic() >= limite:
+                raise TimeoutError(f"O trabalho {id_trabalho} não terminou em {tempo_limite} segundos.")
+            time.sleep(intervalo)
+
+    def contagem(self):
+        return {subpasta: len(self._arquivos(subpasta)) for subpasta in (PENDENTES, EM_ANDAMENTO, CONCLUIDOS, FALHAS)}
+
+    # --- Trabalhadores ---
+
+    def reivindicar(self, trabalhador):
+        """Reivindica o trabalho pendente mais antigo. Retorna um TrabalhoSpool ou None se a fila está vazia."""
+        for nome in self._arquivos(PENDENTES):
+            id_trabalho = nome[:-len(".json")]
+            origem = self._caminho(PENDENTES, nome)
+            destino = self._caminho(EM_ANDAMENTO, f"{id_trabalho}@{trabalhador}.json")
+            try:
+                # A concessão conta a partir da reivindicação: o arquivo chega a em_andamento/ com o mtime atual
+                os.utime(origem)
+                # Só um rename vence: os outros trabalhadores recebem FileNotFoundError e tentam o próximo
+                os.rename(origem, destino)
+            except FileNotFoundError:
+                continue
+            try:
+                return TrabalhoSpool(destino, _ler_json(destino))
+            except ValueError as e:
+                self._mover_para_falhas(destino, {"id": id_trabalho}, f"Arquivo de trabalho inválido: {e}", trabalhador)
+        return None
+
+    def renovar(self, trabalho):
+        """Renova a concessão. Retorna False se o trabalho já não pertence a este trabalhador."""
+        try:
+            os.utime(trabalho.caminho)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _finalizar(self, origem, subpasta, dados):
+        destino = self._caminho(subpasta, f"{dados['id']}.json")
+        try:
+            os.rename(origem, destino) # Falha se a concessão expirou e o trabalho foi devolvido à fila
+        except FileNotFoundError:
+            return False
+        saida_atomica.substituir(destino, _json_bytes(dados))
+        return True
+
+    def _mover_para_falhas(self, origem, dados, erro, trabalhador):
+        return self._finalizar(origem, FALHAS, {**dados, "erro": erro, "trabalhador": trabalhador,
+                                                "finalizado_em": _agora()})
+
+    def concluir(self, trabalho, caminho_pdf, trabalhador):
+        """Registra o PDF gerado. Retorna False se a concessão tinha sido perdida."""
+        resultado = {"trabalhador": trabalhador, "finalizado_em": _agora()}
+        caminho_pdf = os.path.abspath(caminho_pdf)
+        try:
+            relativo = os.path.relpath(caminho_pdf, os.path.abspath(self.pasta))
+        except ValueError: # Outra unidade, no Windows
+            relativo = os.pardir
+        if relativo.split(os.sep, 1)[0] != os.pardir:
+            resultado["pdf_no_spool"] = "/".join(relativo.split(os.sep)) # Independe da montagem e do sistema
+        else:
+            resultado["caminho_pdf"] = caminho_pdf
+        return self._finalizar(trabalho.caminho, CONCLUIDOS, {**trabalho.dados, **resultado})
+
+    def falhar(self, trabalho, erro, trabalhador):
+        return self._mover_para_falhas(trabalho.caminho, trabalho.dados, erro, trabalhador)
+
+    def recolocar_expirados(self):
+        """Devolve à fila os trabalhos cuja concessão expirou. Retorna quantos foram devolvidos."""
+        devolvidos = 0
+        agora = time.time()
+        for nome in self._arquivos(EM_ANDAMENTO):
+            origem = self._caminho(EM_ANDAMENTO, nome)
+            try:
+                if agora - os.stat(origem).st_mtime <= self.tempo_concessao:
+                    continue
+            except FileNotFoundError:
+                continue
+            # Reivindica o trabalho abandonado para si antes de reescrevê-lo (outro trabalhador pode estar fazendo o mesmo)
+            retido = self._caminho(EM_ANDAMENTO, f".{nome}.recolocando")
+            try:
+                os.rename(origem, retido)
+            except FileNotFoundError:
+                continue
+            try:
+                dados = _ler_json(retido)
+            except ValueError:
+                dados = {"id": nome.split("@", 1)[0]}
+            dados["tentativas"] = dados.get("tentativas", 0) + 1
+            if dados["tentativas"] >= self.max_tentativas:
+                self._finalizar(retido, FALHAS, {**dados, "erro": f"Trabalho abandonado {dados['tentativas']} vezes "
+                                                                  "(o trabalhador parou de responder).",
+                                                 "finalizado_em": _agora()})
+            else:
+                saida_atomica.substituir(self._caminho(PENDENTES, f"{dados['id']}.json"), _json_bytes(dados))
+                os.remove(retido)
+            devolvidos += 1
+        return devolvidos
+
+    def carregar_modelo(self, hash_modelo):
+        """Bytes do modelo de um trabalho (lidos da pasta da fila uma vez por processo)."""
+        docx_bytes = self._modelos.get(hash_modelo)
+        if docx_bytes is None:
+            with open(self._caminho(MODELOS, f"{hash_modelo}.docx"), "rb") as f:
+                docx_bytes = f.read()
+            if len(self._modelos) >= LIMITE_MODELOS_EM_MEMORIA:
+                del self._modelos[next(iter(self._modelos))]
+            self._modelos[hash_modelo] = docx_bytes
+        return docx_bytes
+
+
+def _manter_concessao(fila, trabalho, terminou):
+    while not terminou.wait(fila.tempo_concessao / 3):
+        if not fila.renovar(trabalho):
+            return
+
+def processar(fila, trabalho, trabalhador, pasta_saida, conversor=None):
+    """
+    Gera a declaração de um trabalho reivindicado, renovando a concessão
+    enquanto isso. O PDF só é publicado depois de confirmada a concessão: se
+    ela tiver sido perdida (o trabalhador ficou sem acesso à pasta por mais
+    que o tempo de concessão), nada fica na pasta de saída, e retorna False:
+    o trabalho já voltou para a fila e será gerado de novo. O trabalhador não
+    indexa a declaração; quem a pediu o faz (ver aguardar_e_indexar).
+    """
+    dados = trabalho.dados
+    renderizador = dados.get("renderizador", RENDERIZADOR_PADRAO)
+    modo = dados.get("modo", MODO_PADRAO)
+    terminou = threading.Event()
+    renovacao = threading.Thread(target=_manter_concessao, args=(fila, trabalho, terminou), daemon=True)
+    renovacao.start()
+    try:
+        with metricas_etapas.medir("declaracao", modo=modo):
+            docx_bytes = fila.carregar_modelo(dados["modelo"])
+            pdf_bytes = gerar_pdf_bytes(docx_bytes, dados["registro"], renderizador=renderizador,
+                                        conversor=conversor, modo=modo)
+    except Exception as e:
+        terminou.set()
+        fila.falhar(trabalho, f"{type(e).__name__}: {e}", trabalhador)
+        return False
+    terminou.set()
+    if not fila.renovar(trabalho):
+        return False # Concessão perdida durante a geração: outro trabalhador gera a declaração
+    caminho_pdf = publicar_declaracao(pdf_bytes, dados["registro"], docx_bytes, pasta_saida, renderizador,
+                                      indexar=False)
+    if not fila.concluir(trabalho, caminho_pdf, trabalhador):
+        os.remove(caminho_pdf) # Perdida entre a renovação e a conclusão: não deixa um PDF duplicado
+        return False
+    return True
+
+def trabalhar(pasta_spool, pasta_saida=None, conversor=None, tempo_concessao=TEMPO_CONCESSAO_PADRAO,
+              parar=None, intervalo=INTERVALO_CONSULTA):
+    """
+    Laço de um trabalhador: devolve à fila os trabalhos abandonados, reivindica
+    o próximo, gera e registra o resultado, até 'parar' (threading.Event ou
+    multiprocessing.Event) ser sinalizado.
+    """
+    fila = FilaSpool(pasta_spool, tempo_concessao)
+    trabalhador = identificacao_trabalhador()
+    pasta_saida = pasta_saida or os.path.join(pasta_spool, SAIDA)
+    configurar_log_etapas()
+    proxima_verificacao = 0.0
+    while parar is None or not parar.is_set():
+        if time.monotonic() >= proxima_verificacao:
+            fila.recolocar_expirados()
+            proxima_verificacao = time.monotonic() + tempo_concessao / 2
+        trabalho = fila.reivindicar(trabalhador)
+        if trabalho is None:
+            if parar is not None:
+                parar.wait(intervalo)
+            else:
+                time.sleep(intervalo)
+            continue
+        processar(fila, trabalho, trabalhador, pasta_saida, conversor)
+
+
+def _processo_trabalhador(*args):
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # O processo principal trata o Ctrl+C e sinaliza 'parar'
+    trabalhar(*args)
+
+def aguardar_e_indexar(fila, id_trabalho, registro, hash_modelo, tempo_limite=None, ao_mudar=None):
+    """
+    Espera o trabalho (ver FilaSpool.aguardar) e registra a declaração no
+    índice desta máquina, com o caminho do PDF como ela o vê. Retorna esse caminho.
+    """
+    caminho_pdf = fila.aguardar(id_trabalho, tempo_limite, ao_mudar=ao_mudar)
+    indexar_declaracao(caminho_pdf, registro, hash_modelo)
+    return caminho_pdf
+
+def gerar_via_spool(pasta_spool, docx_bytes, registro, ao_progredir=None, tempo_limite=None):
+    """
+    Envia a declaração para a fila em 'pasta_spool', espera um trabalhador
+    gerá-la e a indexa nesta máquina. Retorna o caminho do PDF (na pasta de
+    saída do trabalhador).
+    Lança TimeoutError após 'tempo_limite' segundos (por exemplo, se nenhum
+    trabalhador estiver atendendo a fila); se o trabalho ainda não tinha sido
+    reivindicado, ele é retirado da fila.
+    """
+    fila = FilaSpool(pasta_spool)
+    id_trabalho = fila.enviar(registro, docx_bytes)
+    mensagens = {"pendente": (20, "Aguardando um trabalhador da fila..."),
+                 "em_andamento": (50, "Em geração por um trabalhador da fila...")}
+
+    def ao_mudar(estado):
+        if ao_progredir is not None and estado in mensagens:
+            ao_progredir(*mensagens[estado])
+
+    try:
+        return aguardar_e_indexar(fila, id_trabalho, registro, armazenamento_modelo.calcular_hash(docx_bytes),
+                                  tempo_limite, ao_mudar)
+    except TimeoutError:
+        if fila.cancelar(id_trabalho):
+            raise TimeoutError(f"Nenhum trabalhador da fila atendeu a declaração em {tempo_limite} segundos.") from None
+        raise
+
+
+def main(argv=None):
+    import multiprocessing
+    from conversores import CONVERSORES
+    parser = argparse.ArgumentParser(description="Fila de geração de declarações em uma pasta compartilhada.")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    trabalhador = comandos.add_parser("trabalhador", help="Processa os trabalhos da fila até Ctrl+C.")
+    trabalhador.add_argument("--spool", required=True, help="Pasta da fila (local ou compartilhada).")
+    trabalhador.add_argument("--processos", type=int, default=1, help="Trabalhadores nesta máquina (padrão: %(default)s).")
+    trabalhador.add_argument("--saida", default=None, help="Pasta dos PDFs (padrão: <spool>/saida).")
+    trabalhador.add_argument("--conversor", choices=sorted(CONVERSORES), default=None,
+                             help="Backend de conversão DOCX->PDF ('falso' para testes sem Office).")
+    trabalhador.add_argument("--concessao", type=float, default=TEMPO_CONCESSAO_PADRAO,
+                             help="Segundos sem renovação até um trabalho voltar para a fila (padrão: %(default)s).")
+
+    enviar = comandos.add_parser("enviar", help="Coloca na fila as declarações de um arquivo de registros.")
+    enviar.add_argument("--spool", required=True, help="Pasta da fila.")
+    enviar.add_argument("entrada", help="Arquivo .csv, .xlsx, .jsonl ou .json com os registros.")
+    origem_modelo = enviar.add_mutually_exclusive_group()
+    origem_modelo.add_argument("--modelo", default=None, help="Arquivo .docx do modelo (padrão: modelo importado).")
+    origem_modelo.add_argument("--tipo", default=None, help="Nome de um modelo importado no registro.")
+    enviar.add_argument("--aguardar", action="store_true", help="Espera todas as declarações ficarem prontas.")
+
+    estado = comandos.add_parser("estado", help="Mostra quantos trabalhos há em cada etapa.")
+    estado.add_argument("--spool", required=True, help="Pasta da fila.")
+    args = parser.parse_args(argv)
+
+    if args.comando == "estado":
+        for subpasta, quantidade in FilaSpool(args.spool).contagem().items():
+            print(f"{subpasta:<14} {quantidade}")
+        return 0
+
+    if args.comando == "trabalhador":
+        parar = multiprocessing.Event()
+        processos = [multiprocessing.Process(target=_processo_trabalhador, name=f"trabalhador-{numero}",
+                                             args=(args.spool, args.saida, args.conversor, args.concessao, parar))
+                     for numero in range(max(1, args.processos))]
+        for processo in processos:
+            processo.start()
+        print(f"{len(processos)} trabalhador(es) atendendo a fila em '{args.spool}' (Ctrl+C para encerrar).")
+        try:
+            for processo in processos:
+                processo.join()
+        except KeyboardInterrupt:
+            parar.set() # Cada trabalhador termina a declaração em andamento antes de sair
+            for processo in processos:
+                processo.join()
+        return 0
+
+    from entrada_lote import ErroEntrada, iterar_registros
+    from motor_declaracao import carregar_docx_bytes, obter_registro
+    try:
+        docx_bytes = obter_registro().obter(args.tipo).docx_bytes if args.tipo else carregar_docx_bytes(args.modelo)
+    except Exception as e:
+        print(f"Erro ao carregar o modelo DOCX: {e}", file=sys.stderr)
+        return 2
+    fila = FilaSpool(args.spool)
+    hash_modelo = armazenamento_modelo.calcular_hash(docx_bytes)
+    enviados = []
+    falhas = 0
+    try:
+        for indice, registro in iterar_registros(args.entrada):
+            try:
+                enviados.append((indice, registro, fila.enviar(registro, docx_bytes)))
+            except ValueError as e:
+                falhas += 1
+                print(f"ERRO [{indice}] {e}", file=sys.stderr)
+    except (ErroEntrada, OSError) as e:
+        print(f"Erro ao ler '{args.entrada}': {e}", file=sys.stderr)
+        return 2
+    print(f"{len(enviados)} declarações enviadas para a fila em '{args.spool}'.")
+    if args.aguardar:
+        for indice, registro, id_trabalho in enviados:
+            try:
+                print(f"OK   [{indice}] {aguardar_e_indexar(fila, id_trabalho, registro, hash_modelo)}")
+            except ErroSpool as e:
+                falhas += 1
+                print(f"ERRO [{indice}] {e}", file=sys.stderr)
+    return 1 if falhas else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
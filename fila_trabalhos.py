@@ -0,0 +1,142 @@
+# Ethyïos
+# Fila de trabalhos executados em threads de segundo plano. Usada pela GUI
+# para gerar declarações sem travar a janela: o Tk nunca é chamado a partir
+# destas threads; cada mudança de estado é entregue ao callback 'ao_atualizar',
+# que a GUI repassa para o loop do Tk (via queue + after()).
+import queue
+import itertools
+import threading
+
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDO = "concluído"
+ERRO = "erro"
+CANCELADO = "cancelado"
+ESTADOS_FINAIS = (CONCLUIDO, ERRO, CANCELADO)
+
+
+class Trabalho:
+    """Um item da fila, com estado e progresso (0 a 100)."""
+
+    def __init__(self, id, dados):
+        self.id = id
+        self.dados = dados
+        self.estado = PENDENTE
+        self.progresso = 0
+        self.mensagem = "Na fila..."
+        self.resultado = None
+        self.erro = None
+
+    @property
+    def finalizado(self):
+        return self.estado in ESTADOS_FINAIS
+
+
+class FilaTrabalhos:
+    """
+    Executa 'executar(trabalho, ao_progredir)' para cada trabalho adicionado,
+    em 'trabalhadores' threads. 'ao_progredir(percentual, mensagem)' atualiza o
+    progresso do trabalho. 'ao_atualizar(trabalho)' é chamado (na thread do
+    trabalhador ou de quem cancelou) sempre que um trabalho muda.
+    """
+
+    def __init__(self, executar, trabalhadores=1, ao_atualizar=None):
+        self._executar = executar
+        self._ao_atualizar = ao_atualizar
+        self._fila = queue.Queue()
+        self._trava = threading.Lock()
+        self._ids = itertools.count(1)
+        self.trabalhos = {}
+        self._threads = []
+        for numero in range(max(1, trabalhadores)):
+            thread = threading.Thread(target=self._laco, name=f"trabalhador-{numero + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _notificar(self, trabalho):
+        if self._ao_atualizar is not None:
+            self._ao_atualizar(trabalho)
+
+    def adicionar(self, dados):
+        """Coloca um novo trabalho na fila e o retorna."""
+        with self._trava:
+            trabalho = Trabalho(next(self._ids), dados)
+            self.trabalhos[trabalho.id] = trabalho
+        self._notificar(trabalho)
+        self._fila.put(trabalho)
+        return trabalho
+
+    def cancelar(self, id):
+        """Cancela um trabalho pendente. Trabalhos já em execução não são interrompidos."""
+        with self._trava:
+            trabalho = self.trabalhos.get(id)
+            if trabalho is None or trabalho.estado != PENDENTE:
+                return False
+            trabalho.estado = CANCELADO
+            trabalho.mensagem = "Cancelado."
+        self._notificar(trabalho)
+        return True
+
+    def cancelar_pendentes(self):
+        """Cancela todos os trabalhos pendentes; retorna quantos foram cancelados."""
+        with self._trava:
+            pendentes = [t.id for t in self.trabalhos.values() if t.estado == PENDENTE]
+        return sum(1 for id in pendentes if self.cancelar(id))
+
+    def esquecer(self, id):
+        """Remove um trabalho finalizado da lista (para filas de longa duração, como a do servidor)."""
+        with self._trava:
+            trabalho = self.trabalhos.get(id)
+            if trabalho is not None and trabalho.finalizado:
+                del self.trabalhos[id]
+
+    def contagem(self):
+        """Quantidade de trabalhos em cada estado."""
+        with self._trava:
+            contagem = dict.fromkeys((PENDENTE, EXECUTANDO) + ESTADOS_FINAIS, 0)
+            for trabalho in self.trabalhos.values():
+                contagem[trabalho.estado] += 1
+            return contagem
+
+    def ocupada(self):
+        """True enquanto houver trabalhos pendentes ou em execução."""
+        with self._trava:
+            return any(not t.finalizado for t in self.trabalhos.values())
+
+    def encerrar(self):
+        """Cancela o que está pendente e pede às threads que terminem."""
+        self.cancelar_pendentes()
+        for _ in self._threads:
+            self._fila.put(None)
+
+    def _laco(self):
+        while True:
+            trabalho = self._fila.get()
+            if trabalho is None:
+                return
+            with self._trava:
+                if trabalho.estado != PENDENTE: # Cancelado enquanto esperava
+                    continue
+                trabalho.estado = EXECUTANDO
+                trabalho.mensagem = "Iniciando processo..."
+            self._notificar(trabalho)
+
+            def ao_progredir(valor, mensagem, trabalho=trabalho):
+                trabalho.progresso = valor
+                trabalho.mensagem = mensagem
+                self._notificar(trabalho)
+
+            try:
+                resultado = self._executar(trabalho, ao_progredir)
+            except Exception as e:
+                with self._trava:
+                    trabalho.estado = ERRO
+                    trabalho.erro = e
+                    trabalho.mensagem = f"Erro: {e}"
+            else:
+                with self._trava:
+                    trabalho.estado = CONCLUIDO
+                    trabalho.resultado = resultado
+                    trabalho.progresso = 100
+                    trabalho.mensagem = "Declaração gerada com sucesso!"
+            self._notificar(trabalho)
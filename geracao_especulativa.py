@@ -0,0 +1,96 @@
+# Ethyïos
+# Geração especulativa da GUI: quando todos os campos estão preenchidos e a
+# digitação pausa, a declaração com os valores atuais é gerada em segundo
+# plano (só os bytes do PDF; nada é gravado na pasta de saída). Se, ao clicar
+# em gerar, os valores forem os mesmos, o PDF já está pronto (ou a caminho);
+# se mudaram, a geração antiga é cancelada na próxima etapa do pipeline
+# (uma conversão já iniciada não pode ser interrompida; o resultado é descartado).
+import threading
+
+
+class EspeculacaoCancelada(Exception):
+    """A geração especulativa ficou obsoleta (os campos mudaram)."""
+
+
+class Especulacao:
+    """Uma geração em segundo plano para os valores identificados por 'chave'."""
+
+    def __init__(self, chave):
+        self.chave = chave
+        self.cancelada = False
+        self.pdf_bytes = None
+        self.erro = None
+        self._terminou = threading.Event()
+
+    @property
+    def terminou(self):
+        return self._terminou.is_set()
+
+    def aguardar(self, tempo_limite=None):
+        """Espera a geração terminar. Retorna os bytes do PDF, ou None se ela foi cancelada ou falhou."""
+        self._terminou.wait(tempo_limite)
+        return self.pdf_bytes
+
+
+class GeradorEspeculativo:
+    """
+    Mantém no máximo uma especulação. 'gerar(dados, ao_progredir)' retorna os
+    bytes do PDF (ver motor_declaracao.gerar_pdf_bytes). 'trava' é compartilhada
+    com a geração normal, para que o conversor receba um documento por vez.
+    """
+
+    def __init__(self, gerar, trava=None):
+        self._gerar = gerar
+        self._trava_geracao = trava or threading.Lock()
+        self._trava = threading.Lock()
+        self._atual = None
+
+    def _descartar_atual(self):
+        if self._atual is not None:
+            self._atual.cancelada = True
+            self._atual = None
+
+    def iniciar(self, chave, dados):
+        """Começa a gerar 'dados' em segundo plano, cancelando a especulação de outra chave."""
+        with self._trava:
+            if self._atual is not None and self._atual.chave == chave:
+                return self._atual # Já em andamento (ou pronta) para os mesmos valores
+            self._descartar_atual()
+            especulacao = self._atual = Especulacao(chave)
+        threading.Thread(target=self._executar, args=(especulacao, dados), name="especulacao", daemon=True).start()
+        return especulacao
+
+    def cancelar(self, exceto_chave=None):
+        """Cancela a especulação atual (a menos que seja para 'exceto_chave')."""
+        with self._trava:
+            if self._atual is not None and self._atual.chave != exceto_chave:
+                self._descartar_atual()
+
+    def tomar(self, chave):
+        """
+        Retira e retorna a especulação de 'chave' (pronta ou ainda em
+        andamento), ou None se não houver uma utilizável; uma especulação de
+        outra chave é cancelada.
+        """
+        with self._trava:
+            especulacao, self._atual = self._atual, None
+            if especulacao is None:
+                return None
+            if especulacao.chave != chave or (especulacao.terminou and especulacao.pdf_bytes is None):
+                especulacao.cancelada = True
+                return None
+            return especulacao
+
+    def _executar(self, especulacao, dados):
+        def ao_progredir(valor, mensagem):
+            if especulacao.cancelada:
+                raise EspeculacaoCancelada()
+
+        try:
+            with self._trava_geracao:
+                ao_progredir(0, "") # Pode ter ficado obsoleta enquanto esperava a geração normal
+                especulacao.pdf_bytes = self._gerar(dados, ao_progredir)
+        except Exception as e:
+            especulacao.erro = e # A geração normal é feita ao clicar, e mostra o erro
+        finally:
+            especulacao._terminou.set()
@@ -1,15 +1,16 @@
 # Ethyïos
+import time
+INICIO_APLICACAO = time.perf_counter() # Referência para medir o tempo de inicialização
+
 import tkinter as tk
 from tkinter import ttk, messagebox
 import os
 import datetime
 import sys
+import json
+import queue
+import threading
 import subprocess
-from docx import Document
-from docx2pdf import convert
-import io
-import importlib
-import importlib.util # Adicionado para importação dinâmica
 
 # Redirect stdout/stderr if they are None (common in PyInstaller --noconsole apps)
 # This should be one of the very first things the application does.
@@ -18,56 +19,53 @@ if sys.stdout is None:
 if sys.stderr is None:
     sys.stderr = open(os.devnull, 'w')
 
-# --- Constantes para o modelo ---
-HIDDEN_FOLDER_NAME = "._modelo_data"
-MODEL_BASENAME = "declaracao_base_bytes.py"
+# --- Pipeline de geração (compartilhado com o modo em lote) ---
+from motor_declaracao import (
+    HIDDEN_FOLDER_NAME, MODEL_BASENAME, OUTPUT_FOLDER_NAME,
+    ErroModelo, configurar_log_etapas, gerar_documento_pdf, gerar_pdf_bytes, obter_registro,
+    publicar_declaracao, validar_registro,
+)
+from indice_declaracoes import data_iso
+from geracao_especulativa import GeradorEspeculativo
+from registro_modelos import NOME_PADRAO
+from conversores import obter_conversor
+from fila_trabalhos import FilaTrabalhos, EXECUTANDO, CONCLUIDO, ERRO
+
+# --- Orçamento de tempo de inicialização (segundos desde o início do processo) ---
+# "janela": a janela principal aparece; "pronto": modelo carregado e compilado e
+# conversor inicializado em segundo plano. Execute com --medir-inicializacao
+# para imprimir os tempos em JSON e sair com código 1 se o orçamento for excedido.
+ORCAMENTO_INICIALIZACAO = {"janela": 1.0, "pronto": 10.0}
+MARCOS_INICIALIZACAO = {}
+MEDIR_INICIALIZACAO = "--medir-inicializacao" in sys.argv
+
+def registrar_marco(nome):
+    MARCOS_INICIALIZACAO.setdefault(nome, round(time.perf_counter() - INICIO_APLICACAO, 4))
+
+def relatorio_inicializacao():
+    """Tempos medidos, orçamento e se cada marco ficou dentro do orçamento."""
+    dentro = {nome: nome in MARCOS_INICIALIZACAO and MARCOS_INICIALIZACAO[nome] <= limite
+              for nome, limite in ORCAMENTO_INICIALIZACAO.items()}
+    return {"tempos": MARCOS_INICIALIZACAO, "orcamento": ORCAMENTO_INICIALIZACAO,
+            "dentro_do_orcamento": all(dentro.values()), "por_marco": dentro}
 
 # --- Importar função da GUI do importador e carregar bytes iniciais ---
 DOCX_BYTES = None # Inicializa como None
-
-def get_application_path():
-    """Retorna o caminho base da aplicação, seja script ou executável."""
-    if getattr(sys, 'frozen', False): # Rodando como bundle PyInstaller
-        return os.path.dirname(sys.executable)
-    else: # Rodando como script
-        return os.path.dirname(os.path.abspath(__file__))
-
-def _load_module_from_path(module_name, file_path):
-    """Carrega um módulo dinamicamente a partir de um caminho de arquivo."""
-    spec = importlib.util.spec_from_file_location(module_name, file_path)
-    if spec is None:
-        raise ImportError(f"Não foi possível encontrar o spec para {module_name} em {file_path}")
-    module = importlib.util.module_from_spec(spec)
-    sys.modules[module_name] = module # Adiciona ao sys.modules ANTES de executar
-    spec.loader.exec_module(module)
-    return module
+DOCX_HASH = None # Hash do modelo carregado (do manifesto), para recarregar só quando mudar
+MODELO_ATUAL = NOME_PADRAO # Nome do modelo selecionado no registro (tipo de declaração)
 
 def carregar_docx_bytes_inicialmente():
-    global DOCX_BYTES
-    app_path = get_application_path()
-    model_dir_path = os.path.join(app_path, HIDDEN_FOLDER_NAME)
-    model_file_path = os.path.join(model_dir_path, MODEL_BASENAME)
-    module_name_to_load = "declaracao_base_bytes_dinamico" # Nome único para evitar conflitos
-
+    global DOCX_BYTES, DOCX_HASH
     try:
-        # Garante que o diretório do modelo esteja no sys.path para importação direta se necessário
-        # ou para que o importlib.util.spec_from_file_location funcione corretamente.
-        # No entanto, para PyInstaller, é mais robusto carregar explicitamente pelo caminho.
-        
-        if not os.path.exists(model_file_path):
-            DOCX_BYTES = None
-            # print(f"DEBUG: Arquivo do modelo '{model_file_path}' não encontrado na carga inicial.")
-            return
-
-        # Remove o módulo antigo se existir para forçar o recarregamento do arquivo
-        if module_name_to_load in sys.modules:
-            del sys.modules[module_name_to_load]
-        
-        reloaded_module = _load_module_from_path(module_name_to_load, model_file_path)
-        DOCX_BYTES = reloaded_module.DOCX_BYTES
+        # O registro compila o modelo ao carregá-lo; os demais modelos são carregados quando selecionados
+        modelo = obter_registro().obter(MODELO_ATUAL)
+        DOCX_BYTES, DOCX_HASH = modelo.docx_bytes, modelo.hash
+    except FileNotFoundError:
+        DOCX_BYTES = None
+        # print(f"DEBUG: Arquivo do modelo não encontrado na carga inicial.")
     except ImportError:
         DOCX_BYTES = None
-        # print(f"DEBUG: Falha ao importar '{MODEL_BASENAME}' de '{model_dir_path}' na carga inicial.")
+        # print(f"DEBUG: Falha ao importar '{MODEL_BASENAME}' na carga inicial.")
     except AttributeError:
         DOCX_BYTES = None
         # print(f"DEBUG: 'DOCX_BYTES' não encontrado em '{MODEL_BASENAME}' na carga inicial.")
@@ -75,142 +73,127 @@ def carregar_docx_bytes_inicialmente():
         DOCX_BYTES = None
         # print(f"DEBUG: Erro inesperado ao carregar DOCX_BYTES inicialmente: {e}")
 
-carregar_docx_bytes_inicialmente() # Tenta carregar ao iniciar o script
+# --- Aquecimento em segundo plano ---
+# O modelo é carregado e compilado pelo registro (importando lxml/python-docx) e o
+# conversor é inicializado em uma thread, depois que a janela já está visível.
+fila_aquecimento = queue.Queue()
+aquecimento = None
+
+def _aquecer():
+    # Sem console no executável, os tempos de cada etapa ficam em ._modelo_data/logs/ (um arquivo por processo)
+    configurar_log_etapas()
+    carregar_docx_bytes_inicialmente()
+    try:
+        obter_conversor()
+    except Exception:
+        pass # Idem: o conversor é criado de novo na geração
+    fila_aquecimento.put("pronto")
+
+def iniciar_aquecimento():
+    global aquecimento
+    aquecimento = threading.Thread(target=_aquecer, name="aquecimento", daemon=True)
+    aquecimento.start()
+    app.after(50, verificar_aquecimento)
+
+def verificar_aquecimento():
+    try:
+        fila_aquecimento.get_nowait()
+    except queue.Empty:
+        app.after(50, verificar_aquecimento)
+        return
+    registrar_marco("pronto")
+    combo_modelo["values"] = obter_registro().nomes() or [NOME_PADRAO]
+    if DOCX_BYTES is None:
+        status_label.config(text="Modelo DOCX não encontrado. Use o botão de importação.")
+    else:
+        status_label.config(text="Preencha os campos e clique em gerar.")
+    if MEDIR_INICIALIZACAO:
+        print(json.dumps(relatorio_inicializacao(), ensure_ascii=False))
+        app.destroy()
+
+def aguardar_aquecimento():
+    """Garante que o carregamento inicial terminou antes de usar DOCX_BYTES."""
+    if aquecimento is not None and aquecimento.is_alive():
+        status_label.config(text="Aguarde, carregando o modelo...")
+        app.update_idletasks()
+        aquecimento.join()
 
 try:
     from importar_declaracao import iniciar_interface_importador
 except ImportError:
-    def iniciar_interface_importador(): # Fallback se o import falhar
+    def iniciar_interface_importador(nome_modelo=NOME_PADRAO): # Fallback se o import falhar
         messagebox.showerror("Erro Crítico",
                              "Não foi possível encontrar o módulo 'importar_declaracao.py'.\n"
                              "A funcionalidade de importação de modelo não está disponível.")
+        return None
     # print("DEBUG: Falha ao importar 'iniciar_interface_importador' de 'importar_declaracao'.")
 
 
-# --- Configuração ---
-OUTPUT_FOLDER_NAME = "declaracoes_geradas"
-PLACEHOLDERS = {
-    "nome_responsavel": "{{NOME_RESPONSAVEL}}",
-    "nome_filho": "{{NOME_FILHO}}",
-    "serie": "{{SERIE}}",
-    "data": "{{DATA}}",
-    "periodo": "{{PERIODO}}"  # Novo placeholder
-}
-
-def formatar_data_por_extenso(data_str):
-    """Converte uma data de 'DD/MM/AAAA' para 'DD de [mês] de AAAA'."""
-    try:
-        dia, mes_num, ano = data_str.split('/')
-        meses = {
-            "01": "janeiro",
-            "02": "fevereiro",
-            "03": "março",
-            "04": "abril",
-            "05": "maio", 
-            "06": "junho",
-            "07": "julho",
-            "08": "agosto",
-            "09": "setembro",
-            "10": "outubro",
-            "11": "novembro",
-            "12": "dezembro"
-        }
-        mes_extenso = meses.get(mes_num, "")
-        if not mes_extenso:
-            return data_str # Retorna original se o mês for inválido
-        return f"{dia} de {mes_extenso} de {ano}"
-    except ValueError:
-        # Retorna a string original se o formato for inesperado
-        return data_str
-
-def apply_replacements(doc, replacements):
+def recarregar_modelo_docx(avisar=True):
     """
-    Substitui os placeholders no documento (parágrafos e tabelas).
-    'replacements' é um dicionário como {'{{PLACEHOLDER}}': 'Valor Real'}
+    Recarrega o modelo selecionado pelo registro (que só relê os arquivos se
+    mudaram). Com 'avisar', mostra uma mensagem quando o modelo foi trocado.
     """
-    # Substitui nos parágrafos do corpo principal
-    for p in doc.paragraphs:
-        original_text = p.text
-        modified_text = original_text
-        for placeholder, value in replacements.items():
-            # Garante que o valor da substituição seja uma string
-            modified_text = modified_text.replace(placeholder, str(value))
-        
-        if original_text != modified_text:
-            # Atribuir a p.text substitui todo o conteúdo do parágrafo.
-            # Isso lida com placeholders divididos em várias 'runs',
-            # mas pode simplificar a formatação de 'run' dentro do parágrafo.
-            p.text = modified_text
-
-    # Substitui nas tabelas
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for p_cell in cell.paragraphs:
-                    original_cell_text = p_cell.text
-                    modified_cell_text = original_cell_text
-                    for placeholder, value in replacements.items():
-                        modified_cell_text = modified_cell_text.replace(placeholder, str(value))
-                    
-                    if original_cell_text != modified_cell_text:
-                        p_cell.text = modified_cell_text
-
-def recarregar_modelo_docx():
-    global DOCX_BYTES
-    app_path = get_application_path()
-    model_dir_path = os.path.join(app_path, HIDDEN_FOLDER_NAME)
+    global DOCX_BYTES, DOCX_HASH
+    aguardar_aquecimento()
+    model_dir_path = obter_registro().pasta_do_modelo(MODELO_ATUAL)
     model_file_path = os.path.join(model_dir_path, MODEL_BASENAME)
-    module_name_to_load = "declaracao_base_bytes_dinamico" # Mesmo nome usado na carga inicial
 
     try:
-        if not os.path.exists(model_file_path):
-            DOCX_BYTES = None
-            messagebox.showerror("Erro ao Recarregar",
-                                 f"Arquivo '{MODEL_BASENAME}' não encontrado em '{model_dir_path}'.\n"
-                                 "Use o botão 'Importar/Atualizar Modelo DOCX'.")
-            status_label.config(text=f"Erro: '{MODEL_BASENAME}' não encontrado.")
+        modelo = obter_registro().obter(MODELO_ATUAL)
+        if DOCX_BYTES is not None and modelo.hash == DOCX_HASH:
+            # Mesmo hash do modelo já carregado: nada a fazer
+            status_label.config(text="O modelo DOCX não mudou; nada a recarregar.")
             app.update_idletasks()
-            return False
-
-        # Remove o módulo antigo se existir para forçar o recarregamento do arquivo
-        if module_name_to_load in sys.modules:
-            del sys.modules[module_name_to_load]
-
-        reloaded_module = _load_module_from_path(module_name_to_load, model_file_path)
-        DOCX_BYTES = reloaded_module.DOCX_BYTES
-        messagebox.showinfo("Sucesso", f"O modelo DOCX foi recarregado com sucesso de '{model_file_path}'.")
-        status_label.config(text="Modelo DOCX recarregado com os novos bytes.")
+            return True
+        DOCX_BYTES, DOCX_HASH = modelo.docx_bytes, modelo.hash
+        if avisar:
+            messagebox.showinfo("Sucesso", f"O modelo DOCX foi recarregado com sucesso de '{model_file_path}'.")
+        status_label.config(text=f"Modelo '{MODELO_ATUAL}' carregado.")
         app.update_idletasks()
         return True
+    except FileNotFoundError:
+        DOCX_BYTES = DOCX_HASH = None
+        messagebox.showerror("Erro ao Recarregar",
+                             f"Arquivo '{MODEL_BASENAME}' não encontrado em '{model_dir_path}'.\n"
+                             "Use o botão 'Importar/Atualizar Modelo DOCX'.")
+        status_label.config(text=f"Erro: '{MODEL_BASENAME}' não encontrado.")
+        app.update_idletasks()
+        return False
     except ImportError:
-        DOCX_BYTES = None
+        DOCX_BYTES = DOCX_HASH = None
         messagebox.showerror("Erro ao Recarregar",
-                             f"Não foi possível importar '{MODEL_BASENAME}' de '{model_dir_path}'.\n"
+                             f"Não foi possível ler o modelo antigo em '{model_dir_path}'.\n"
                              "Use o botão 'Importar/Atualizar Modelo DOCX'.")
-        status_label.config(text=f"Erro: Falha ao importar '{MODEL_BASENAME}'.")
+        status_label.config(text="Erro: Falha ao ler o modelo antigo.")
         app.update_idletasks()
         return False
     except AttributeError: # Se DOCX_BYTES não estiver no módulo recarregado
-        DOCX_BYTES = None
+        DOCX_BYTES = DOCX_HASH = None
         messagebox.showerror("Erro ao Recarregar",
-                             f"'DOCX_BYTES' não encontrado no arquivo '{MODEL_BASENAME}' (em '{model_dir_path}').\n"
+                             f"'DOCX_BYTES' não encontrado no modelo antigo (em '{model_dir_path}').\n"
                              "Verifique se o modelo foi importado corretamente ou importe novamente.")
         status_label.config(text="Erro: 'DOCX_BYTES' ausente no modelo importado.")
         app.update_idletasks()
         return False
     except Exception as e:
-        DOCX_BYTES = None
+        DOCX_BYTES = DOCX_HASH = None
         messagebox.showerror("Erro Inesperado", f"Ocorreu um erro inesperado ao recarregar o modelo: {e}")
         status_label.config(text=f"Erro ao recarregar modelo: {e}")
         app.update_idletasks()
         return False
 
 def abrir_janela_importador_e_recarregar():
+    global MODELO_ATUAL
     status_label.config(text="Abrindo interface para importação de modelo...")
     app.update_idletasks()
 
     # Chama a interface do importador (que é modal)
-    iniciar_interface_importador()
+    nome_importado = iniciar_interface_importador(MODELO_ATUAL)
+    if nome_importado:
+        MODELO_ATUAL = nome_importado # Passa a usar o modelo recém-importado
+    combo_modelo["values"] = obter_registro().nomes() or [NOME_PADRAO]
+    combo_modelo.set(MODELO_ATUAL)
 
     # Após o fechamento da janela do importador, tenta recarregar o modelo
     status_label.config(text="Tentando recarregar o modelo DOCX...")
@@ -218,113 +201,207 @@ def abrir_janela_importador_e_recarregar():
     recarregar_modelo_docx()
     # A função recarregar_modelo_docx já atualiza o status_label e mostra popups.
 
+def selecionar_modelo(event=None):
+    """Troca o tipo de declaração: o modelo já compilado no registro é usado de imediato."""
+    global MODELO_ATUAL
+    nome = combo_modelo.get()
+    if nome == MODELO_ATUAL:
+        return
+    MODELO_ATUAL = nome
+    recarregar_modelo_docx(avisar=False)
+    agendar_especulacao() # O PDF preparado era do modelo anterior
+
+# --- Fila de geração em segundo plano ---
+# As declarações são geradas em threads de trabalho (fila_trabalhos.FilaTrabalhos).
+# As threads nunca tocam no Tk: cada atualização é copiada para 'fila_eventos'
+# e aplicada na janela por processar_eventos(), agendada com app.after().
+TRABALHADORES_GUI = 1 # O conversor (Word/LibreOffice) processa um documento por vez
+TEMPO_LIMITE_SPOOL = 300 # Segundos esperando um trabalhador da fila compartilhada antes de dar erro
+INTERVALO_EVENTOS_MS = 100
+fila_eventos = queue.Queue()
+gerados_desde_abertura = 0 # Sucessos desde a última vez que a pasta foi aberta
+ultimo_pdf_gerado = None # Abre-se a subpasta <ano>/<mês> dele, não a pasta de saída inteira
+
+# O conversor recebe um documento por vez: a geração especulativa e a da fila se revezam
+trava_geracao = threading.Lock()
+
+def _executar_trabalho(trabalho, ao_progredir):
+    docx_bytes, registro, especulacao = trabalho.dados
+    if especulacao is not None:
+        # Gerada (ou em geração) durante o preenchimento do formulário, com estes mesmos valores
+        ao_progredir(60, "Concluindo o PDF preparado durante o preenchimento...")
+        pdf_bytes = especulacao.aguardar()
+        if pdf_bytes is not None:
+            return publicar_declaracao(pdf_bytes, registro, docx_bytes, OUTPUT_FOLDER_NAME)
+    pasta_spool = os.environ.get("DECLARACAO_SPOOL") # Ver fila_spool.VARIAVEL_SPOOL
+    if pasta_spool:
+        import fila_spool # Só carregado quando a geração é feita pelos trabalhadores da fila
+        return fila_spool.gerar_via_spool(pasta_spool, docx_bytes, registro, ao_progredir,
+                                          tempo_limite=TEMPO_LIMITE_SPOOL)
+    with trava_geracao:
+        return gerar_documento_pdf(docx_bytes, registro, OUTPUT_FOLDER_NAME, ao_progredir=ao_progredir)
+
+def _ao_atualizar_trabalho(trabalho):
+    # Executado na thread de trabalho: só copia o estado para a fila de eventos
+    fila_eventos.put((trabalho.id, trabalho.dados[1]["nome_filho"], trabalho.estado,
+                      trabalho.progresso, trabalho.mensagem, trabalho.resultado, trabalho.erro))
+
+fila_geracao = FilaTrabalhos(_executar_trabalho, TRABALHADORES_GUI, _ao_atualizar_trabalho)
+
+# --- Geração especulativa (opcional) ---
+# Com a opção marcada, quando todos os campos estão válidos e a digitação pausa
+# por ESPERA_ESPECULACAO_MS, a declaração começa a ser gerada em segundo plano;
+# ao clicar em gerar com os mesmos valores, o PDF já está pronto. Qualquer
+# mudança nos campos (ou no modelo) cancela a geração antiga.
+ESPERA_ESPECULACAO_MS = 800
+especulador = GeradorEspeculativo(lambda dados, ao_progredir: gerar_pdf_bytes(*dados, ao_progredir),
+                                  trava_geracao)
+agendamento_especulacao = None
+
+def ler_formulario():
+    return {
+        "nome_responsavel": entry_nome_responsavel.get(),
+        "nome_filho": entry_nome_filho.get(),
+        "serie": entry_serie.get(),
+        "data": entry_data.get(),
+        "periodo": entry_periodo.get(),
+    }
+
+def chave_especulacao(registro):
+    return (DOCX_HASH, tuple(sorted(registro.items())))
+
+def agendar_especulacao(event=None):
+    """Chamado a cada mudança no formulário: cancela a especulação obsoleta e reinicia a espera."""
+    global agendamento_especulacao
+    if agendamento_especulacao is not None:
+        app.after_cancel(agendamento_especulacao)
+        agendamento_especulacao = None
+    if especular_var.get():
+        especulador.cancelar(exceto_chave=chave_especulacao(ler_formulario()))
+        agendamento_especulacao = app.after(ESPERA_ESPECULACAO_MS, iniciar_especulacao)
+    else:
+        especulador.cancelar()
+
+def iniciar_especulacao():
+    global agendamento_especulacao
+    agendamento_especulacao = None
+    registro = ler_formulario()
+    if (not especular_var.get() or validar_registro(registro) or data_iso(registro["data"]) is None
+            or DOCX_BYTES is None or (aquecimento is not None and aquecimento.is_alive())
+            or os.environ.get("DECLARACAO_SPOOL")):
+        return # Formulário incompleto, modelo ainda não carregado, ou geração feita pela fila compartilhada
+    if fila_geracao.ocupada():
+        # Não disputa o conversor com as declarações já pedidas: tenta de novo depois
+        agendamento_especulacao = app.after(ESPERA_ESPECULACAO_MS, iniciar_especulacao)
+        return
+    especulador.iniciar(chave_especulacao(registro), (DOCX_BYTES, registro))
+
+def abrir_pasta_saida():
+    # 7. Abre a subpasta da última declaração gerada (a pasta de saída acumula anos de declarações)
+    output_dir_abs_path = os.path.abspath(os.path.dirname(ultimo_pdf_gerado) if ultimo_pdf_gerado
+                                          else OUTPUT_FOLDER_NAME)
+    try:
+        if sys.platform == "win32": # Para Windows
+            os.startfile(output_dir_abs_path)
+        elif sys.platform == "darwin": # Para macOS
+             subprocess.run(['open', output_dir_abs_path], check=True)
+        else: # Para Linux e outros Unix-like (assumindo xdg-utils)
+             subprocess.run(['xdg-open', output_dir_abs_path], check=True)
+    except Exception as e_open:
+        messagebox.showwarning("Aviso", "A declaração foi gerada, mas não foi possível abrir a pasta automaticamente.\n"
+                                       f"Você pode encontrá-la em: {output_dir_abs_path}")
+
+def processar_eventos():
+    """Aplica na janela as atualizações enviadas pelas threads de trabalho."""
+    global gerados_desde_abertura, ultimo_pdf_gerado
+    try:
+        while True:
+            id_trabalho, nome_filho, estado, progresso, mensagem, resultado, erro = fila_eventos.get_nowait()
+            valores = (nome_filho, estado, f"{progresso}%")
+            if lista_trabalhos.exists(id_trabalho):
+                lista_trabalhos.item(id_trabalho, values=valores)
+            else:
+                lista_trabalhos.insert("", tk.END, iid=id_trabalho, values=valores)
+
+            if estado == EXECUTANDO:
+                progress_bar['value'] = progresso
+                status_label.config(text=f"{nome_filho}: {mensagem}")
+            elif estado == CONCLUIDO:
+                progress_bar['value'] = 100
+                status_label.config(text=f"Declaração de {nome_filho} gerada: {resultado}")
+                gerados_desde_abertura += 1
+                ultimo_pdf_gerado = resultado
+            elif estado == ERRO:
+                progress_bar['value'] = 0
+                status_label.config(text="Erro ao gerar declaração.")
+                if isinstance(erro, ErroModelo):
+                    messagebox.showerror("Erro ao Carregar Modelo",
+                                         f"Não foi possível carregar o modelo DOCX a partir dos dados importados: {erro}\n"
+                                         f"Verifique se o arquivo '{MODEL_BASENAME}' (em '{HIDDEN_FOLDER_NAME}') foi gerado corretamente.")
+                elif isinstance(erro, TimeoutError): # Fila compartilhada (DECLARACAO_SPOOL) sem trabalhadores
+                    messagebox.showerror("Fila Compartilhada Sem Resposta",
+                                         f"A declaração de {nome_filho} não ficou pronta: {erro}\n"
+                                         "Verifique se há trabalhadores atendendo a fila em "
+                                         f"'{os.environ.get('DECLARACAO_SPOOL')}'.")
+                else:
+                    messagebox.showerror("Erro Inesperado",
+                                         f"Ocorreu um erro durante a geração da declaração de {nome_filho}:\n{erro}")
+    except queue.Empty:
+        pass
+
+    # Quando a fila esvazia, abre a pasta uma única vez para o conjunto gerado
+    if gerados_desde_abertura and not fila_geracao.ocupada():
+        total = gerados_desde_abertura
+        gerados_desde_abertura = 0
+        status_label.config(text=f"{total} declaração(ões) gerada(s) com sucesso!")
+        abrir_pasta_saida()
+    app.after(INTERVALO_EVENTOS_MS, processar_eventos)
+
 def gerar_declaracao():
-    nome_responsavel = entry_nome_responsavel.get()
-    nome_filho = entry_nome_filho.get()
-    serie = entry_serie.get()
-    data_declaracao = entry_data.get()
-    periodo = entry_periodo.get() # Novo campo
+    """Valida o formulário e coloca a declaração na fila de geração."""
+    global DOCX_BYTES, DOCX_HASH
+    registro = ler_formulario()
 
-    if not all([nome_responsavel, nome_filho, serie, data_declaracao, periodo]): # Adicionado periodo à validação
+    if validar_registro(registro): # Mesma validação do modo em lote: campos só com espaços não valem
         messagebox.showerror("Erro de Validação", "Todos os campos são obrigatórios!")
         return
 
-    progress_bar['value'] = 0
-    status_label.config(text="Iniciando processo...")
-    app.update_idletasks()
+    aguardar_aquecimento()
 
+    # 1. Usa a versão mais recente do modelo selecionado (o registro só relê os arquivos se mudaram)
     try:
-        # 1. Verifica se o conteúdo do template foi importado
-        if DOCX_BYTES is None:
-            messagebox.showerror("Erro de Configuração",
-                                 f"Os dados do modelo DOCX não foram encontrados (deveriam estar em '{os.path.join(HIDDEN_FOLDER_NAME, MODEL_BASENAME)}').\n"
-                                 "Clique no botão 'Importar/Atualizar Modelo DOCX' para selecionar o arquivo .docx modelo e gerar/atualizar os dados necessários.")
-            status_label.config(text="Erro: Modelo DOCX não carregado. Use o botão de importação.")
-            return
-
-        # Carrega o documento a partir dos bytes em memória
-        try:
-            doc_stream = io.BytesIO(DOCX_BYTES)
-            doc = Document(doc_stream)
-        except Exception as e_load:
-            messagebox.showerror("Erro ao Carregar Modelo",
-                                 f"Não foi possível carregar o modelo DOCX a partir dos dados importados: {e_load}\n"
-                                 f"Verifique se o arquivo '{MODEL_BASENAME}' (em '{HIDDEN_FOLDER_NAME}') foi gerado corretamente.")
-            status_label.config(text="Erro: Falha ao carregar modelo importado.")
-            return
-            
-        progress_bar['value'] = 10
-        status_label.config(text="Modelo carregado...")
-        app.update_idletasks()
-
-        # 2. Prepara e aplica as substituições
-        data_formatada = formatar_data_por_extenso(data_declaracao)
-        replacements_dict = {
-            PLACEHOLDERS["nome_responsavel"]: nome_responsavel,
-            PLACEHOLDERS["nome_filho"]: nome_filho,
-            PLACEHOLDERS["serie"]: serie,
-            PLACEHOLDERS["data"]: data_formatada,
-            PLACEHOLDERS["periodo"]: periodo # Adicionado periodo ao dicionário
-        }
-        apply_replacements(doc, replacements_dict)
-        progress_bar['value'] = 40
-        status_label.config(text="Dados preenchidos no modelo...")
-        app.update_idletasks()
+        modelo = obter_registro().obter(MODELO_ATUAL)
+        DOCX_BYTES, DOCX_HASH = modelo.docx_bytes, modelo.hash
+    except Exception:
+        pass # Mantém o modelo já carregado, se houver
+
+    # Verifica se o conteúdo do template foi importado
+    if DOCX_BYTES is None:
+        messagebox.showerror("Erro de Configuração",
+                             f"Os dados do modelo DOCX não foram encontrados (deveriam estar em '{os.path.join(HIDDEN_FOLDER_NAME, MODEL_BASENAME)}').\n"
+                             "Clique no botão 'Importar/Atualizar Modelo DOCX' para selecionar o arquivo .docx modelo e gerar/atualizar os dados necessários.")
+        status_label.config(text="Erro: Modelo DOCX não carregado. Use o botão de importação.")
+        return
 
-        # 3. Cria a pasta de saída se não existir
-        if not os.path.exists(OUTPUT_FOLDER_NAME):
-            os.makedirs(OUTPUT_FOLDER_NAME)
-
-        # Sanitiza componentes do nome do arquivo para evitar erros
-        safe_nome_filho = "".join(c if c.isalnum() else "_" for c in nome_filho)
-        safe_data = "".join(c if c.isalnum() else "_" for c in data_declaracao.replace("/", "-"))
-
-        # Define nomes para os arquivos temporário e final
-        temp_docx_filename = f"temp_declaracao_{safe_nome_filho}_{safe_data}.docx"
-        output_pdf_filename = f"Declaracao_{safe_nome_filho}_{safe_data}.pdf"
-        
-        temp_docx_path = os.path.join(OUTPUT_FOLDER_NAME, temp_docx_filename)
-        output_pdf_path = os.path.join(OUTPUT_FOLDER_NAME, output_pdf_filename)
-
-        # 4. Salva o DOCX preenchido temporariamente
-        doc.save(temp_docx_path)
-        progress_bar['value'] = 60
-        status_label.config(text="Documento Word temporário salvo...")
-        app.update_idletasks()
+    # 2-6. Carrega, preenche, salva e converte em segundo plano (ver motor_declaracao.gerar_documento_pdf),
+    # aproveitando a geração especulativa se ela foi feita com estes mesmos valores e modelo
+    especulacao = especulador.tomar(chave_especulacao(registro))
+    fila_geracao.adicionar((DOCX_BYTES, registro, especulacao))
+    status_label.config(text=f"Declaração de {registro['nome_filho']} adicionada à fila.")
 
-        # 5. Converte para PDF
-        status_label.config(text="Convertendo para PDF...")
-        app.update_idletasks()
-        convert(temp_docx_path, output_pdf_path)
-        progress_bar['value'] = 90
-        status_label.config(text="PDF gerado...")
-        app.update_idletasks()
+    # Prepara o formulário para a próxima declaração (série, data e período costumam se repetir)
+    entry_nome_responsavel.delete(0, tk.END)
+    entry_nome_filho.delete(0, tk.END)
+    entry_nome_responsavel.focus_set()
 
-        # 6. Limpa o DOCX temporário
-        os.remove(temp_docx_path)
-        progress_bar['value'] = 100
-        status_label.config(text="Declaração gerada com sucesso!")
-        app.update_idletasks()
+def cancelar_selecionados():
+    cancelados = sum(1 for iid in lista_trabalhos.selection() if fila_geracao.cancelar(int(iid)))
+    status_label.config(text=f"{cancelados} trabalho(s) cancelado(s)." if cancelados
+                        else "Apenas trabalhos na fila podem ser cancelados.")
 
-        messagebox.showinfo("Sucesso", f"Declaração gerada com sucesso!\nSalvo como: {output_pdf_path}")
-        
-        # 7. Abre a pasta de saída
-        output_dir_abs_path = os.path.abspath(OUTPUT_FOLDER_NAME)
-        try:
-            if sys.platform == "win32": # Para Windows
-                os.startfile(output_dir_abs_path)
-            elif sys.platform == "darwin": # Para macOS
-                 subprocess.run(['open', output_dir_abs_path], check=True)
-            else: # Para Linux e outros Unix-like (assumindo xdg-utils)
-                 subprocess.run(['xdg-open', output_dir_abs_path], check=True)
-        except Exception as e_open:
-            messagebox.showwarning("Aviso", "A declaração foi gerada, mas não foi possível abrir a pasta automaticamente.\n"
-                                           f"Você pode encontrá-la em: {output_dir_abs_path}")
-
-    except Exception as e:
-        progress_bar['value'] = 0
-        status_label.config(text="Erro ao gerar declaração.")
-        messagebox.showerror("Erro Inesperado", f"Ocorreu um erro durante a geração:\n{e}")
+def cancelar_pendentes():
+    cancelados = fila_geracao.cancelar_pendentes()
+    status_label.config(text=f"{cancelados} trabalho(s) cancelado(s).")
 
 # --- Configuração da Interface Gráfica (GUI) ---
 app = tk.Tk()
@@ -363,27 +440,62 @@ ttk.Label(frame, text="Período (ex: matutino, vespertino, etc.):").grid(row=8,
 entry_periodo = ttk.Entry(frame, width=50)
 entry_periodo.grid(row=9, column=0, sticky=(tk.W, tk.E), pady=(0,10))
 
-# Botão para Importar/Atualizar Modelo
-btn_importar = ttk.Button(frame, text="Importar/Atualizar Modelo DOCX", command=abrir_janela_importador_e_recarregar)
-btn_importar.grid(row=10, column=0, sticky=(tk.W, tk.E), pady=(10,5)) # Ajustado row index
+# Seleção do tipo de declaração (modelo do registro) e botão para Importar/Atualizar Modelo
+frame_modelo = ttk.Frame(frame)
+frame_modelo.grid(row=10, column=0, sticky=(tk.W, tk.E), pady=(10,5))
+ttk.Label(frame_modelo, text="Modelo:").pack(side=tk.LEFT, padx=(0,5))
+combo_modelo = ttk.Combobox(frame_modelo, values=[NOME_PADRAO], state="readonly", width=20)
+combo_modelo.set(MODELO_ATUAL)
+combo_modelo.bind("<<ComboboxSelected>>", selecionar_modelo)
+combo_modelo.pack(side=tk.LEFT, padx=(0,5))
+btn_importar = ttk.Button(frame_modelo, text="Importar/Atualizar Modelo DOCX", command=abrir_janela_importador_e_recarregar)
+btn_importar.pack(side=tk.LEFT, expand=True, fill=tk.X)
+
+# Geração especulativa: prepara o PDF enquanto o formulário é preenchido
+especular_var = tk.BooleanVar(value=False)
+ttk.Checkbutton(frame, text="Preparar o PDF enquanto os campos são preenchidos", variable=especular_var,
+                command=agendar_especulacao).grid(row=11, column=0, sticky=tk.W, pady=(0,5))
+for entry in (entry_nome_responsavel, entry_nome_filho, entry_serie, entry_data, entry_periodo):
+    for evento in ("<KeyRelease>", "<<Paste>>", "<<Cut>>"):
+        entry.bind(evento, agendar_especulacao, add="+")
 
 # Botão Gerar Declaração
-btn_gerar = ttk.Button(frame, text="Gerar Declaração em PDF", command=gerar_declaracao)
-btn_gerar.grid(row=11, column=0, sticky=(tk.W, tk.E), pady=(5,10)) # Ajustado row index
+btn_gerar = ttk.Button(frame, text="Gerar Declaração em PDF", command=gerar_declaracao) # Adiciona à fila
+btn_gerar.grid(row=12, column=0, sticky=(tk.W, tk.E), pady=(5,10)) # Ajustado row index
 
 # Barra de Progresso
 progress_bar = ttk.Progressbar(frame, orient="horizontal", length=300, mode="determinate")
-progress_bar.grid(row=12, column=0, sticky=(tk.W, tk.E), pady=(0,5)) # Ajustado row index
+progress_bar.grid(row=13, column=0, sticky=(tk.W, tk.E), pady=(0,5)) # Ajustado row index
 
 # Label de Status
-status_label = ttk.Label(frame, text="Preencha os campos e clique em gerar.")
-status_label.grid(row=13, column=0, sticky=(tk.W, tk.E), pady=(0,0)) # Ajustado row index
+status_label = ttk.Label(frame, text="Carregando o modelo DOCX...")
+status_label.grid(row=14, column=0, sticky=(tk.W, tk.E), pady=(0,0)) # Ajustado row index
+
+# Fila de declarações (cada linha mostra o aluno, o estado e o progresso)
+lista_trabalhos = ttk.Treeview(frame, columns=("aluno", "estado", "progresso"), show="headings", height=6)
+lista_trabalhos.heading("aluno", text="Aluno(a)")
+lista_trabalhos.heading("estado", text="Estado")
+lista_trabalhos.heading("progresso", text="Progresso")
+lista_trabalhos.column("estado", width=100, stretch=False)
+lista_trabalhos.column("progresso", width=80, stretch=False, anchor=tk.E)
+lista_trabalhos.grid(row=15, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(10,5))
+
+frame_cancelar = ttk.Frame(frame)
+frame_cancelar.grid(row=16, column=0, sticky=(tk.W, tk.E))
+ttk.Button(frame_cancelar, text="Cancelar Selecionados", command=cancelar_selecionados).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(0,5))
+ttk.Button(frame_cancelar, text="Cancelar Pendentes", command=cancelar_pendentes).pack(side=tk.LEFT, expand=True, fill=tk.X)
 
 # Configura o redimensionamento da coluna no frame
 frame.columnconfigure(0, weight=1)
+frame.rowconfigure(15, weight=1)
 
 # Função para garantir o encerramento completo da aplicação
 def on_closing():
+    if fila_geracao.ocupada() and not messagebox.askyesno(
+            "Sair", "Ainda há declarações na fila ou em geração. Deseja sair mesmo assim?"):
+        return
+    especulador.cancelar()
+    fila_geracao.encerrar()
     try:
         app.destroy()
     except tk.TclError:
@@ -392,4 +504,16 @@ def on_closing():
     sys.exit(0) # Garante que o processo Python termine
 
 app.protocol("WM_DELETE_WINDOW", on_closing) # Intercepta o fechamento da janela
-app.mainloop()
\ No newline at end of file
+
+def _ao_mostrar_janela(event):
+    if event.widget is app:
+        registrar_marco("janela")
+        app.unbind("<Map>")
+        iniciar_aquecimento() # Só depois que a janela está visível
+
+app.bind("<Map>", _ao_mostrar_janela)
+app.after(INTERVALO_EVENTOS_MS, processar_eventos)
+app.mainloop()
+
+if MEDIR_INICIALIZACAO:
+    sys.exit(0 if relatorio_inicializacao()["dentro_do_orcamento"] else 1)
\ No newline at end of file
@@ -2,13 +2,12 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
-import sys # Adicionado
-import importlib # Adicionado para recarregar no gerador principal
+import armazenamento_modelo
+from motor_declaracao import HIDDEN_FOLDER_NAME, extrair_placeholders, invalidar_cache, obter_registro
+from registro_modelos import NOME_PADRAO, validar_nome
 
-# Nome da pasta para armazenar o arquivo de bytes do modelo
-HIDDEN_FOLDER_NAME = "._modelo_data"
-# Nome base do arquivo Python que armazenará os bytes do DOCX
-OUTPUT_PYTHON_FILENAME_BASENAME = "declaracao_base_bytes.py"
+# Nome do arquivo .docx armazenado (acompanhado do manifesto modelo.json)
+OUTPUT_MODEL_BASENAME = armazenamento_modelo.MODEL_DOCX_BASENAME
 
 PLACEHOLDERS_TEXT = """O arquivo .docx selecionado deve ser um modelo e precisa conter os seguintes placeholders (marcadores) que serão substituídos:
 - {{NOME_RESPONSAVEL}}: Nome completo do(a) responsável.
@@ -22,51 +21,42 @@ Exemplo: Prezada {{NOME_RESPONSAVEL}}, declaramos que {{NOME_FILHO}} esteve pres
 Certifique-se de que o arquivo DOCX não esteja protegido ou corrompido.
 """
 
-def get_application_path():
-    """Retorna o caminho base da aplicação, seja script ou executável."""
-    if getattr(sys, 'frozen', False): # Rodando como bundle PyInstaller
-        # sys.executable é o caminho para o .exe
-        return os.path.dirname(sys.executable)
-    else: # Rodando como script
-        # __file__ é o caminho para este script (importar_declaracao.py)
-        # Se este script for importado, este será o seu diretório.
-        return os.path.dirname(os.path.abspath(__file__))
-
-
-def gerar_arquivo_python_com_bytes(docx_filepath, original_filename):
+def salvar_modelo_importado(docx_filepath, original_filename, nome_modelo=NOME_PADRAO):
     """
-    Lê o arquivo .docx e cria um arquivo Python (.py)
-    contendo os bytes do documento em uma variável, no subdiretório HIDDEN_FOLDER_NAME da aplicação.
+    Lê o arquivo .docx e o armazena como está (modelo.docx), com um manifesto
+    (hash, nome original e placeholders), como o modelo 'nome_modelo' do registro
+    (o modelo padrão fica no subdiretório HIDDEN_FOLDER_NAME da aplicação).
     Retorna True se sucesso, False caso contrário.
     """
+    registro = obter_registro()
+    try:
+        hidden_dir_path = registro.pasta_do_modelo(nome_modelo)
+    except ValueError as e_nome:
+        messagebox.showerror("Nome Inválido", str(e_nome), icon='error')
+        return False
     try:
         with open(docx_filepath, "rb") as f:
             content_bytes = f.read()
 
-        conteudo_py = f"# Arquivo gerado automaticamente, não edite manualmente.\n"
-        conteudo_py += f"# Contém os bytes do arquivo original: {os.path.basename(original_filename)}\n"
-        conteudo_py += f"DOCX_BYTES = {repr(content_bytes)}\n"
-
-        app_path = get_application_path()
-        hidden_dir_path = os.path.join(app_path, HIDDEN_FOLDER_NAME)
-        
-        # Cria o diretório oculto se não existir
-        os.makedirs(hidden_dir_path, exist_ok=True)
-        
-        output_py_path = os.path.join(hidden_dir_path, OUTPUT_PYTHON_FILENAME_BASENAME)
-
-        with open(output_py_path, "w", encoding="utf-8") as f_py:
-            f_py.write(conteudo_py)
+        try:
+            placeholders = extrair_placeholders(content_bytes)
+        except Exception as e_docx:
+            messagebox.showerror("Arquivo Inválido",
+                                 f"O arquivo '{os.path.basename(original_filename)}' não parece ser um DOCX válido: {e_docx}", icon='error')
+            return False
+
+        anterior = armazenamento_modelo.ler_manifesto(hidden_dir_path)
+        entrada = registro.importar(nome_modelo, content_bytes, original_filename, placeholders)
+        if anterior is None or anterior.get("hash") != entrada.hash:
+            # Os PDFs em cache foram gerados com o modelo anterior
+            invalidar_cache(anterior.get("hash") if anterior else None)
         return True
     except FileNotFoundError:
         messagebox.showerror("Erro", f"O arquivo '{os.path.basename(original_filename)}' não foi encontrado no caminho especificado: {docx_filepath}", icon='error')
         return False
     except PermissionError:
-        app_path = get_application_path() # Recalcula para a mensagem de erro
-        hidden_dir_path = os.path.join(app_path, HIDDEN_FOLDER_NAME) # Adicionado para clareza na mensagem
-        output_py_path = os.path.join(hidden_dir_path, OUTPUT_PYTHON_FILENAME_BASENAME)
         messagebox.showerror("Erro de Permissão",
-                             f"Não foi possível criar o arquivo '{OUTPUT_PYTHON_FILENAME_BASENAME}' em '{hidden_dir_path}'.\n"
+                             f"Não foi possível criar o arquivo '{OUTPUT_MODEL_BASENAME}' em '{hidden_dir_path}'.\n"
                              "Verifique as permissões de escrita no diretório.", icon='error')
         return False
     except Exception as e:
@@ -74,8 +64,9 @@ def gerar_arquivo_python_com_bytes(docx_filepath, original_filename):
         return False
 
 class ImportadorApp:
-    def __init__(self, master):
+    def __init__(self, master, nome_modelo=NOME_PADRAO):
         self.master = master
+        self.nome_importado = None # Nome do modelo importado com sucesso, se houver
         master.title("Importador de Modelo DOCX")
         # master.geometry("550x350") # Ajustar tamanho conforme necessário
 
@@ -90,7 +81,12 @@ class ImportadorApp:
         self.text_instrucoes.pack(pady=(0,15), fill=tk.X, expand=True)
 
 
-        self.btn_selecionar = ttk.Button(self.frame, text="Selecionar Arquivo .docx e Gerar Bytes", command=self.selecionar_e_processar_arquivo)
+        ttk.Label(self.frame, text="Nome do modelo (tipo de declaração, ex.: frequencia, matricula):").pack(anchor=tk.W)
+        self.combo_nome = ttk.Combobox(self.frame, values=obter_registro().nomes() or [NOME_PADRAO])
+        self.combo_nome.set(nome_modelo)
+        self.combo_nome.pack(pady=(0,10), fill=tk.X)
+
+        self.btn_selecionar = ttk.Button(self.frame, text="Selecionar Arquivo .docx e Importar", command=self.selecionar_e_processar_arquivo)
         self.btn_selecionar.pack(pady=10, fill=tk.X, ipady=5)
 
         self.status_label = ttk.Label(self.frame, text="Aguardando seleção do arquivo modelo...")
@@ -101,6 +97,13 @@ class ImportadorApp:
 
 
     def selecionar_e_processar_arquivo(self):
+        nome_modelo = self.combo_nome.get().strip() or NOME_PADRAO
+        try:
+            validar_nome(nome_modelo)
+        except ValueError as e_nome:
+            messagebox.showerror("Nome Inválido", str(e_nome), icon='error')
+            self.status_label.config(text="Informe um nome de modelo válido.")
+            return
         self.status_label.config(text="Aguardando seleção...")
         filepath = filedialog.askopenfilename(
             title="Selecione o arquivo DOCX modelo",
@@ -111,21 +114,25 @@ class ImportadorApp:
             self.status_label.config(text=f"Processando '{original_filename}'...")
             self.master.update_idletasks()
 
-            if gerar_arquivo_python_com_bytes(filepath, original_filename):
+            if salvar_modelo_importado(filepath, original_filename, nome_modelo):
+                self.nome_importado = nome_modelo
                 messagebox.showinfo("Sucesso",
-                                    f"Arquivo '{OUTPUT_PYTHON_FILENAME_BASENAME}' gerado/atualizado com sucesso em '{HIDDEN_FOLDER_NAME}' com os bytes de '{original_filename}'.\n\n"
+                                    f"Modelo '{original_filename}' importado com sucesso como '{nome_modelo}' em '{HIDDEN_FOLDER_NAME}'.\n\n"
                                     f"Você pode fechar esta janela.\n"
                                     f"O gerador principal tentará recarregar o modelo automaticamente.", icon='info')
-                self.status_label.config(text=f"'{OUTPUT_PYTHON_FILENAME_BASENAME}' gerado em '{HIDDEN_FOLDER_NAME}'!")
+                self.status_label.config(text=f"'{original_filename}' importado em '{HIDDEN_FOLDER_NAME}'!")
                 # self.master.destroy() # Fecha a janela do importador automaticamente
             else:
-                # Mensagem de erro já é mostrada por gerar_arquivo_python_com_bytes
-                self.status_label.config(text="Falha ao gerar arquivo de bytes. Verifique a mensagem de erro.")
+                # Mensagem de erro já é mostrada por salvar_modelo_importado
+                self.status_label.config(text="Falha ao importar o modelo. Verifique a mensagem de erro.")
         else:
             self.status_label.config(text="Nenhum arquivo selecionado. Operação cancelada.")
 
-def iniciar_interface_importador():
-    """Função para ser chamada pelo script principal para iniciar esta GUI."""
+def iniciar_interface_importador(nome_modelo=NOME_PADRAO):
+    """
+    Função para ser chamada pelo script principal para iniciar esta GUI.
+    Retorna o nome do modelo importado, ou None se nada foi importado.
+    """
     root_importador = tk.Toplevel() # Usar Toplevel se chamado de outra GUI Tkinter
     root_importador.grab_set() # Torna a janela modal em relação à janela pai
     
@@ -140,8 +147,9 @@ def iniciar_interface_importador():
     elif 'clam' in available_themes:
         style.theme_use('clam')
 
-    app = ImportadorApp(root_importador)
+    app = ImportadorApp(root_importador, nome_modelo)
     root_importador.wait_window() # Espera esta janela ser fechada antes de retornar
+    return app.nome_importado
 
 # Este script agora é um módulo, então o if __name__ == "__main__": é removido.
 # Se precisar testar este módulo isoladamente, pode adicionar temporariamente:
@@ -0,0 +1,226 @@
+# Ethyïos
+# Índice (SQLite) de todas as declarações geradas, com os valores preenchidos,
+# o hash do modelo e o caminho do PDF. Os PDFs ficam em subpastas por ano e
+# mês da declaração (declaracoes_geradas/2025/02/...), então nenhuma pasta
+# acumula dezenas de milhares de arquivos, e encontrar ou reimprimir uma
+# declaração antiga é uma consulta indexada, sem varrer diretórios.
+# O índice fica na pasta oculta da aplicação (disco local): SQLite não é
+# confiável em compartilhamentos de rede, onde a pasta de saída pode estar.
+#
+#   python indice_declaracoes.py buscar --nome "joão pedro" --desde 2025-01-01
+#   python indice_declaracoes.py reimprimir 42
+import os
+import sys
+import sqlite3
+import datetime
+import argparse
+import threading
+import unicodedata
+
+INDEX_BASENAME = "indice_declaracoes.sqlite3" # Dentro de ._modelo_data
+TEMPO_ESPERA_TRAVA = 30 # Segundos que um processo espera outro terminar de gravar
+LIMITE_PADRAO = 50
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS declaracoes (
+    id INTEGER PRIMARY KEY,
+    gerada_em TEXT NOT NULL,
+    caminho_pdf TEXT NOT NULL,
+    pagina_inicial INTEGER,
+    nome_responsavel TEXT NOT NULL,
+    nome_filho TEXT NOT NULL,
+    serie TEXT NOT NULL,
+    data TEXT NOT NULL,
+    periodo TEXT NOT NULL,
+    hash_modelo TEXT NOT NULL,
+    busca_filho TEXT NOT NULL,
+    busca_responsavel TEXT NOT NULL,
+    data_iso TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_declaracoes_filho ON declaracoes (busca_filho, data_iso);
+CREATE INDEX IF NOT EXISTS idx_declaracoes_responsavel ON declaracoes (busca_responsavel);
+CREATE INDEX IF NOT EXISTS idx_declaracoes_data ON declaracoes (data_iso);
+CREATE INDEX IF NOT EXISTS idx_declaracoes_caminho ON declaracoes (caminho_pdf);
+"""
+_CAMPOS = ("nome_responsavel", "nome_filho", "serie", "data", "periodo")
+
+
+def texto_de_busca(texto):
+    """Forma usada nas buscas: sem acentos, minúsculas e espaços simples ('João  Pedro' -> 'joao pedro')."""
+    decomposto = unicodedata.normalize("NFKD", str(texto))
+    sem_acentos = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return " ".join(sem_acentos.casefold().split())
+
+def data_iso(data_str):
+    """'dd/mm/aaaa' -> 'aaaa-mm-dd', ou None se a data não estiver nesse formato."""
+    try:
+        return datetime.datetime.strptime(str(data_str).strip(), "%d/%m/%Y").date().isoformat()
+    except ValueError:
+        return None
+
+def subpasta_por_data(pasta_saida, data_str):
+    """Subpasta <ano>/<mês> da declaração (pela data preenchida; pela data de hoje se ela for inválida)."""
+    iso = data_iso(data_str) or datetime.date.today().isoformat()
+    return os.path.join(pasta_saida, iso[:4], iso[5:7])
+
+def _faixa_de_prefixo(prefixo):
+    # 'prefixo%' como intervalo, para que a busca use o índice
+    return prefixo, prefixo + "\U0010ffff"
+
+
+class IndiceDeclaracoes:
+    """
+    Índice SQLite em 'caminho'. Pode ser usado por várias threads e por vários
+    processos ao mesmo tempo (cada um abre a sua conexão; o SQLite serializa as gravações).
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local()
+
+    def _conexao(self):
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is not None and self._local.pid == os.getpid():
+            return conexao
+        # Primeira conexão desta thread, ou processo filho (ex.: pool do lote): uma conexão
+        # herdada pelo fork não pode ser usada
+        os.makedirs(os.path.dirname(self.caminho) or ".", exist_ok=True)
+        conexao = sqlite3.connect(self.caminho, timeout=TEMPO_ESPERA_TRAVA)
+        conexao.row_factory = sqlite3.Row
+        conexao.execute("PRAGMA journal_mode=WAL") # Leituras não bloqueiam as gravações do lote
+        with conexao:
+            conexao.executescript(_ESQUEMA)
+        self._local.conexao = conexao
+        self._local.pid = os.getpid()
+        return conexao
+
+    def registrar(self, caminho_pdf, registro, hash_modelo, pagina_inicial=None):
+        """Registra uma declaração gerada. Retorna o id da nova entrada."""
+        valores = [str(registro.get(campo) or "") for campo in _CAMPOS]
+        conexao = self._conexao()
+        with conexao:
+            cursor = conexao.execute(
+                "INSERT INTO declaracoes (gerada_em, caminho_pdf, pagina_inicial, nome_responsavel, nome_filho, "
+                "serie, data, periodo, hash_modelo, busca_filho, busca_responsavel, data_iso) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [datetime.datetime.now().isoformat(timespec="seconds"), os.path.abspath(caminho_pdf),
+                 pagina_inicial, *valores, hash_modelo, texto_de_busca(registro.get("nome_filho") or ""),
+                 texto_de_busca(registro.get("nome_responsavel") or ""), data_iso(registro.get("data"))])
+        return cursor.lastrowid
+
+    def buscar(self, nome_filho=None, nome_responsavel=None, desde=None, ate=None, limite=LIMITE_PADRAO):
+        """
+        Declarações mais recentes primeiro. Os nomes são buscados pelo início
+        (sem diferenciar acentos e maiúsculas); 'desde'/'ate' são datas 'aaaa-mm-dd'
+        (ou prefixos, ex.: '2025-02') da declaração. Retorna uma lista de dicionários.
+        """
+        condicoes, parametros = [], []
+        if nome_filho:
+            condicoes.append("busca_filho >= ? AND busca_filho < ?")
+            parametros.extend(_faixa_de_prefixo(texto_de_busca(nome_filho)))
+        if nome_responsavel:
+            condicoes.append("busca_responsavel >= ? AND busca_responsavel < ?")
+            parametros.extend(_faixa_de_prefixo(texto_de_busca(nome_responsavel)))
+        if desde:
+            condicoes.append("data_iso >= ?")
+            parametros.append(desde)
+        if ate:
+            condicoes.append("data_iso < ?")
+            parametros.append(ate + "\U0010ffff") # 'ate' inclusive, também como prefixo
+        onde = " WHERE " + " AND ".join(condicoes) if condicoes else ""
+        linhas = self._conexao().execute(f"SELECT * FROM declaracoes{onde} ORDER BY id DESC LIMIT ?",
+                                         [*parametros, limite]).fetchall()
+        return [dict(linha) for linha in linhas]
+
+    def obter(self, id_declaracao):
+        """A declaração com o id informado (dicionário), ou None."""
+        linha = self._conexao().execute("SELECT * FROM declaracoes WHERE id = ?", (id_declaracao,)).fetchone()
+        return dict(linha) if linha is not None else None
+
+    def atualizar_caminho(self, id_declaracao, caminho_pdf):
+        conexao = self._conexao()
+        with conexao:
+            conexao.execute("UPDATE declaracoes SET caminho_pdf = ?, pagina_inicial = NULL WHERE id = ?",
+                            (os.path.abspath(caminho_pdf), id_declaracao))
+
+    def contar(self):
+        return self._conexao().execute("SELECT COUNT(*) FROM declaracoes").fetchone()[0]
+
+    def fechar(self):
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is not None and self._local.pid == os.getpid():
+            conexao.close()
+        self._local.conexao = None
+
+
+def reimprimir(id_declaracao, conversor=None):
+    """
+    Caminho do PDF de uma declaração do índice. Se o arquivo não existir mais,
+    ela é gerada de novo com os valores guardados e com o modelo original, se
+    ainda estiver no registro de modelos (senão, com o modelo padrão atual).
+    Retorna (caminho, gerada_de_novo, aviso); lança KeyError se o id não existe.
+    """
+    from motor_declaracao import OUTPUT_FOLDER_NAME, gerar_documento_pdf, obter_indice, obter_registro
+    from registro_modelos import NOME_PADRAO
+    indice = obter_indice()
+    declaracao = indice.obter(id_declaracao)
+    if declaracao is None:
+        raise KeyError(id_declaracao)
+    if os.path.exists(declaracao["caminho_pdf"]):
+        return declaracao["caminho_pdf"], False, None
+    # O modelo usado originalmente, se ainda estiver no registro; senão, o modelo padrão atual
+    registro_modelos = obter_registro()
+    modelo = next((entrada for entrada in map(registro_modelos.obter, registro_modelos.nomes())
+                   if entrada.hash == declaracao["hash_modelo"]), None)
+    aviso = None
+    if modelo is None:
+        modelo = registro_modelos.obter(NOME_PADRAO)
+        aviso = "O modelo foi alterado desde a geração original; a declaração foi refeita com o modelo atual."
+    # A pasta de saída original é a que contém as subpastas <ano>/<mês>
+    pasta_saida = os.path.dirname(os.path.dirname(os.path.dirname(declaracao["caminho_pdf"]))) or OUTPUT_FOLDER_NAME
+    caminho = gerar_documento_pdf(modelo.docx_bytes, declaracao, pasta_saida, conversor=conversor, indexar=False)
+    indice.atualizar_caminho(id_declaracao, caminho)
+    return caminho, True, aviso
+
+
+def main(argv=None):
+    from conversores import CONVERSORES
+    parser = argparse.ArgumentParser(description="Consulta o índice das declarações geradas.")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    buscar = comandos.add_parser("buscar", help="Lista declarações (mais recentes primeiro).")
+    buscar.add_argument("--nome", help="Início do nome do aluno (sem diferenciar acentos e maiúsculas).")
+    buscar.add_argument("--responsavel", help="Início do nome do responsável.")
+    buscar.add_argument("--desde", help="Data inicial da declaração (aaaa-mm-dd, ou aaaa-mm).")
+    buscar.add_argument("--ate", help="Data final da declaração, inclusive (aaaa-mm-dd, ou aaaa-mm).")
+    buscar.add_argument("--limite", type=int, default=LIMITE_PADRAO, help="Máximo de resultados (padrão: %(default)s).")
+    reimpressao = comandos.add_parser("reimprimir", help="Mostra o PDF de uma declaração, gerando-o de novo se foi apagado.")
+    reimpressao.add_argument("id", type=int)
+    reimpressao.add_argument("--conversor", choices=sorted(CONVERSORES), default=None,
+                             help="Backend de conversão, se for preciso gerar de novo.")
+    args = parser.parse_args(argv)
+
+    if args.comando == "buscar":
+        from motor_declaracao import obter_indice
+        declaracoes = obter_indice().buscar(args.nome, args.responsavel, args.desde, args.ate, args.limite)
+        for d in declaracoes:
+            pagina = f" (página {d['pagina_inicial']})" if d["pagina_inicial"] else ""
+            print(f"{d['id']:>7}  {d['data']:<10}  {d['nome_filho']:<30}  {d['serie']:<10}  {d['caminho_pdf']}{pagina}")
+        if not declaracoes:
+            print("Nenhuma declaração encontrada.", file=sys.stderr)
+            return 1
+        return 0
+
+    try:
+        caminho, gerada_de_novo, aviso = reimprimir(args.id, args.conversor)
+    except KeyError:
+        print(f"Declaração {args.id} não encontrada no índice.", file=sys.stderr)
+        return 1
+    except Exception as e:
+        print(f"Erro ao gerar a declaração {args.id} de novo: {e}", file=sys.stderr)
+        return 2
+    if aviso:
+        print(aviso, file=sys.stderr)
+    print(f"{caminho}{' (gerada de novo)' if gerada_de_novo else ''}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+# Ethyïos
+# Medição do tempo de cada etapa da geração (carregar o modelo, preencher,
+# converter, gravar...). Cada medição é registrada como uma linha JSON em um
+# arquivo de log com rotação (a GUI empacotada não tem console: a saída padrão
+# vai para os.devnull) e alimenta janelas móveis com as últimas durações de
+# cada etapa, das quais saem a mediana (p50) e o p95.
+#
+# Cada processo (GUI, servidor, cada trabalhador da fila compartilhada) grava
+# o seu próprio arquivo, etapas.<máquina>.<pid>.jsonl: a rotação de um arquivo
+# aberto por vários processos perde linhas no POSIX e falha no Windows (o
+# arquivo não pode ser renomeado enquanto outro processo o mantém aberto).
+# Arquivos sem gravações há mais de DIAS_MANTER_LOGS dias são apagados.
+#
+#   with medir("converter", conversor="libreoffice"):
+#       ...
+#
+# Executado diretamente, resume os arquivos de log da pasta:
+#   python metricas_etapas.py ._modelo_data/logs
+import os
+import re
+import sys
+import json
+import time
+import glob
+import socket
+import logging
+import argparse
+import datetime
+import threading
+import contextlib
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+LOG_PREFIXO = "etapas"
+LOG_EXTENSAO = ".jsonl"
+TAMANHO_MAXIMO_LOG = 5 * 1024 * 1024 # Bytes por arquivo antes da rotação
+COPIAS_LOG = 3 # etapas.<máquina>.<pid>.jsonl.1 ... .3
+DIAS_MANTER_LOGS = 30
+JANELA_PADRAO = 500 # Últimas medições de cada etapa usadas nos percentis
+
+_logger = logging.getLogger("declaracao.etapas")
+_logger.propagate = False
+_logger.setLevel(logging.INFO)
+_pid_configurado = None # Só o processo que configurou o log escreve nele (ver repassar)
+_trava = threading.Lock()
+_janelas = {}
+_coletores = threading.local()
+
+
+def nome_log_do_processo():
+    """Nome do arquivo de log deste processo: etapas.<máquina>.<pid>.jsonl."""
+    maquina = re.sub(r"[^\w-]", "_", socket.gethostname()) or "local"
+    return f"{LOG_PREFIXO}.{maquina}.{os.getpid()}{LOG_EXTENSAO}"
+
+def arquivos_de_log(pasta_logs):
+    """Arquivos de log da pasta (de todos os processos), com as cópias rotacionadas."""
+    return sorted(glob.glob(os.path.join(glob.escape(pasta_logs), f"{LOG_PREFIXO}*{LOG_EXTENSAO}*")))
+
+def _apagar_logs_antigos(pasta_logs, dias):
+    limite = time.time() - dias * 86400
+    for arquivo in arquivos_de_log(pasta_logs):
+        try:
+            if os.path.getmtime(arquivo) < limite:
+                os.remove(arquivo)
+        except OSError:
+            continue # Apagado por outro processo, ou ainda aberto (Windows): fica para a próxima vez
+
+def configurar(pasta_logs, tamanho_maximo=TAMANHO_MAXIMO_LOG, copias=COPIAS_LOG, dias_manter=DIAS_MANTER_LOGS):
+    """
+    Passa a gravar as medições deste processo em <pasta_logs>/etapas.<máquina>.<pid>.jsonl,
+    com rotação, e apaga os logs sem gravações há mais de 'dias_manter' dias.
+    Retorna o caminho do arquivo; se a pasta não puder ser criada, as medições
+    continuam só em memória e retorna None.
+    """
+    global _pid_configurado
+    caminho = os.path.join(pasta_logs, nome_log_do_processo())
+    try:
+        os.makedirs(pasta_logs, exist_ok=True)
+        _apagar_logs_antigos(pasta_logs, dias_manter)
+        manipulador = RotatingFileHandler(caminho, maxBytes=tamanho_maximo, backupCount=copias,
+                                          encoding="utf-8", delay=True)
+    except OSError:
+        return None
+    manipulador.setFormatter(logging.Formatter("%(message)s"))
+    for anterior in list(_logger.handlers):
+        _logger.removeHandler(anterior)
+        anterior.close()
+    _logger.addHandler(manipulador)
+    _pid_configurado = os.getpid()
+    return caminho
+
+def _gravar(medicao):
+    if _pid_configurado == os.getpid() and _logger.handlers:
+        _logger.info(json.dumps(medicao, ensure_ascii=False))
+
+def _acumular(medicao):
+    with _trava:
+        janela = _janelas.get(medicao["etapa"])
+        if janela is None:
+            janela = _janelas[medicao["etapa"]] = deque(maxlen=JANELA_PADRAO)
+        janela.append(medicao["duracao_ms"])
+    for coletadas in getattr(_coletores, "pilha", ()):
+        coletadas.append(medicao)
+
+def registrar(etapa, duracao_s, sucesso=True, **atributos):
+    """Registra uma medição já feita. 'atributos' (JSON) acompanham a linha do log."""
+    medicao = {
+        "momento": datetime.datetime.now().isoformat(timespec="milliseconds"),
+        "etapa": etapa,
+        "duracao_ms": round(duracao_s * 1000, 3),
+        "sucesso": sucesso,
+        "pid": os.getpid(),
+        **atributos,
+    }
+    _acumular(medicao)
+    _gravar(medicao)
+    return medicao
+
+@contextlib.contextmanager
+def medir(etapa, **atributos):
+    """Mede o bloco como a etapa 'etapa'; exceções são registradas (sucesso=False) e propagadas."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        registrar(etapa, time.perf_counter() - inicio, False, **atributos)
+        raise
+    registrar(etapa, time.perf_counter() - inicio, True, **atributos)
+
+@contextlib.contextmanager
+def coletar():
+    """Junta em uma lista as medições feitas por esta thread dentro do bloco."""
+    coletadas = []
+    pilha = getattr(_coletores, "pilha", None)
+    if pilha is None:
+        pilha = _coletores.pilha = []
+    pilha.append(coletadas)
+    try:
+        yield coletadas
+    finally:
+        pilha.remove(coletadas)
+
+def repassar(medicoes):
+    """
+    Registra neste processo medições feitas em outro (ex.: processos do modo em
+    lote, que não escrevem no log para não disputarem a rotação do arquivo).
+    """
+    for medicao in medicoes:
+        _acumular(medicao)
+        _gravar(medicao)
+
+
+def _percentil(valores_ordenados, fracao):
+    indice = min(len(valores_ordenados) - 1, max(0, round(fracao * (len(valores_ordenados) - 1))))
+    return valores_ordenados[indice]
+
+def resumir(duracoes_por_etapa):
+    """{etapa: [durações em ms]} -> {etapa: {"n", "p50_ms", "p95_ms", "max_ms"}}."""
+    resumo = {}
+    for etapa, duracoes in sorted(duracoes_por_etapa.items()):
+        if duracoes:
+            ordenadas = sorted(duracoes)
+            resumo[etapa] = {"n": len(ordenadas), "p50_ms": _percentil(ordenadas, 0.50),
+                             "p95_ms": _percentil(ordenadas, 0.95), "max_ms": ordenadas[-1]}
+    return resumo
+
+def percentis():
+    """p50/p95 das últimas JANELA_PADRAO medições de cada etapa neste processo."""
+    with _trava:
+        copia = {etapa: list(janela) for etapa, janela in _janelas.items()}
+    return resumir(copia)
+
+def ler_log(caminho):
+    """
+    Durações por etapa de uma pasta de logs (todos os processos) ou de um
+    arquivo de log e das suas cópias rotacionadas. Linhas inválidas são ignoradas.
+    """
+    if os.path.isdir(caminho):
+        arquivos = arquivos_de_log(caminho)
+    else:
+        arquivos = sorted(glob.glob(glob.escape(caminho) + ".*"), reverse=True) + [caminho]
+    duracoes = {}
+    for arquivo in arquivos:
+        try:
+            with open(arquivo, "r", encoding="utf-8") as f:
+                for linha in f:
+                    try:
+                        medicao = json.loads(linha)
+                        duracoes.setdefault(medicao["etapa"], []).append(float(medicao["duracao_ms"]))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except FileNotFoundError:
+            continue
+    return duracoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resume (p50/p95 por etapa) o log de tempos da geração.")
+    parser.add_argument("log", help="Pasta de logs (os arquivos de todos os processos são somados) ou um "
+                                    "arquivo de log (as cópias rotacionadas são lidas também).")
+    parser.add_argument("--json", action="store_true", help="Imprime o resumo em JSON.")
+    args = parser.parse_args(argv)
+
+    resumo = resumir(ler_log(args.log))
+    if not resumo:
+        print(f"Nenhuma medição em '{args.log}'.", file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(resumo, ensure_ascii=False, indent=2))
+        return 0
+    print(f"{'etapa':<20} {'n':>7} {'p50 (ms)':>12} {'p95 (ms)':>12} {'máx (ms)':>12}")
+    for etapa, valores in resumo.items():
+        print(f"{etapa:<20} {valores['n']:>7} {valores['p50_ms']:>12.3f} "
+              f"{valores['p95_ms']:>12.3f} {valores['max_ms']:>12.3f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+# Ethyïos
+# Modelo DOCX "compilado": os bytes do modelo são analisados uma única vez
+# para descobrir quais parágrafos contêm placeholders, em todas as partes de
+# texto (corpo, cabeçalhos, rodapés e notas). O documento analisado fica em
+# memória: cada renderização copia só esses parágrafos, faz a substituição em
+# uma só passada, grava o .docx e devolve os parágrafos originais.
+import io
+import re
+import copy
+import hashlib
+import threading
+from docx import Document
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.opc.part import PartFactory, XmlPart
+from renderizador_ooxml import (
+    PARTES_DE_TEXTO, nos_texto_do_paragrafo, paragrafos_com_texto, substituir_em_paragrafo,
+)
+
+# O python-docx não tem classes para as notas de rodapé e de fim e as guarda
+# só como bytes. Registradas como XmlPart (o ponto de extensão do python-docx),
+# são analisadas ao abrir o documento e serializadas por ele ao salvar, como o
+# corpo e os cabeçalhos.
+for _tipo in (CT.WML_FOOTNOTES, CT.WML_ENDNOTES):
+    PartFactory.part_type_for.setdefault(_tipo, XmlPart)
+
+
+def _caminho_do_elemento(raiz, elemento):
+    """Retorna a sequência de índices de filhos que leva de 'raiz' até 'elemento'."""
+    caminho = []
+    atual = elemento
+    while atual is not raiz:
+        pai = atual.getparent()
+        caminho.append(pai.index(atual))
+        atual = pai
+    caminho.reverse()
+    return tuple(caminho)
+
+def _elemento_do_caminho(raiz, caminho):
+    elemento = raiz
+    for indice in caminho:
+        elemento = elemento[indice]
+    return elemento
+
+def abrir_documento(docx_bytes):
+    """Document do python-docx com todas as partes de texto (inclusive as notas) editáveis."""
+    return Document(io.BytesIO(docx_bytes))
+
+def partes_de_texto(doc):
+    """
+    Produz (nome da parte, raiz XML) para cada parte de texto de um Document
+    do python-docx: corpo, cabeçalhos, rodapés e notas. As alterações feitas
+    nas raízes entram no documento salvo. Lança ValueError se uma parte com
+    chaves só está disponível como bytes (documento aberto sem abrir_documento
+    antes de este módulo ser importado), em vez de perder as alterações.
+    """
+    for parte in doc.part.package.iter_parts():
+        nome = str(parte.partname).lstrip("/")
+        if not PARTES_DE_TEXTO.match(nome):
+            continue
+        if isinstance(parte, XmlPart):
+            yield nome, parte.element
+        elif b"{" in parte.blob: # Sem chaves não há placeholder possível
+            raise ValueError(f"A parte '{nome}' não pode ser editada: abra o documento com abrir_documento.")
+
+
+class ModeloCompilado:
+    """
+    Índice dos locais com placeholders de um modelo DOCX.
+    'placeholders' é um iterável com os marcadores, ex.: ['{{NOME_FILHO}}', ...].
+    """
+
+    def __init__(self, docx_bytes, placeholders):
+        self.docx_bytes = docx_bytes
+        self.hash = hashlib.sha256(docx_bytes).hexdigest()
+        self.placeholders = tuple(placeholders)
+        # Uma única expressão para todos os marcadores: substituição em uma passada
+        self._regex = re.compile("|".join(re.escape(p) for p in self.placeholders))
+
+        # Percorre todos os parágrafos de cada parte, inclusive os de tabelas aninhadas e caixas de texto
+        self._documento = abrir_documento(docx_bytes)
+        self._raizes = {}
+        self.locais = {} # nome da parte -> caminhos dos parágrafos com placeholders
+        for nome, raiz in partes_de_texto(self._documento):
+            caminhos = [_caminho_do_elemento(raiz, paragrafo) for paragrafo, nos_texto in paragrafos_com_texto(raiz)
+                        if self._regex.search("".join(t.text or "" for t in nos_texto))]
+            if caminhos:
+                self.locais[nome] = caminhos
+                self._raizes[nome] = raiz
+        # O documento é compartilhado pelas renderizações: uma por vez o altera e grava
+        self._trava = threading.Lock()
+
+    def substituir_texto(self, texto, substituicoes):
+        """Substitui todos os placeholders de 'texto' em uma única passada."""
+        return self._regex.sub(lambda m: str(substituicoes.get(m.group(0), m.group(0))), texto)
+
+    def renderizar_bytes(self, substituicoes):
+        """
+        Retorna os bytes do .docx com os placeholders substituídos, sem
+        analisar o modelo de novo. 'substituicoes' é um dicionário como
+        {'{{PLACEHOLDER}}': 'Valor Real'}. O valor mantém a formatação da 'run'
+        onde o placeholder começa.
+        """
+        saida = io.BytesIO()
+        with self._trava:
+            paragrafos = [_elemento_do_caminho(self._raizes[nome], caminho)
+                          for nome, caminhos in self.locais.items() for caminho in caminhos]
+            # Cópias tiradas antes de qualquer alteração (um parágrafo pode conter outro, ex.: caixa de texto)
+            originais = [copy.deepcopy(paragrafo) for paragrafo in paragrafos]
+            try:
+                for paragrafo in paragrafos:
+                    substituir_em_paragrafo(nos_texto_do_paragrafo(paragrafo), self._regex, substituicoes)
+                self._documento.save(saida)
+            finally:
+                for paragrafo, original in zip(paragrafos, originais):
+                    paragrafo.getparent().replace(paragrafo, original)
+        return saida.getvalue()
+
+    def renderizar(self, substituicoes):
+        """Igual a renderizar_bytes, mas retorna um novo Document (do python-docx) já preenchido."""
+        return abrir_documento(self.renderizar_bytes(substituicoes))
@@ -0,0 +1,723 @@
+# Ethyïos
+# Motor de geração de declarações sem interface gráfica.
+# Contém o pipeline carregar/substituir/salvar/converter usado pela GUI
+# e uma API de lote (com linha de comando) que distribui os registros
+# entre vários processos.
+import os
+import re
+import sys
+import json
+import argparse
+import sqlite3
+import threading
+import unicodedata
+import armazenamento_modelo
+import saida_atomica
+import metricas_etapas
+from conversores import CONVERSORES, Conversor, obter_conversor, nome_conversor_padrao
+from pdf_carimbado import ModeloPdfCarimbado, ErroCarimbo, descartar_base
+from cache_pdf import CachePdf, chave_cache
+from registro_modelos import RegistroModelos, NOME_PADRAO
+from indice_declaracoes import INDEX_BASENAME, IndiceDeclaracoes, subpasta_por_data
+# python-docx e lxml (renderizadores) são importados somente quando usados;
+# ver _classe_renderizador. Isso mantém a abertura da GUI rápida.
+
+# --- Constantes para o modelo ---
+HIDDEN_FOLDER_NAME = "._modelo_data"
+MODEL_BASENAME = armazenamento_modelo.MODEL_DOCX_BASENAME
+
+# --- Configuração ---
+OUTPUT_FOLDER_NAME = "declaracoes_geradas"
+PLACEHOLDERS = {
+    "nome_responsavel": "{{NOME_RESPONSAVEL}}",
+    "nome_filho": "{{NOME_FILHO}}",
+    "serie": "{{SERIE}}",
+    "data": "{{DATA}}",
+    "periodo": "{{PERIODO}}"
+}
+
+# Backends de renderização: "ooxml" edita o XML do pacote diretamente e copia
+# os demais membros do zip sem recompactar; "python-docx" usa os objetos do python-docx.
+RENDERIZADORES = ("ooxml", "python-docx")
+RENDERIZADOR_PADRAO = "ooxml"
+
+# Modos de geração: "conversao" converte cada declaração preenchida em PDF;
+# "carimbo" converte o modelo uma única vez e escreve os valores sobre o PDF base.
+MODOS = ("conversao", "carimbo")
+MODO_PADRAO = "conversao"
+PDF_BASE_FOLDER_NAME = "pdf_base" # Dentro de HIDDEN_FOLDER_NAME
+CACHE_FOLDER_NAME = "cache_pdf" # Dentro de HIDDEN_FOLDER_NAME
+LOG_FOLDER_NAME = "logs" # Dentro de HIDDEN_FOLDER_NAME; tempos de cada etapa (metricas_etapas)
+
+class ErroModelo(Exception):
+    """Erro ao interpretar os bytes do modelo DOCX importado."""
+
+
+def get_application_path():
+    """Retorna o caminho base da aplicação, seja script ou executável."""
+    if getattr(sys, 'frozen', False): # Rodando como bundle PyInstaller
+        return os.path.dirname(sys.executable)
+    else: # Rodando como script
+        return os.path.dirname(os.path.abspath(__file__))
+
+def pasta_modelo_padrao():
+    """Retorna a pasta oculta da aplicação onde o modelo importado é armazenado."""
+    return os.path.join(get_application_path(), HIDDEN_FOLDER_NAME)
+
+def _classe_renderizador(renderizador):
+    """Importa (na primeira vez) e retorna a classe do renderizador escolhido."""
+    if renderizador == "ooxml":
+        from renderizador_ooxml import ModeloOoxml
+        return ModeloOoxml
+    if renderizador == "python-docx":
+        from modelo_compilado import ModeloCompilado
+        return ModeloCompilado
+    raise ValueError(f"Renderizador desconhecido: {renderizador}")
+
+def extrair_placeholders(docx_bytes):
+    """Lista os placeholders de PLACEHOLDERS efetivamente presentes no modelo."""
+    return list(_classe_renderizador("ooxml")(docx_bytes, PLACEHOLDERS.values()).placeholders_presentes)
+
+def carregar_modelo_armazenado(pasta_modelo=None):
+    """
+    Carrega o modelo importado (blob .docx + manifesto, ou o formato antigo .py,
+    que é migrado). Retorna um armazenamento_modelo.ModeloArmazenado.
+    Lança FileNotFoundError, ImportError ou AttributeError para que cada
+    chamador (GUI ou lote) decida como apresentar o problema.
+    """
+    return armazenamento_modelo.carregar_modelo(pasta_modelo or pasta_modelo_padrao(), extrair_placeholders)
+
+def recarregar_modelo_se_mudou(hash_atual, pasta_modelo=None, assinatura_atual=None):
+    """
+    Retorna None se o modelo importado ainda tem o hash 'hash_atual'; senão, o
+    novo modelo. 'assinatura_atual' é a ModeloArmazenado.assinatura do modelo
+    em uso (ver armazenamento_modelo.carregar_se_mudou).
+    """
+    return armazenamento_modelo.carregar_se_mudou(pasta_modelo or pasta_modelo_padrao(), hash_atual,
+                                                  extrair_placeholders, assinatura_atual)
+
+def carregar_docx_bytes(model_file_path=None):
+    """
+    Lê os bytes do modelo DOCX. 'model_file_path' pode ser a pasta do modelo,
+    um arquivo .docx ou um declaracao_base_bytes.py do formato antigo; por
+    padrão usa o modelo importado na pasta oculta da aplicação.
+    """
+    if model_file_path is None or os.path.isdir(model_file_path):
+        return carregar_modelo_armazenado(model_file_path).docx_bytes
+    if not os.path.exists(model_file_path):
+        raise FileNotFoundError(model_file_path)
+    if model_file_path.lower().endswith(".py"):
+        return armazenamento_modelo.ler_modelo_legado(model_file_path)
+    return armazenamento_modelo.ler_blob(model_file_path)
+
+def formatar_data_por_extenso(data_str):
+    """Converte uma data de 'DD/MM/AAAA' para 'DD de [mês] de AAAA'."""
+    try:
+        dia, mes_num, ano = data_str.split('/')
+        meses = {
+            "01": "janeiro",
+            "02": "fevereiro",
+            "03": "março",
+            "04": "abril",
+            "05": "maio",
+            "06": "junho",
+            "07": "julho",
+            "08": "agosto",
+            "09": "setembro",
+            "10": "outubro",
+            "11": "novembro",
+            "12": "dezembro"
+        }
+        mes_extenso = meses.get(mes_num, "")
+        if not mes_extenso:
+            return data_str # Retorna original se o mês for inválido
+        return f"{dia} de {mes_extenso} de {ano}"
+    except ValueError:
+        # Retorna a string original se o formato for inesperado
+        return data_str
+
+def apply_replacements(doc, replacements):
+    """
+    Substitui os placeholders em todo o documento: corpo, tabelas (inclusive
+    aninhadas), caixas de texto, cabeçalhos, rodapés e notas, percorrendo o
+    XML de cada parte uma única vez. Placeholders divididos em várias 'runs'
+    são encontrados, e o valor mantém a formatação da 'run' onde o
+    placeholder começa.
+    'replacements' é um dicionário como {'{{PLACEHOLDER}}': 'Valor Real'}
+    """
+    from modelo_compilado import partes_de_texto # Só carrega python-docx/lxml quando usado
+    from renderizador_ooxml import substituir_na_arvore
+    if not replacements:
+        return
+    # Marcadores mais longos primeiro, para que um não seja confundido com o início de outro
+    regex = re.compile("|".join(re.escape(p) for p in sorted(replacements, key=len, reverse=True)))
+    for _, raiz in partes_de_texto(doc):
+        substituir_na_arvore(raiz, regex, replacements)
+
+LIMITE_MODELOS_COMPILADOS = 8 # Modelos mantidos compilados por renderizador (vários tipos de declaração)
+_modelos_compilados = {} # (renderizador, hash) -> modelo compilado, do menos ao mais recentemente usado
+_trava_modelos = threading.Lock()
+
+def compilar_modelo(docx_bytes, renderizador=RENDERIZADOR_PADRAO):
+    """
+    Retorna o modelo compilado dos bytes informados para o renderizador escolhido,
+    reaproveitando compilações anteriores (uma compilação por processo, por
+    modelo e por renderizador; até LIMITE_MODELOS_COMPILADOS modelos diferentes).
+    """
+    classe = _classe_renderizador(renderizador)
+    with _trava_modelos:
+        for (nome, _), modelo in _modelos_compilados.items():
+            if nome == renderizador and modelo.docx_bytes is docx_bytes:
+                return modelo
+    chave = (renderizador, armazenamento_modelo.calcular_hash(docx_bytes))
+    with _trava_modelos:
+        modelo = _modelos_compilados.pop(chave, None)
+    if modelo is None:
+        try:
+            modelo = classe(docx_bytes, PLACEHOLDERS.values())
+        except Exception as e_load:
+            raise ErroModelo(str(e_load)) from e_load
+    with _trava_modelos:
+        _modelos_compilados[chave] = modelo
+        while len(_modelos_compilados) > LIMITE_MODELOS_COMPILADOS * len(RENDERIZADORES):
+            del _modelos_compilados[next(iter(_modelos_compilados))]
+    return modelo
+
+_modelos_carimbados = {} # hash do modelo -> ModeloPdfCarimbado, ou None se o modelo não admite carimbo
+
+def _pasta_pdf_base():
+    return os.path.join(get_application_path(), HIDDEN_FOLDER_NAME, PDF_BASE_FOLDER_NAME)
+
+def obter_modelo_carimbado(docx_bytes, conversor):
+    """
+    Retorna o ModeloPdfCarimbado do modelo (criando o PDF base na primeira vez),
+    ou None se o modelo não puder ser usado no modo carimbo.
+    """
+    modelo_ooxml = compilar_modelo(docx_bytes, "ooxml")
+    if modelo_ooxml.hash not in _modelos_carimbados:
+        try:
+            carimbado = ModeloPdfCarimbado(docx_bytes, modelo_ooxml.placeholders_presentes,
+                                           conversor, _pasta_pdf_base())
+        except ErroCarimbo:
+            carimbado = None # Volta para a conversão completa a cada registro
+        if len(_modelos_carimbados) >= LIMITE_MODELOS_COMPILADOS:
+            del _modelos_carimbados[next(iter(_modelos_carimbados))]
+        _modelos_carimbados[modelo_ooxml.hash] = carimbado
+    return _modelos_carimbados[modelo_ooxml.hash]
+
+_cache_compartilhado = None
+
+def obter_cache():
+    """Cache de PDFs do processo, na pasta oculta do modelo (limite via DECLARACAO_CACHE_MB)."""
+    global _cache_compartilhado
+    if _cache_compartilhado is None:
+        _cache_compartilhado = CachePdf(os.path.join(get_application_path(), HIDDEN_FOLDER_NAME,
+                                                     CACHE_FOLDER_NAME))
+    return _cache_compartilhado
+
+def invalidar_cache(hash_anterior=None):
+    """
+    Chamado quando um modelo é substituído por outro ('hash_anterior' é o
+    modelo substituído). Os PDFs em cache não são apagados: as chaves incluem
+    o hash do modelo, então os do modelo anterior simplesmente deixam de ser
+    usados e saem pelo limite de tamanho, e os dos demais modelos continuam
+    valendo. O PDF base do modo carimbo é descartado se nenhum modelo do
+    registro ainda usar o conteúdo anterior.
+    """
+    if not hash_anterior:
+        return
+    registro = obter_registro()
+    for nome in registro.nomes():
+        manifesto = armazenamento_modelo.ler_manifesto(registro.pasta_do_modelo(nome))
+        if manifesto is not None and manifesto.get("hash") == hash_anterior:
+            return # Outro tipo de declaração tem o mesmo modelo
+    _modelos_carimbados.pop(hash_anterior, None)
+    descartar_base(_pasta_pdf_base(), hash_anterior)
+
+def configurar_log_etapas():
+    """
+    Grava os tempos de cada etapa em ._modelo_data/logs/, em um arquivo próprio
+    deste processo (ver metricas_etapas.configurar). Retorna o caminho (ou None).
+    """
+    return metricas_etapas.configurar(os.path.join(get_application_path(), HIDDEN_FOLDER_NAME, LOG_FOLDER_NAME))
+
+_indice = None
+
+def obter_indice():
+    """Índice (SQLite) das declarações geradas, na pasta oculta da aplicação."""
+    global _indice
+    if _indice is None:
+        _indice = IndiceDeclaracoes(os.path.join(get_application_path(), HIDDEN_FOLDER_NAME, INDEX_BASENAME))
+    return _indice
+
+def indexar_declaracao(caminho_pdf, registro, hash_modelo, pagina_inicial=None):
+    """
+    Registra a declaração no índice. Uma falha do índice não desfaz a
+    geração: fica registrada como etapa "indexar" malsucedida no log de tempos.
+    """
+    try:
+        with metricas_etapas.medir("indexar"):
+            obter_indice().registrar(caminho_pdf, registro, hash_modelo, pagina_inicial)
+    except sqlite3.Error:
+        pass
+
+_registro_modelos = None
+
+def obter_registro():
+    """
+    Registro dos modelos nomeados do processo (ver registro_modelos). Cada modelo
+    é compilado para o renderizador padrão assim que é carregado.
+    """
+    global _registro_modelos
+    if _registro_modelos is None:
+        _registro_modelos = RegistroModelos(pasta_modelo_padrao(), extrair_placeholders, _aquecer_modelo)
+    return _registro_modelos
+
+def _aquecer_modelo(entrada):
+    try:
+        compilar_modelo(entrada.docx_bytes)
+    except ErroModelo:
+        pass # O erro é apresentado ao gerar a primeira declaração com este modelo
+
+def validar_registro(registro):
+    """Retorna a lista de campos obrigatórios ausentes ou vazios no registro."""
+    return [campo for campo in PLACEHOLDERS if not str(registro.get(campo) or "").strip()]
+
+def montar_substituicoes(registro):
+    """Monta o dicionário {'{{PLACEHOLDER}}': valor} a partir de um registro."""
+    replacements_dict = {}
+    for campo, placeholder in PLACEHOLDERS.items():
+        valor = registro[campo]
+        if campo == "data":
+            valor = formatar_data_por_extenso(valor)
+        replacements_dict[placeholder] = normalizar_valor(valor)
+    return replacements_dict
+
+def normalizar_valor(valor):
+    """
+    Forma canônica de um valor preenchido: Unicode NFC e espaços em excesso
+    removidos. Valores digitados de formas equivalentes geram o mesmo PDF (e a mesma chave no cache).
+    """
+    return " ".join(unicodedata.normalize("NFC", str(valor)).split())
+
+def nome_arquivo_seguro(texto):
+    """Sanitiza um componente do nome do arquivo para evitar erros."""
+    return "".join(c if c.isalnum() else "_" for c in texto)
+
+def nome_base_declaracao(registro):
+    """Nome do arquivo da declaração de um registro, sem extensão: Declaracao_<nome>_<data>."""
+    safe_nome_filho = nome_arquivo_seguro(registro["nome_filho"])
+    safe_data = nome_arquivo_seguro(registro["data"].replace("/", "-"))
+    return f"Declaracao_{safe_nome_filho}_{safe_data}"
+
+def gerar_pdf_bytes(docx_bytes, registro, ao_progredir=None, renderizador=RENDERIZADOR_PADRAO,
+                    conversor=None, modo=MODO_PADRAO, cache=None):
+    """
+    Gera o PDF de uma declaração a partir dos bytes do modelo e de um registro
+    com as chaves de PLACEHOLDERS e retorna os bytes do PDF, sem gravá-lo.
+    'ao_progredir', se informado, é chamado como ao_progredir(percentual, mensagem).
+    'conversor' é uma instância de Conversor ou o nome de um backend; por padrão
+    usa o conversor compartilhado do processo (mantido aberto entre chamadas).
+    'modo' é um de MODOS; no modo "carimbo", se o modelo não permitir, a
+    declaração é gerada por conversão normalmente.
+    'cache' é um CachePdf, None para o cache compartilhado do processo ou False
+    para sempre gerar de novo.
+    """
+    if modo not in MODOS:
+        raise ValueError(f"Modo desconhecido: {modo}")
+    if not isinstance(conversor, Conversor):
+        conversor = obter_conversor(conversor)
+
+    def progredir(valor, mensagem):
+        if ao_progredir is not None:
+            ao_progredir(valor, mensagem)
+
+    faltando = validar_registro(registro)
+    if faltando:
+        raise ValueError(f"Campos obrigatórios ausentes: {', '.join(faltando)}")
+
+    # 1. Obtém o modelo compilado (analisado uma única vez por modelo)
+    with metricas_etapas.medir("carregar_modelo", renderizador=renderizador):
+        modelo = compilar_modelo(docx_bytes, renderizador)
+        carimbado = obter_modelo_carimbado(docx_bytes, conversor) if modo == "carimbo" else None
+    progredir(10, "Modelo carregado...")
+    substituicoes = montar_substituicoes(registro)
+
+    # 2. Declaração idêntica já gerada com este modelo: reutiliza o PDF
+    if cache is None:
+        cache = obter_cache()
+    chave = None
+    if cache and cache.ativo:
+        chave = chave_cache(modelo.hash, substituicoes,
+                            "carimbo" if carimbado is not None else f"conversao:{conversor.nome}")
+        with metricas_etapas.medir("cache_obter"):
+            pdf_bytes = cache.obter(chave)
+        if pdf_bytes is not None:
+            progredir(60, "PDF obtido do cache...")
+            return pdf_bytes
+
+    if carimbado is not None:
+        # Modo carimbo: escreve os valores sobre o PDF base, sem conversão
+        with metricas_etapas.medir("carimbar"):
+            pdf_bytes = carimbado.carimbar(substituicoes)
+    else:
+        # 3. Aplica as substituições em memória, apenas nos locais indexados
+        with metricas_etapas.medir("preencher", renderizador=renderizador):
+            docx_preenchido = modelo.renderizar_bytes(substituicoes)
+        progredir(40, "Dados preenchidos no modelo...")
+
+        # 4. Converte para PDF; o DOCX intermediário fica em uma pasta temporária
+        # privada (memória compartilhada quando disponível), nunca na pasta de saída
+        progredir(60, "Convertendo para PDF...")
+        with metricas_etapas.medir("converter", conversor=conversor.nome):
+            pdf_bytes = conversor.converter_bytes(docx_preenchido)
+    if chave is not None:
+        with metricas_etapas.medir("cache_guardar"):
+            cache.guardar(chave, pdf_bytes)
+    return pdf_bytes
+
+def gerar_documento_pdf(docx_bytes, registro, pasta_saida=OUTPUT_FOLDER_NAME, ao_progredir=None,
+                        renderizador=RENDERIZADOR_PADRAO, conversor=None, modo=MODO_PADRAO, cache=None,
+                        indexar=True):
+    """
+    Gera o PDF de uma declaração (ver gerar_pdf_bytes) e o grava em
+    'pasta_saida', na subpasta <ano>/<mês> da data da declaração. Com
+    'indexar', registra a declaração no índice (ver obter_indice).
+    Retorna o caminho do PDF gerado; se já existir uma declaração com o mesmo
+    nome, o novo arquivo recebe um sufixo (_2, _3...).
+    """
+    with metricas_etapas.medir("declaracao", modo=modo):
+        pdf_bytes = gerar_pdf_bytes(docx_bytes, registro, ao_progredir, renderizador, conversor, modo, cache)
+        output_pdf_path = publicar_declaracao(pdf_bytes, registro, docx_bytes, pasta_saida, renderizador, indexar)
+    if ao_progredir is not None:
+        ao_progredir(90, "PDF gerado...")
+    return output_pdf_path
+
+def publicar_declaracao(pdf_bytes, registro, docx_bytes, pasta_saida=OUTPUT_FOLDER_NAME,
+                        renderizador=RENDERIZADOR_PADRAO, indexar=True):
+    """
+    Grava um PDF já gerado (ex.: pela geração especulativa da GUI) como em
+    gerar_documento_pdf e retorna o seu caminho.
+    """
+    # 5. Publica o PDF na pasta de saída de forma atômica e sem sobrescrever
+    # outra declaração com o mesmo nome (ex.: gerada ao mesmo tempo)
+    with metricas_etapas.medir("gravar_pdf"):
+        output_pdf_path = saida_atomica.publicar(subpasta_por_data(pasta_saida, registro["data"]),
+                                                 nome_base_declaracao(registro), ".pdf", pdf_bytes)
+    if indexar:
+        indexar_declaracao(output_pdf_path, registro, compilar_modelo(docx_bytes, renderizador).hash)
+    return output_pdf_path
+
+
+# --- Geração em lote ---
+
+class ResultadoRegistro:
+    """Resultado da geração de um registro do lote."""
+
+    def __init__(self, indice, registro, caminho_pdf=None, erro=None, do_cache=False, etapas=(), pdf_bytes=None):
+        self.indice = indice
+        self.registro = registro
+        self.caminho_pdf = caminho_pdf
+        self.pdf_bytes = pdf_bytes # Só com devolver_pdf (ver gerar_lote_indexado_iter)
+        self.erro = erro
+        self.do_cache = do_cache
+        self.etapas = etapas # Medições de metricas_etapas feitas no processo de trabalho
+
+    @property
+    def sucesso(self):
+        return self.erro is None
+
+    def para_dict(self):
+        return {
+            "indice": self.indice,
+            "nome_filho": self.registro.get("nome_filho"),
+            "sucesso": self.sucesso,
+            "caminho_pdf": self.caminho_pdf,
+            "do_cache": self.do_cache,
+            "erro": self.erro,
+        }
+
+_modelos_do_processo = {} # hash -> bytes dos modelos recebidos por este processo de trabalho do pool
+
+def _inicializar_processo_lote(docx_bytes, renderizador):
+    """
+    Inicializador dos processos do pool: o modelo chega uma única vez a cada
+    processo (herdado pelo fork, ou serializado uma vez por processo no spawn
+    do Windows) e é compilado antes do primeiro registro. As tarefas levam só
+    o hash do modelo e o registro, não os megabytes do modelo.
+    """
+    _modelos_do_processo[armazenamento_modelo.calcular_hash(docx_bytes)] = docx_bytes
+    try:
+        compilar_modelo(docx_bytes, renderizador)
+    except ErroModelo:
+        pass # O erro é informado em cada registro, em vez de derrubar o pool
+
+def _processar_registro(indice, registro, hash_modelo, pasta_saida, renderizador, conversor, modo,
+                        usar_cache=True, devolver_pdf=False):
+    """
+    Executado nos processos do pool; nunca propaga exceções. 'conversor' é o nome
+    do backend: cada processo mantém a sua instância aberta entre os registros.
+    'hash_modelo' identifica o modelo recebido por _inicializar_processo_lote.
+    Com 'devolver_pdf', o PDF não é gravado: os bytes voltam no resultado.
+    """
+    # Sempre o mesmo objeto bytes: compilar_modelo o reconhece sem recalcular o hash
+    docx_bytes = _modelos_do_processo[hash_modelo]
+    cache = obter_cache() if usar_cache else False
+    acertos_antes = cache.acertos if cache else 0
+    with metricas_etapas.coletar() as etapas:
+        try:
+            if devolver_pdf:
+                caminho = None
+                pdf_bytes = gerar_pdf_bytes(docx_bytes, registro, renderizador=renderizador, conversor=conversor,
+                                            modo=modo, cache=cache)
+            else:
+                pdf_bytes = None
+                caminho = gerar_documento_pdf(docx_bytes, registro, pasta_saida, renderizador=renderizador,
+                                              conversor=conversor, modo=modo, cache=cache)
+        except Exception as e:
+            return ResultadoRegistro(indice, registro, erro=f"{type(e).__name__}: {e}", etapas=etapas)
+    # Cada processo gera um registro por vez: o contador só pode ter mudado por este registro
+    do_cache = bool(cache) and cache.acertos > acertos_antes
+    return ResultadoRegistro(indice, registro, caminho_pdf=caminho, do_cache=do_cache, etapas=etapas,
+                             pdf_bytes=pdf_bytes)
+
+EM_ANDAMENTO_POR_PROCESSO = 4 # Registros enviados ao pool (e mantidos em memória) por processo de trabalho
+
+def gerar_lote_indexado_iter(pares, docx_bytes=None, pasta_saida=OUTPUT_FOLDER_NAME, processos=None,
+                             renderizador=RENDERIZADOR_PADRAO, conversor=None, modo=MODO_PADRAO, usar_cache=True,
+                             max_em_andamento=None, devolver_pdf=False, ao_interromper=None):
+    """
+    Igual a gerar_lote_iter, mas recebe pares (índice, registro). 'pares' é
+    consumido aos poucos: no máximo 'max_em_andamento' registros (padrão:
+    EM_ANDAMENTO_POR_PROCESSO por processo) ficam no pool ao mesmo tempo, de
+    modo que um gerador de milhares de linhas não é lido de uma vez para a memória.
+    Com 'devolver_pdf', nada é gravado na pasta de saída nem no índice: cada
+    resultado traz os bytes do PDF em 'pdf_bytes' (ex.: para exportar_zip).
+    Se a iteração for interrompida (Ctrl+C, ou o consumidor parar), os
+    registros que ainda não começaram são descartados; os que já estavam em
+    execução terminam, e podem ter publicado o PDF: cada um desses resultados
+    é passado a 'ao_interromper(resultado)' (ex.: para registrá-lo no diário).
+    """
+    from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait # Só o modo em lote usa processos
+    if docx_bytes is None:
+        docx_bytes = carregar_docx_bytes()
+    conversor = conversor or nome_conversor_padrao()
+    limite = max_em_andamento or EM_ANDAMENTO_POR_PROCESSO * (processos or os.cpu_count() or 1)
+    hash_modelo = armazenamento_modelo.calcular_hash(docx_bytes)
+    pares = iter(pares)
+    with ProcessPoolExecutor(max_workers=processos, initializer=_inicializar_processo_lote,
+                             initargs=(docx_bytes, renderizador)) as pool:
+        pendentes = set()
+        a_entregar = []
+        esgotado = False
+        try:
+            while True:
+                while not esgotado and len(pendentes) < limite:
+                    par = next(pares, None)
+                    if par is None:
+                        esgotado = True
+                    else:
+                        indice, registro = par
+                        pendentes.add(pool.submit(_processar_registro, indice, registro, hash_modelo, pasta_saida,
+                                                  renderizador, conversor, modo, usar_cache, devolver_pdf))
+                if not pendentes:
+                    return
+                prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                a_entregar = list(prontos)
+                while a_entregar:
+                    resultado = a_entregar.pop(0).result()
+                    metricas_etapas.repassar(resultado.etapas) # Os processos de trabalho não escrevem no log
+                    yield resultado
+        finally:
+            for futuro in pendentes: # Iteração interrompida: descarta o que ainda não começou
+                futuro.cancel()
+            # O que já terminou ou estava em execução não é desfeito: o pool espera por eles ao fechar
+            for futuro in a_entregar + [futuro for futuro in pendentes if not futuro.cancelled()]:
+                try:
+                    resultado = futuro.result()
+                except BaseException: # O processo de trabalho também foi interrompido: nada foi publicado
+                    continue
+                metricas_etapas.repassar(resultado.etapas)
+                if ao_interromper is not None:
+                    ao_interromper(resultado)
+
+def gerar_lote_iter(registros, docx_bytes=None, pasta_saida=OUTPUT_FOLDER_NAME, processos=None,
+                    renderizador=RENDERIZADOR_PADRAO, conversor=None, modo=MODO_PADRAO, usar_cache=True):
+    """
+    Gera as declarações de 'registros' em um pool de 'processos' processos,
+    produzindo um ResultadoRegistro à medida que cada um termina.
+    Com 'usar_cache', declarações já geradas com o mesmo modelo e os mesmos valores são reaproveitadas.
+    """
+    return gerar_lote_indexado_iter(enumerate(registros), docx_bytes, pasta_saida, processos,
+                                    renderizador, conversor, modo, usar_cache)
+
+def gerar_lote(registros, docx_bytes=None, pasta_saida=OUTPUT_FOLDER_NAME, processos=None,
+               renderizador=RENDERIZADOR_PADRAO, conversor=None, modo=MODO_PADRAO, usar_cache=True):
+    """Igual a gerar_lote_iter, mas retorna a lista de resultados na ordem dos registros."""
+    resultados = list(gerar_lote_iter(registros, docx_bytes, pasta_saida, processos,
+                                      renderizador, conversor, modo, usar_cache))
+    resultados.sort(key=lambda r: r.indice)
+    return resultados
+
+def ler_registros(caminho):
+    """
+    Lê todos os registros de um arquivo .csv (separado por ',' ou ';'), .xlsx,
+    .jsonl ou .json (ver entrada_lote.iterar_registros, que os lê um a um).
+    """
+    from entrada_lote import iterar_registros # Evita importação circular
+    return [registro for _, registro in iterar_registros(caminho)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera declarações em PDF em lote, sem interface gráfica.")
+    parser.add_argument("entrada", help="Arquivo .csv, .xlsx (requer openpyxl), .jsonl ou .json com os registros.")
+    parser.add_argument("--saida", default=OUTPUT_FOLDER_NAME, help="Pasta de saída dos PDFs.")
+    parser.add_argument("--processos", type=int, default=None,
+                        help="Número de processos de trabalho (padrão: número de CPUs).")
+    origem_modelo = parser.add_mutually_exclusive_group()
+    origem_modelo.add_argument("--modelo", default=None,
+                               help="Arquivo .docx (ou .py do formato antigo) do modelo (padrão: modelo importado).")
+    origem_modelo.add_argument("--tipo", default=None,
+                               help=f"Nome de um modelo importado no registro (ex.: frequencia, matricula; "
+                                    f"o modelo único é '{NOME_PADRAO}').")
+    parser.add_argument("--renderizador", choices=sorted(RENDERIZADORES), default=RENDERIZADOR_PADRAO,
+                        help="Backend usado para preencher o modelo (padrão: %(default)s).")
+    parser.add_argument("--conversor", choices=sorted(CONVERSORES), default=None,
+                        help="Backend de conversão DOCX->PDF (padrão: docx2pdf no Windows/macOS, "
+                             "libreoffice nos demais).")
+    parser.add_argument("--modo", choices=MODOS, default=MODO_PADRAO,
+                        help="'carimbo' converte o modelo uma única vez e escreve os valores sobre o PDF base "
+                             "(requer pypdf; padrão: %(default)s).")
+    parser.add_argument("--sem-cache", action="store_true",
+                        help="Gera todas as declarações de novo, sem reaproveitar PDFs em cache.")
+    parser.add_argument("--turma", action="store_true",
+                        help="Gera um único PDF com todas as declarações (uma conversão), com índice de páginas.")
+    parser.add_argument("--separar", action="store_true",
+                        help="Com --turma, grava também um PDF por aluno (requer pypdf).")
+    parser.add_argument("--zip", default=None, metavar="ARQUIVO",
+                        help="Grava todos os PDFs em um único .zip ('-' para a saída padrão), à medida que ficam "
+                             "prontos, em vez de gravá-los na pasta de saída.")
+    parser.add_argument("--reiniciar", action="store_true",
+                        help="Ignora o diário de um lote interrompido e gera todos os registros de novo.")
+    parser.add_argument("--relatorio", default=None, help="Grava o resultado de cada registro em JSON.")
+    parser.add_argument("--tempos", action="store_true",
+                        help="Ao final, mostra a mediana (p50) e o p95 do tempo de cada etapa.")
+    args = parser.parse_args(argv)
+    if args.zip and args.turma:
+        parser.error("--zip não pode ser usado com --turma.")
+    configurar_log_etapas()
+
+    try:
+        if args.tipo:
+            docx_bytes = obter_registro().obter(args.tipo).docx_bytes
+        else:
+            docx_bytes = carregar_docx_bytes(args.modelo)
+    except Exception as e:
+        print(f"Erro ao carregar o modelo DOCX: {e}", file=sys.stderr)
+        return 2
+
+    from entrada_lote import ErroEntrada, LoteRetomavel # Evita importação circular
+    try:
+        if args.turma:
+            codigo = _main_turma(args, ler_registros(args.entrada), docx_bytes)
+            _imprimir_tempos(args)
+            return codigo
+        if args.zip:
+            codigo = _main_zip(args, docx_bytes)
+            _imprimir_tempos(args)
+            return codigo
+
+        # As linhas são lidas em fluxo; o diário permite retomar um lote interrompido
+        lote = LoteRetomavel(args.entrada, docx_bytes, args.saida, args.processos, args.renderizador,
+                             args.conversor, args.modo, not args.sem_cache, reiniciar=args.reiniciar)
+        if lote.diario.retomado and lote.diario.terminado:
+            print(f"Lote já executado ({len(lote.diario.concluidos)} registros concluídos): "
+                  "gerando apenas os que falharam.")
+        elif lote.diario.retomado:
+            print(f"Retomando o lote interrompido ({len(lote.diario.concluidos)} registros já concluídos).")
+        total = do_cache = 0
+        resultados = [] # Só guardados para o relatório
+        for resultado in lote.resultados():
+            total += 1
+            do_cache += resultado.do_cache
+            if args.relatorio:
+                resultados.append(resultado)
+            if resultado.sucesso:
+                origem = " (cache)" if resultado.do_cache else ""
+                print(f"OK   [{resultado.indice}] {resultado.caminho_pdf}{origem}")
+            else:
+                print(f"ERRO [{resultado.indice}] {resultado.erro}", file=sys.stderr)
+    except (ErroEntrada, OSError) as e:
+        print(f"Erro ao ler '{args.entrada}': {e}", file=sys.stderr)
+        return 2
+
+    if args.relatorio:
+        resultados.sort(key=lambda r: r.indice)
+        with open(args.relatorio, "w", encoding="utf-8") as f:
+            json.dump([r.para_dict() for r in resultados], f, ensure_ascii=False, indent=2)
+
+    pulados = f", {lote.pulados} já concluídas antes" if lote.pulados else ""
+    print(f"{total - lote.falhas} de {total} declarações geradas ({do_cache} do cache{pulados}).")
+    if lote.erros_de_geracao and os.path.exists(lote.diario.caminho):
+        print(f"Execute de novo para tentar apenas as que falharam (diário em '{lote.diario.caminho}').")
+    invalidas = lote.falhas - lote.erros_de_geracao
+    if invalidas:
+        print(f"{invalidas} linha(s) com campos obrigatórios ausentes: corrija '{args.entrada}' e execute de novo.",
+              file=sys.stderr)
+    _imprimir_tempos(args)
+    return 1 if lote.falhas else 0
+
+def _imprimir_tempos(args):
+    if args.tempos:
+        # Com '--zip -', a saída padrão é o próprio ZIP
+        mensagens = sys.stderr if args.zip == "-" else sys.stdout
+        for etapa, valores in metricas_etapas.percentis().items():
+            print(f"  {etapa:<16} n={valores['n']:<5} p50={valores['p50_ms']:.1f} ms  p95={valores['p95_ms']:.1f} ms",
+                  file=mensagens)
+
+def _main_zip(args, docx_bytes):
+    from exportar_zip import exportar_lote_zip # Evita importação circular
+    mensagens = sys.stderr if args.zip == "-" else sys.stdout # Com '-', a saída padrão é o próprio ZIP
+    total = falhas = do_cache = 0
+    resultados = [] # Só guardados para o relatório
+    for resultado in exportar_lote_zip(args.entrada, docx_bytes, args.zip, args.processos, args.renderizador,
+                                       args.conversor, args.modo, not args.sem_cache):
+        total += 1
+        do_cache += resultado.do_cache
+        if args.relatorio:
+            resultados.append(resultado)
+        if resultado.sucesso:
+            print(f"OK   [{resultado.indice}] {resultado.caminho_pdf}", file=mensagens)
+        else:
+            falhas += 1
+            print(f"ERRO [{resultado.indice}] {resultado.erro}", file=sys.stderr)
+    if args.relatorio:
+        resultados.sort(key=lambda r: r.indice)
+        with open(args.relatorio, "w", encoding="utf-8") as f:
+            json.dump([r.para_dict() for r in resultados], f, ensure_ascii=False, indent=2)
+    destino = "a saída padrão" if args.zip == "-" else f"'{args.zip}'"
+    print(f"{total - falhas} de {total} declarações exportadas para {destino} ({do_cache} do cache).", file=mensagens)
+    return 1 if falhas else 0
+
+def _main_turma(args, registros, docx_bytes):
+    from declaracao_turma import ErroTurma, gerar_pdf_turma # Evita importação circular
+    try:
+        resultado = gerar_pdf_turma(registros, docx_bytes, args.saida, conversor=args.conversor,
+                                    separar=args.separar)
+    except ErroTurma as e:
+        print(f"Erro ao gerar o PDF da turma: {e}", file=sys.stderr)
+        return 1
+    for entrada in resultado.entradas:
+        paginas = f" (página {entrada['pagina_inicial']})" if "pagina_inicial" in entrada else ""
+        print(f"OK   [{entrada['indice']}] {entrada['nome_filho']}{paginas}")
+    for erro in resultado.erros:
+        print(f"ERRO [{erro['indice']}] {erro['erro']}", file=sys.stderr)
+    if resultado.aviso:
+        print(resultado.aviso, file=sys.stderr)
+    if args.relatorio:
+        with open(args.relatorio, "w", encoding="utf-8") as f:
+            json.dump(resultado.para_dict(), f, ensure_ascii=False, indent=2)
+    print(f"PDF da turma: {resultado.caminho_pdf} (índice em {resultado.caminho_indice})")
+    return 1 if resultado.erros else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,514 @@
+# Ethyïos
+# Modo "carimbo": o modelo é convertido em PDF uma única vez e cada
+# declaração é produzida apenas escrevendo os valores sobre essa página base.
+# Não há conversão DOCX->PDF por registro.
+#
+# Requer o pacote opcional 'pypdf'. Antes da conversão, cada placeholder do
+# modelo é isolado em uma 'run' própria, pintada com uma cor marcadora
+# exclusiva daquele placeholder. No PDF convertido, os operadores de texto
+# desenhados com uma cor marcadora dão a posição, a fonte e o tamanho de cada
+# placeholder, e são trocados por um avanço em branco da mesma largura: o
+# texto do placeholder sai do conteúdo da página base (não aparece ao copiar,
+# buscar ou em leitores de tela) e o resto da linha não se move.
+# Os valores são escritos na fonte padrão do PDF mais próxima da fonte do
+# modelo (Times, Helvetica ou Courier, com negrito e itálico), no tamanho do
+# modelo; um valor mais longo que o placeholder avança sobre o que vem depois,
+# sem ser reduzido. Funciona melhor quando os placeholders ficam em espaços
+# reservados do modelo (ex.: "Nome: {{NOME_FILHO}}").
+import io
+import os
+import re
+import copy
+import json
+import math
+import hashlib
+import zipfile
+import itertools
+import saida_atomica
+from conversores import montar_pdf, escapar_texto_pdf
+
+# Larguras da Helvetica (unidades de 1/1000 do tamanho da fonte) para ASCII 32..126,
+# usadas para as fontes padrão do PDF, que não trazem /Widths
+_LARGURAS_HELVETICA = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+_LARGURA_PADRAO = 556
+_LARGURA_COURIER = 600
+# A versão entra no nome dos arquivos do cache: bases de versões anteriores são refeitas
+_SUFIXO_BASE = ".v2.pdf"
+_SUFIXO_CAMPOS = ".v2.json"
+
+# Cor marcadora do placeholder de índice i: RGB (1, 2, 16 + i)
+_MARCADOR_VERMELHO = 1
+_MARCADOR_VERDE = 2
+_MARCADOR_PRIMEIRO_AZUL = 16
+
+# Fontes padrão do PDF por família: (normal, negrito, itálico, negrito e itálico)
+_FONTES_PADRAO = {
+    "Times": ("Times-Roman", "Times-Bold", "Times-Italic", "Times-BoldItalic"),
+    "Helvetica": ("Helvetica", "Helvetica-Bold", "Helvetica-Oblique", "Helvetica-BoldOblique"),
+    "Courier": ("Courier", "Courier-Bold", "Courier-Oblique", "Courier-BoldOblique"),
+}
+_NOMES_SERIFADOS = ("times", "serif", "roman", "georgia", "cambria", "garamond", "book", "palatino",
+                    "century", "baskerville", "caslon", "minion")
+_NOMES_MONOESPACADOS = ("mono", "courier", "consolas", "typewriter")
+_NOMES_NEGRITO = ("bold", "black", "heavy", "demi")
+_NOMES_ITALICO = ("italic", "oblique")
+_FLAG_MONOESPACADA = 1
+_FLAG_SERIFADA = 2
+_FLAG_ITALICA = 64
+_FLAG_NEGRITO = 1 << 18
+
+_IDENTIDADE = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+
+class ErroCarimbo(Exception):
+    """O modelo não pode ser usado no modo carimbo (ex.: placeholder não localizado no PDF)."""
+
+
+def _importar_pypdf():
+    try:
+        import pypdf
+    except ImportError as e:
+        raise ErroCarimbo("O modo carimbo requer o pacote 'pypdf' (pip install pypdf).") from e
+    return pypdf
+
+
+def cor_marcadora(indice):
+    """Cor ("RRGGBB") que identifica o placeholder de índice 'indice' no PDF convertido."""
+    return "%02X%02X%02X" % (_MARCADOR_VERMELHO, _MARCADOR_VERDE, _MARCADOR_PRIMEIRO_AZUL + indice)
+
+def _indice_da_cor(cor):
+    """Índice do placeholder pintado com a cor de preenchimento 'cor' (componentes 0..1), ou None."""
+    if cor is None or len(cor) != 3:
+        return None
+    vermelho, verde, azul = (round(componente * 255) for componente in cor)
+    if (vermelho, verde) != (_MARCADOR_VERMELHO, _MARCADOR_VERDE) or azul < _MARCADOR_PRIMEIRO_AZUL:
+        return None
+    return azul - _MARCADOR_PRIMEIRO_AZUL
+
+
+def marcar_placeholders(docx_bytes, placeholders):
+    """
+    Retorna uma cópia do .docx em que cada ocorrência de um placeholder fica em
+    'runs' próprias (com a formatação da 'run' original), pintadas com a cor
+    marcadora do placeholder (ver cor_marcadora).
+    """
+    if not placeholders:
+        return docx_bytes
+    from lxml import etree
+    from renderizador_ooxml import PARTES_DE_TEXTO, W_NS, W_T, W_VAL, XML_SPACE, paragrafos_com_texto
+
+    w_r = f"{{{W_NS}}}r"
+    w_rpr = f"{{{W_NS}}}rPr"
+    w_color = f"{{{W_NS}}}color"
+    # Filhos de <w:rPr> que vêm depois de <w:color>, na ordem do esquema
+    depois_da_cor = {f"{{{W_NS}}}{nome}" for nome in (
+        "spacing", "w", "kern", "position", "sz", "szCs", "highlight", "u", "effect", "bdr", "shd",
+        "fitText", "vertAlign", "rtl", "cs", "em", "lang", "eastAsianLayout", "specVanish", "oMath",
+        "rPrChange")}
+    regex = re.compile("|".join(re.escape(p) for p in placeholders))
+    cores = {placeholder: cor_marcadora(indice) for indice, placeholder in enumerate(placeholders)}
+
+    def nova_run(run, filhos, cor=None):
+        nova = etree.Element(w_r, attrib=dict(run.attrib))
+        propriedades = run.find(w_rpr)
+        if propriedades is not None or cor is not None:
+            propriedades = copy.deepcopy(propriedades) if propriedades is not None else etree.Element(w_rpr)
+            nova.append(propriedades)
+        if cor is not None:
+            for anterior in propriedades.findall(w_color):
+                propriedades.remove(anterior)
+            elemento = etree.Element(w_color)
+            elemento.set(W_VAL, cor)
+            posterior = next((filho for filho in propriedades if filho.tag in depois_da_cor), None)
+            if posterior is not None:
+                posterior.addprevious(elemento)
+            else:
+                propriedades.append(elemento)
+        for filho in filhos:
+            nova.append(filho)
+        return nova
+
+    def dividir_run(no_texto, segmentos):
+        run = no_texto.getparent()
+        if run is None or run.tag != w_r:
+            return
+        filhos = [filho for filho in run if filho.tag != w_rpr]
+        posicao = filhos.index(no_texto)
+        novas = [nova_run(run, filhos[:posicao])] if posicao > 0 else []
+        for cor, texto in segmentos:
+            elemento = etree.Element(W_T)
+            elemento.text = texto
+            elemento.set(XML_SPACE, "preserve")
+            novas.append(nova_run(run, [elemento], cor))
+        if posicao + 1 < len(filhos):
+            novas.append(nova_run(run, filhos[posicao + 1:]))
+        for nova in novas:
+            run.addprevious(nova)
+        run.getparent().remove(run)
+
+    def marcar_paragrafo(nos_texto):
+        textos = [t.text or "" for t in nos_texto]
+        texto_completo = "".join(textos)
+        cor_do_caractere = [None] * len(texto_completo)
+        for ocorrencia in regex.finditer(texto_completo):
+            cor_do_caractere[ocorrencia.start():ocorrencia.end()] = \
+                [cores[ocorrencia.group(0)]] * len(ocorrencia.group(0))
+        inicio = 0
+        for no, texto in zip(nos_texto, textos):
+            cores_do_no = cor_do_caractere[inicio:inicio + len(texto)]
+            inicio += len(texto)
+            if not any(cores_do_no):
+                continue
+            segmentos = [(cor, "".join(caractere for _, caractere in grupo))
+                         for cor, grupo in itertools.groupby(zip(cores_do_no, texto), key=lambda par: par[0])]
+            dividir_run(no, segmentos)
+
+    saida = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as origem, \
+            zipfile.ZipFile(saida, "w", zipfile.ZIP_DEFLATED) as destino:
+        for info in origem.infolist():
+            conteudo = origem.read(info)
+            if PARTES_DE_TEXTO.match(info.filename):
+                raiz = etree.fromstring(conteudo)
+                # Coleta antes de alterar: as 'runs' são trocadas durante a marcação
+                for _, nos_texto in list(paragrafos_com_texto(raiz)):
+                    marcar_paragrafo(nos_texto)
+                conteudo = etree.tostring(raiz, xml_declaration=True, encoding="UTF-8", standalone=True)
+            destino.writestr(info, conteudo)
+    return saida.getvalue()
+
+
+def fonte_padrao(nome, flags=0, negrito=False, italico=False):
+    """Fonte padrão do PDF (ex.: "Times-Bold") mais próxima da fonte 'nome' do modelo."""
+    minusculo = nome.lower()
+    if flags & _FLAG_MONOESPACADA or any(parte in minusculo for parte in _NOMES_MONOESPACADOS):
+        familia = "Courier"
+    elif "sans" not in minusculo and (flags & _FLAG_SERIFADA
+                                      or any(parte in minusculo for parte in _NOMES_SERIFADOS)):
+        familia = "Times"
+    else:
+        familia = "Helvetica"
+    negrito = negrito or bool(flags & _FLAG_NEGRITO) or any(parte in minusculo for parte in _NOMES_NEGRITO)
+    italico = italico or bool(flags & _FLAG_ITALICA) or any(parte in minusculo for parte in _NOMES_ITALICO)
+    return _FONTES_PADRAO[familia][negrito + 2 * italico]
+
+
+class _FontePdf:
+    """Larguras dos glifos de uma fonte do PDF convertido e a fonte padrão equivalente."""
+
+    def __init__(self, fonte):
+        fonte = fonte.get_object() if fonte is not None else {}
+        self.composta = fonte.get("/Subtype") == "/Type0"
+        self._larguras = {}
+        if self.composta:
+            descendente = fonte["/DescendantFonts"][0].get_object()
+            self._padrao = float(descendente.get("/DW", 1000))
+            self._ler_larguras_compostas(descendente.get("/W", []))
+            descritor = descendente.get("/FontDescriptor")
+        else:
+            primeiro = int(fonte.get("/FirstChar", 0))
+            for deslocamento, largura in enumerate(fonte.get("/Widths", [])):
+                self._larguras[primeiro + deslocamento] = float(largura)
+            descritor = fonte.get("/FontDescriptor")
+            self._padrao = None
+        descritor = descritor.get_object() if descritor is not None else {}
+        if self._padrao is None and "/MissingWidth" in descritor:
+            self._padrao = float(descritor["/MissingWidth"])
+
+        nome = str(fonte.get("/BaseFont", "")).lstrip("/").split("+")[-1] # Sem o prefixo de subconjunto
+        self.nome_padrao = fonte_padrao(nome, int(descritor.get("/Flags", 0)),
+                                        negrito=float(descritor.get("/FontWeight", 400)) >= 600,
+                                        italico=float(descritor.get("/ItalicAngle", 0)) != 0)
+
+    def _ler_larguras_compostas(self, larguras):
+        # /W: "c [w1 w2 ...]" (a partir de c) ou "c_inicial c_final w"
+        larguras = [item.get_object() for item in larguras]
+        i = 0
+        while i < len(larguras):
+            inicio = int(larguras[i])
+            if isinstance(larguras[i + 1], list):
+                for deslocamento, largura in enumerate(larguras[i + 1]):
+                    self._larguras[inicio + deslocamento] = float(largura)
+                i += 2
+            else:
+                for codigo in range(inicio, int(larguras[i + 1]) + 1):
+                    self._larguras[codigo] = float(larguras[i + 2])
+                i += 3
+
+    def codigos(self, dados):
+        if self.composta: # Identity-H: dois bytes por glifo
+            return [dados[i] << 8 | dados[i + 1] for i in range(0, len(dados) - 1, 2)]
+        return list(dados)
+
+    def largura(self, codigo):
+        """Largura do glifo 'codigo', em 1/1000 do tamanho da fonte."""
+        if codigo in self._larguras:
+            return self._larguras[codigo]
+        if self._padrao is not None:
+            return self._padrao
+        if self.nome_padrao.startswith("Courier"):
+            return _LARGURA_COURIER
+        return _LARGURAS_HELVETICA[codigo - 32] if 32 <= codigo <= 126 else _LARGURA_PADRAO
+
+
+def _multiplicar(m1, m2):
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (a1 * a2 + b1 * c2, a1 * b2 + b1 * d2, c1 * a2 + d1 * c2, c1 * b2 + d1 * d2,
+            e1 * a2 + f1 * c2 + e2, e1 * b2 + f1 * d2 + f2)
+
+def _bytes_da_string(texto):
+    return texto.get_original_bytes() if hasattr(texto, "get_original_bytes") else bytes(texto)
+
+def _numeros(operandos):
+    return tuple(float(operando) for operando in operandos if isinstance(operando, (int, float)))
+
+
+def _apagar_placeholders(pagina, escritor, numero_pagina, placeholders):
+    """
+    Troca, no conteúdo de 'pagina', o texto desenhado com as cores marcadoras
+    por um avanço em branco da mesma largura. Retorna os campos localizados:
+    dicionários {placeholder, pagina, x, y, tamanho, fonte}.
+    """
+    from pypdf.generic import ArrayObject, ContentStream, FloatObject
+
+    conteudo = pagina.get_contents()
+    if conteudo is None:
+        return []
+    conteudo = ContentStream(conteudo, escritor)
+    recursos = pagina.get("/Resources")
+    recursos_fontes = recursos.get_object().get("/Font", {}) if recursos is not None else {}
+    fontes = {}
+
+    estado = {"ctm": _IDENTIDADE, "cor": None, "fonte": None, "tamanho": 0.0,
+              "tc": 0.0, "tw": 0.0, "th": 1.0, "tl": 0.0, "elevacao": 0.0}
+    pilha = []
+    tm = tlm = _IDENTIDADE
+    campos = []
+    placeholder_anterior = None # Um placeholder pode ser desenhado em vários operadores seguidos
+    operacoes = []
+
+    def fonte_atual():
+        nome = estado["fonte"]
+        if nome not in fontes:
+            fontes[nome] = _FontePdf(recursos_fontes.get(nome))
+        return fontes[nome]
+
+    def placeholder_da_cor():
+        indice = _indice_da_cor(estado["cor"])
+        return placeholders[indice] if indice is not None and indice < len(placeholders) else None
+
+    def avanco(elementos):
+        fonte = fonte_atual()
+        tamanho, th = estado["tamanho"], estado["th"]
+        total = 0.0
+        for elemento in elementos:
+            if isinstance(elemento, (int, float)):
+                total -= float(elemento) / 1000.0 * tamanho * th
+                continue
+            for codigo in fonte.codigos(_bytes_da_string(elemento)):
+                espaco = estado["tw"] if codigo == 32 and not fonte.composta else 0.0
+                total += (fonte.largura(codigo) / 1000.0 * tamanho + estado["tc"] + espaco) * th
+        return total
+
+    def mostrar(elementos, operacao_original):
+        nonlocal tm, placeholder_anterior
+        placeholder = placeholder_da_cor()
+        deslocamento = avanco(elementos)
+        if placeholder is None:
+            placeholder_anterior = None
+            operacoes.append(operacao_original)
+        else:
+            if placeholder != placeholder_anterior:
+                matriz = _multiplicar(_multiplicar((1.0, 0.0, 0.0, 1.0, 0.0, estado["elevacao"]), tm),
+                                      estado["ctm"])
+                campos.append({
+                    "placeholder": placeholder,
+                    "pagina": numero_pagina,
+                    "x": round(matriz[4], 2),
+                    "y": round(matriz[5], 2),
+                    "tamanho": round(estado["tamanho"] * math.hypot(matriz[2], matriz[3]), 2),
+                    "fonte": fonte_atual().nome_padrao,
+                })
+            placeholder_anterior = placeholder
+            escala = estado["tamanho"] * estado["th"]
+            if escala:
+                operacoes.append(([ArrayObject([FloatObject(round(-deslocamento * 1000.0 / escala, 3))])],
+                                  b"TJ"))
+        tm = _multiplicar((1.0, 0.0, 0.0, 1.0, deslocamento, 0.0), tm)
+
+    def mover(tx, ty):
+        nonlocal tm, tlm
+        tlm = _multiplicar((1.0, 0.0, 0.0, 1.0, tx, ty), tlm)
+        tm = tlm
+
+    for operandos, operador in conteudo.operations:
+        if operador in (b"Tj", b"TJ", b"'", b'"'):
+            if operador == b'"':
+                estado["tw"], estado["tc"] = float(operandos[0]), float(operandos[1])
+            if operador in (b"'", b'"'):
+                mover(0.0, -estado["tl"])
+            elementos = list(operandos[0]) if operador == b"TJ" else [operandos[-1]]
+            if placeholder_da_cor() is not None and operador in (b"'", b'"'):
+                # O avanço em branco é um TJ: a mudança de linha e os espaçamentos viram operadores próprios
+                operacoes.append(([FloatObject(estado["tw"])], b"Tw"))
+                operacoes.append(([FloatObject(estado["tc"])], b"Tc"))
+                operacoes.append(([], b"T*"))
+            mostrar(elementos, (operandos, operador))
+            continue
+        operacoes.append((operandos, operador))
+        if operador == b"q":
+            pilha.append(dict(estado))
+        elif operador == b"Q" and pilha:
+            estado = pilha.pop()
+        elif operador == b"cm":
+            estado["ctm"] = _multiplicar(_numeros(operandos), estado["ctm"])
+        elif operador in (b"rg", b"g", b"k", b"sc", b"scn"):
+            estado["cor"] = _numeros(operandos)
+        elif operador == b"cs":
+            estado["cor"] = None
+        elif operador == b"BT":
+            tm = tlm = _IDENTIDADE
+            placeholder_anterior = None
+        elif operador == b"Tf":
+            estado["fonte"], estado["tamanho"] = operandos[0], float(operandos[1])
+        elif operador == b"Td":
+            mover(float(operandos[0]), float(operandos[1]))
+        elif operador == b"TD":
+            estado["tl"] = -float(operandos[1])
+            mover(float(operandos[0]), float(operandos[1]))
+        elif operador == b"Tm":
+            tm = tlm = _numeros(operandos)
+        elif operador == b"T*":
+            mover(0.0, -estado["tl"])
+        elif operador == b"Tc":
+            estado["tc"] = float(operandos[0])
+        elif operador == b"Tw":
+            estado["tw"] = float(operandos[0])
+        elif operador == b"Tz":
+            estado["th"] = float(operandos[0]) / 100.0
+        elif operador == b"TL":
+            estado["tl"] = float(operandos[0])
+        elif operador == b"Ts":
+            estado["elevacao"] = float(operandos[0])
+
+    if campos:
+        conteudo.operations = operacoes
+        pagina.replace_contents(conteudo)
+    return campos
+
+def separar_placeholders(pdf_bytes, placeholders):
+    """
+    Recebe o PDF de um modelo marcado com marcar_placeholders. Retorna
+    (bytes do PDF base sem o texto dos placeholders, campos localizados).
+    """
+    pypdf = _importar_pypdf()
+    leitor = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+    escritor = pypdf.PdfWriter()
+    campos = []
+    for numero_pagina, pagina in enumerate(leitor.pages):
+        pagina = escritor.add_page(pagina)
+        campos.extend(_apagar_placeholders(pagina, escritor, numero_pagina, placeholders))
+    saida = io.BytesIO()
+    escritor.write(saida)
+    return saida.getvalue(), campos
+
+def _sobrepor(pdf_bytes, conteudos_por_pagina, fontes):
+    """
+    Retorna um novo PDF com os content streams de 'conteudos_por_pagina'
+    ({pagina: bytes}) desenhados por cima das páginas de 'pdf_bytes'; as
+    fontes padrão 'fontes' ficam disponíveis como /F1, /F2...
+    """
+    pypdf = _importar_pypdf()
+    leitor = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+    escritor = pypdf.PdfWriter()
+    for numero_pagina, pagina in enumerate(leitor.pages):
+        conteudo = conteudos_por_pagina.get(numero_pagina)
+        if conteudo:
+            caixa = pagina.mediabox
+            sobreposicao = pypdf.PdfReader(io.BytesIO(
+                montar_pdf([(float(caixa.width), float(caixa.height), conteudo)], fontes)))
+            pagina.merge_page(sobreposicao.pages[0])
+        escritor.add_page(pagina)
+    saida = io.BytesIO()
+    escritor.write(saida)
+    return saida.getvalue()
+
+
+def descartar_base(pasta_cache, hash_modelo):
+    """Remove do cache o PDF base e as posições do modelo com 'hash_modelo'."""
+    for sufixo in (_SUFIXO_BASE, _SUFIXO_CAMPOS):
+        try:
+            os.remove(os.path.join(pasta_cache, hash_modelo + sufixo))
+        except FileNotFoundError:
+            pass
+
+
+class ModeloPdfCarimbado:
+    """
+    PDF base de um modelo DOCX, sem o texto dos placeholders, e as posições,
+    fontes e tamanhos onde os valores devem ser escritos. O PDF base e as
+    posições ficam em cache em 'pasta_cache', identificados pelo hash do
+    modelo: quando um novo modelo é importado, o hash muda e a base antiga é
+    descartada (ver descartar_base); bases de vários modelos podem coexistir.
+    """
+
+    def __init__(self, docx_bytes, placeholders, conversor, pasta_cache):
+        """'placeholders' deve conter apenas os marcadores presentes no modelo."""
+        self.hash = hashlib.sha256(docx_bytes).hexdigest()
+        self.placeholders = tuple(placeholders)
+        self.docx_bytes = docx_bytes
+        caminho_base = os.path.join(pasta_cache, self.hash + _SUFIXO_BASE)
+        caminho_campos = os.path.join(pasta_cache, self.hash + _SUFIXO_CAMPOS)
+
+        if os.path.exists(caminho_base) and os.path.exists(caminho_campos):
+            with open(caminho_base, "rb") as f:
+                self.pdf_base = f.read()
+            with open(caminho_campos, "r", encoding="utf-8") as f:
+                self.campos = json.load(f)
+        else:
+            self.pdf_base, self.campos = self._preparar(conversor)
+            os.makedirs(pasta_cache, exist_ok=True)
+            # A base é gravada antes das posições: as posições sempre descrevem uma base completa
+            saida_atomica.substituir(caminho_base, self.pdf_base)
+            saida_atomica.substituir(caminho_campos,
+                                     json.dumps(self.campos, ensure_ascii=False, indent=2).encode("utf-8"))
+        self.fontes = sorted({campo["fonte"] for campo in self.campos})
+
+    def _preparar(self, conversor):
+        """Converte o modelo com os placeholders marcados e os retira da página base."""
+        if _MARCADOR_PRIMEIRO_AZUL + len(self.placeholders) > 0xFF:
+            raise ErroCarimbo("Placeholders demais para o modo carimbo.")
+        _importar_pypdf()
+        pdf_marcado = conversor.converter_bytes(marcar_placeholders(self.docx_bytes, self.placeholders))
+        pdf_base, campos = separar_placeholders(pdf_marcado, self.placeholders)
+        faltando = set(self.placeholders) - {campo["placeholder"] for campo in campos}
+        if faltando:
+            raise ErroCarimbo("Placeholders não localizados no PDF do modelo: " + ", ".join(sorted(faltando)))
+        if any(campo["tamanho"] <= 0 for campo in campos):
+            raise ErroCarimbo("Tamanho de fonte desconhecido para um placeholder do modelo.")
+        return pdf_base, campos
+
+    def carimbar(self, substituicoes):
+        """
+        Retorna os bytes do PDF da declaração, escrevendo os valores de
+        'substituicoes' ({'{{PLACEHOLDER}}': valor}) sobre a página base.
+        """
+        conteudos = {}
+        for campo in self.campos:
+            valor = str(substituicoes.get(campo["placeholder"], ""))
+            if not valor:
+                continue
+            conteudos.setdefault(campo["pagina"], []).append(
+                b"BT /F%d %.2f Tf %.2f %.2f Td (" % (self.fontes.index(campo["fonte"]) + 1, campo["tamanho"],
+                                                   campo["x"], campo["y"])
+                + escapar_texto_pdf(valor) + b") Tj ET\n")
+        return _sobrepor(self.pdf_base, {pagina: b"".join(partes) for pagina, partes in conteudos.items()},
+                         self.fontes)
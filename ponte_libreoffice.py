@@ -0,0 +1,125 @@
+# Ethyïos
+# Sessão UNO com um único soffice headless que fica escutando em um socket
+# local e converte todos os documentos. Usada diretamente por
+# conversores.ConversorLibreOffice quando o módulo 'uno' está disponível no
+# Python da aplicação. Quando não está (o caso comum: 'uno' só existe no
+# Python que acompanha o LibreOffice ou no pacote python3-uno do sistema),
+# este arquivo é executado como ponte por esse outro Python, e recebe os
+# pedidos de conversão pela entrada padrão, um JSON por linha:
+#
+#   python3 ponte_libreoffice.py <soffice> <url do perfil> <tempo limite>
+#   -> "pronto"                                   (soffice iniciado e conectado)
+#   <- {"docx": "/tmp/a.docx", "pdf": "/tmp/a.pdf"}
+#   -> {"ok": true}   ou   {"ok": false, "erro": "..."}
+#
+# Só usa a biblioteca padrão e 'uno', para rodar em qualquer Python com UNO.
+import sys
+import json
+import time
+import socket
+import subprocess
+
+
+def _porta_livre():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class SessaoUno:
+    """Um processo soffice escutando em um socket local, reutilizado em todas as conversões."""
+
+    def __init__(self, argumentos_soffice, tempo_limite=60):
+        import uno # noqa: F401 (disponível apenas no Python com UNO)
+        self._uno = uno
+        self.argumentos_soffice = list(argumentos_soffice)
+        self.tempo_limite = tempo_limite
+        self._processo = None
+        self._desktop = None
+
+    @property
+    def ativa(self):
+        return self._processo is not None and self._processo.poll() is None
+
+    def iniciar(self):
+        porta = _porta_livre()
+        conexao = f"socket,host=127.0.0.1,port={porta};urp;StarOffice.ComponentContext"
+        self._processo = subprocess.Popen(self.argumentos_soffice + [f"--accept={conexao}"],
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        local = self._uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        limite = time.monotonic() + self.tempo_limite
+        while True:
+            try:
+                contexto = resolver.resolve(f"uno:{conexao}")
+                break
+            except Exception:
+                if self._processo.poll() is not None or time.monotonic() > limite:
+                    self.fechar()
+                    raise RuntimeError("Não foi possível iniciar o LibreOffice em modo servidor.")
+                time.sleep(0.2)
+        self._desktop = contexto.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", contexto)
+
+    def _propriedade(self, nome, valor):
+        from com.sun.star.beans import PropertyValue
+        propriedade = PropertyValue()
+        propriedade.Name = nome
+        propriedade.Value = valor
+        return propriedade
+
+    def converter(self, docx_path, pdf_path):
+        if not self.ativa:
+            self.iniciar() # Primeira conversão ou o soffice caiu: (re)inicia
+        url_docx = self._uno.systemPathToFileUrl(docx_path)
+        url_pdf = self._uno.systemPathToFileUrl(pdf_path)
+        documento = self._desktop.loadComponentFromURL(url_docx, "_blank", 0,
+                                                       (self._propriedade("Hidden", True),))
+        try:
+            documento.storeToURL(url_pdf, (self._propriedade("FilterName", "writer_pdf_Export"),))
+        finally:
+            documento.close(True)
+
+    def fechar(self):
+        if self._desktop is not None:
+            try:
+                self._desktop.terminate()
+            except Exception:
+                pass
+        if self._processo is not None and self._processo.poll() is None:
+            self._processo.terminate()
+            try:
+                self._processo.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._processo.kill()
+        self._processo = None
+        self._desktop = None
+
+
+def argumentos_soffice(soffice, perfil_url):
+    return [soffice, "--headless", "--invisible", "--nologo", "--norestore",
+            "--nodefault", "--nolockcheck", f"-env:UserInstallation={perfil_url}"]
+
+def main(argv=None):
+    soffice, perfil_url, tempo_limite = (argv if argv is not None else sys.argv[1:])[:3]
+    sessao = SessaoUno(argumentos_soffice(soffice, perfil_url), float(tempo_limite))
+    try:
+        sessao.iniciar()
+    except Exception as e:
+        print(f"erro: {e}", file=sys.stderr, flush=True)
+        return 1
+    print("pronto", flush=True)
+    try:
+        for linha in sys.stdin: # Termina quando o processo da aplicação fecha a entrada padrão
+            pedido = json.loads(linha)
+            try:
+                sessao.converter(pedido["docx"], pedido["pdf"])
+                resposta = {"ok": True}
+            except Exception as e:
+                resposta = {"ok": False, "erro": f"{type(e).__name__}: {e}"}
+            print(json.dumps(resposta), flush=True)
+    finally:
+        sessao.fechar()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+# Ethyïos
+# Registro de vários modelos nomeados (ex.: frequencia, matricula, transferencia).
+# Cada modelo fica em sua própria pasta, no formato de armazenamento_modelo
+# (modelo.docx + modelo.json). O modelo "padrao" continua na pasta oculta da
+# aplicação, onde o modelo único sempre esteve; os demais ficam em
+# <pasta oculta>/modelos/<nome>/. Cada modelo é carregado (e aquecido, via
+# 'ao_carregar') uma única vez e fica em memória; só é relido quando o mtime
+# ou o tamanho dos seus arquivos muda, e recompilado só se o hash dos bytes do
+# .docx também mudar (o hash do manifesto não basta: o .docx pode ter sido
+# trocado sem passar pela importação).
+import os
+import re
+import threading
+import armazenamento_modelo
+
+NOME_PADRAO = "padrao"
+MODELS_FOLDER_NAME = "modelos"
+_NOME_VALIDO = re.compile(r"^\w[\w-]{0,63}$")
+_ARQUIVOS_DO_MODELO = (armazenamento_modelo.MODEL_DOCX_BASENAME, armazenamento_modelo.MANIFEST_BASENAME,
+                       armazenamento_modelo.LEGACY_MODEL_BASENAME)
+
+
+def validar_nome(nome):
+    """Lança ValueError se 'nome' não puder ser usado como nome de modelo (e de pasta)."""
+    if not isinstance(nome, str) or not _NOME_VALIDO.match(nome):
+        raise ValueError(f"Nome de modelo inválido: '{nome}'. Use letras, números, '_' ou '-'.")
+    return nome
+
+
+def _assinatura_do_blob(assinatura):
+    """(mtime, tamanho) do modelo.docx dentro da assinatura da pasta, como em armazenamento_modelo.assinatura_blob."""
+    return next(((mtime, tamanho) for arquivo, mtime, tamanho in assinatura
+                 if arquivo == armazenamento_modelo.MODEL_DOCX_BASENAME), None)
+
+
+class EntradaModelo:
+    """
+    Um modelo do registro: bytes, manifesto, a assinatura (mtime/tamanho) dos
+    arquivos lidos e a do blob .docx (ver armazenamento_modelo.assinatura_blob).
+    """
+
+    def __init__(self, nome, modelo, assinatura):
+        self.nome = nome
+        self.docx_bytes = modelo.docx_bytes
+        self.manifesto = modelo.manifesto
+        self.assinatura = assinatura
+        self.assinatura_blob = modelo.assinatura
+
+    @property
+    def hash(self):
+        return self.manifesto["hash"]
+
+
+class RegistroModelos:
+    """
+    Modelos nomeados guardados em 'pasta_dados'. 'extrair_placeholders(docx_bytes)'
+    preenche o manifesto ao importar/migrar; 'ao_carregar(entrada)' é chamado
+    sempre que um modelo é (re)carregado, para compilá-lo antes do primeiro uso.
+    Pode ser usado por várias threads.
+    """
+
+    def __init__(self, pasta_dados, extrair_placeholders=None, ao_carregar=None):
+        self.pasta_dados = pasta_dados
+        self._extrair_placeholders = extrair_placeholders
+        self._ao_carregar = ao_carregar
+        self._entradas = {}
+        self._trava = threading.Lock()
+
+    def pasta_do_modelo(self, nome):
+        if validar_nome(nome) == NOME_PADRAO:
+            return self.pasta_dados
+        return os.path.join(self.pasta_dados, MODELS_FOLDER_NAME, nome)
+
+    def nomes(self):
+        """Nomes dos modelos existentes em disco, com o padrão primeiro."""
+        nomes = []
+        if self._assinatura(self.pasta_dados):
+            nomes.append(NOME_PADRAO)
+        pasta_modelos = os.path.join(self.pasta_dados, MODELS_FOLDER_NAME)
+        if os.path.isdir(pasta_modelos):
+            for nome in sorted(os.listdir(pasta_modelos)):
+                if nome != NOME_PADRAO and _NOME_VALIDO.match(nome) \
+                        and self._assinatura(os.path.join(pasta_modelos, nome)):
+                    nomes.append(nome)
+        return nomes
+
+    def _assinatura(self, pasta):
+        """(arquivo, mtime, tamanho) dos arquivos do modelo que existem em 'pasta'."""
+        assinatura = []
+        for arquivo in _ARQUIVOS_DO_MODELO:
+            try:
+                info = os.stat(os.path.join(pasta, arquivo))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            assinatura.append((arquivo, info.st_mtime_ns, info.st_size))
+        return tuple(assinatura)
+
+    def obter(self, nome=NOME_PADRAO):
+        """
+        Retorna a EntradaModelo de 'nome', relendo os arquivos apenas se mudaram.
+        Lança FileNotFoundError se o modelo não existe (e os erros de armazenamento_modelo.carregar_modelo).
+        """
+        pasta = self.pasta_do_modelo(nome)
+        assinatura = self._assinatura(pasta) # Antes de ler: uma mudança durante a leitura força nova leitura depois
+        with self._trava:
+            atual = self._entradas.get(nome)
+        if atual is not None and atual.assinatura == assinatura:
+            return atual
+        if not assinatura:
+            self.descartar(nome)
+            raise FileNotFoundError(os.path.join(pasta, armazenamento_modelo.MODEL_DOCX_BASENAME))
+
+        # Com o .docx inalterado, basta o manifesto; se ele mudou, o hash é recalculado a partir dos bytes
+        modelo = armazenamento_modelo.carregar_se_mudou(pasta, atual.hash if atual else None,
+                                                        self._extrair_placeholders,
+                                                        atual.assinatura_blob if atual else None)
+        if modelo is None:
+            # Arquivos tocados, mas os bytes do .docx têm o mesmo hash: mantém o modelo aquecido
+            atual.assinatura = assinatura
+            atual.assinatura_blob = _assinatura_do_blob(assinatura)
+            return atual
+        entrada = EntradaModelo(nome, modelo, assinatura)
+        if self._ao_carregar is not None:
+            self._ao_carregar(entrada)
+        with self._trava:
+            self._entradas[nome] = entrada
+        return entrada
+
+    def importar(self, nome, docx_bytes, nome_original, placeholders=()):
+        """Grava um novo conteúdo para o modelo 'nome' e o carrega. Retorna a EntradaModelo."""
+        armazenamento_modelo.salvar_modelo(self.pasta_do_modelo(nome), docx_bytes, nome_original, placeholders)
+        return self.obter(nome)
+
+    def descartar(self, nome):
+        """Tira o modelo da memória (os arquivos não são apagados)."""
+        with self._trava:
+            self._entradas.pop(nome, None)
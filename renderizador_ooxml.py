@@ -0,0 +1,410 @@
+# Ethyïos
+# Renderizador direto sobre o pacote OOXML (.docx), sem construir os objetos
+# do python-docx. Apenas as partes de texto com placeholders (documento,
+# cabeçalhos, rodapés, notas) são reescritas; todos os outros membros do zip
+# (imagens, estilos, temas...) são copiados byte a byte, sem descompactar nem
+# recompactar.
+import io
+import re
+import copy
+import itertools
+import struct
+import zlib
+import zipfile
+import hashlib
+from lxml import etree
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+WP_NS = "http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing"
+XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+W_P = f"{{{W_NS}}}p"
+W_T = f"{{{W_NS}}}t"
+W_BODY = f"{{{W_NS}}}body"
+W_PPR = f"{{{W_NS}}}pPr"
+W_SECTPR = f"{{{W_NS}}}sectPr"
+W_TYPE = f"{{{W_NS}}}type"
+W_PGNUMTYPE = f"{{{W_NS}}}pgNumType"
+W_VAL = f"{{{W_NS}}}val"
+W_ID = f"{{{W_NS}}}id"
+W_NAME = f"{{{W_NS}}}name"
+W_BOOKMARKS = (f"{{{W_NS}}}bookmarkStart", f"{{{W_NS}}}bookmarkEnd")
+R_ID = f"{{{R_NS}}}id"
+WP_DOCPR = f"{{{WP_NS}}}docPr"
+
+# Partes do pacote que podem conter texto visível da declaração
+PARTES_DE_TEXTO = re.compile(r"^word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml$")
+PARTE_DOCUMENTO = "word/document.xml"
+RELS_DOCUMENTO = "word/_rels/document.xml.rels"
+TIPOS_DE_CONTEUDO = "[Content_Types].xml"
+# Filhos de <w:sectPr> que vêm depois de <w:pgNumType>, na ordem do esquema
+_DEPOIS_DE_PGNUMTYPE = {f"{{{W_NS}}}{nome}" for nome in (
+    "cols", "formProt", "vAlign", "noEndnote", "titlePg", "textDirection", "bidi",
+    "rtlGutter", "docGrid", "printerSettings", "sectPrChange")}
+
+_ASSINATURA_LOCAL = 0x04034b50
+_ASSINATURA_CENTRAL = 0x02014b50
+_ASSINATURA_FIM = 0x06054b50
+_FLAG_DESCRITOR_DE_DADOS = 0x08
+_LIMITE_ZIP32 = 0xFFFFFFFF
+
+
+def _dos_data_hora(date_time):
+    ano, mes, dia, hora, minuto, segundo = date_time
+    dos_data = (ano - 1980) << 9 | mes << 5 | dia
+    dos_hora = hora << 11 | minuto << 5 | segundo // 2
+    return dos_data, dos_hora
+
+
+class _Membro:
+    """Um membro do zip pronto para ser copiado: cabeçalho local + dados já compactados."""
+
+    def __init__(self, nome_bytes, flags, metodo, date_time, crc, tamanho_compactado,
+                 tamanho, dados_compactados, atributos_externos=0, versao_criacao=20):
+        if tamanho_compactado > _LIMITE_ZIP32 or tamanho > _LIMITE_ZIP32:
+            raise ValueError("Membros ZIP64 não são suportados pelo renderizador OOXML.")
+        self.nome_bytes = nome_bytes
+        # O cabeçalho local é reescrito com tamanhos e CRC conhecidos: sem descritor de dados
+        self.flags = flags & ~_FLAG_DESCRITOR_DE_DADOS
+        self.metodo = metodo
+        self.dos_data, self.dos_hora = _dos_data_hora(date_time)
+        self.crc = crc
+        self.tamanho_compactado = tamanho_compactado
+        self.tamanho = tamanho
+        self.atributos_externos = atributos_externos
+        self.versao_criacao = versao_criacao
+        self.bloco_local = struct.pack(
+            "<IHHHHHIIIHH", _ASSINATURA_LOCAL, 20, self.flags, metodo,
+            self.dos_hora, self.dos_data, crc, tamanho_compactado, tamanho,
+            len(nome_bytes), 0) + nome_bytes + dados_compactados
+
+    def entrada_central(self, deslocamento):
+        return struct.pack(
+            "<IHHHHHHIIIHHHHHII", _ASSINATURA_CENTRAL, self.versao_criacao, 20, self.flags,
+            self.metodo, self.dos_hora, self.dos_data, self.crc, self.tamanho_compactado,
+            self.tamanho, len(self.nome_bytes), 0, 0, 0, 0, self.atributos_externos,
+            deslocamento) + self.nome_bytes
+
+    @classmethod
+    def copiar_de(cls, dados_zip, info):
+        """Extrai os bytes compactados de 'info' diretamente do zip de origem."""
+        cabecalho = dados_zip[info.header_offset:info.header_offset + 30]
+        assinatura, = struct.unpack("<I", cabecalho[:4])
+        if assinatura != _ASSINATURA_LOCAL:
+            raise zipfile.BadZipFile(f"Cabeçalho local inválido para '{info.filename}'.")
+        tamanho_nome, tamanho_extra = struct.unpack("<HH", cabecalho[26:30])
+        inicio = info.header_offset + 30 + tamanho_nome + tamanho_extra
+        dados = bytes(dados_zip[inicio:inicio + info.compress_size])
+        return cls(_nome_em_bytes(info), info.flag_bits, info.compress_type, info.date_time,
+                   info.CRC, info.compress_size, info.file_size, dados,
+                   info.external_attr, info.create_version)
+
+    @classmethod
+    def compactar(cls, info, conteudo):
+        """Cria um membro novo (deflate) para o conteúdo reescrito de 'info'."""
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        dados = compressor.compress(conteudo) + compressor.flush()
+        return cls(_nome_em_bytes(info), info.flag_bits, zipfile.ZIP_DEFLATED, info.date_time,
+                   zlib.crc32(conteudo), len(dados), len(conteudo), dados,
+                   info.external_attr, info.create_version)
+
+def _nome_em_bytes(info):
+    if info.flag_bits & 0x800:
+        return info.filename.encode("utf-8")
+    try:
+        return info.filename.encode("cp437")
+    except UnicodeEncodeError:
+        return info.filename.encode("utf-8")
+
+def montar_zip(membros):
+    """Concatena os membros e escreve o diretório central do zip."""
+    saida = io.BytesIO()
+    deslocamentos = []
+    for membro in membros:
+        deslocamentos.append(saida.tell())
+        saida.write(membro.bloco_local)
+    inicio_central = saida.tell()
+    for membro, deslocamento in zip(membros, deslocamentos):
+        saida.write(membro.entrada_central(deslocamento))
+    tamanho_central = saida.tell() - inicio_central
+    if len(membros) > 0xFFFF or inicio_central > _LIMITE_ZIP32:
+        raise ValueError("Pacotes ZIP64 não são suportados pelo renderizador OOXML.")
+    saida.write(struct.pack("<IHHHHIIH", _ASSINATURA_FIM, 0, 0, len(membros), len(membros),
+                            tamanho_central, inicio_central, 0))
+    return saida.getvalue()
+
+
+def substituir_em_paragrafo(nos_texto, regex, substituicoes):
+    """
+    Substitui os placeholders no texto concatenado dos nós <w:t> de um parágrafo,
+    mesmo quando um marcador está dividido entre várias 'runs'. O valor entra no
+    nó onde o marcador começa (mantendo a formatação daquela 'run') e o restante
+    do marcador é removido dos nós seguintes. Retorna True se algo mudou.
+    """
+    textos = [t.text or "" for t in nos_texto]
+    texto_completo = "".join(textos)
+    ocorrencias = list(regex.finditer(texto_completo))
+    if not ocorrencias:
+        return False
+
+    inicios = []
+    posicao = 0
+    for texto in textos:
+        inicios.append(posicao)
+        posicao += len(texto)
+
+    def no_da_posicao(pos, a_partir_de):
+        indice = a_partir_de
+        while indice + 1 < len(textos) and inicios[indice + 1] <= pos:
+            indice += 1
+        return indice
+
+    alterados = set()
+    primeiro_no = 0
+    # Calcula os pares (nó inicial, nó final) da esquerda para a direita, aplica da direita para a esquerda
+    trechos = []
+    for ocorrencia in ocorrencias:
+        i = no_da_posicao(ocorrencia.start(), primeiro_no)
+        j = no_da_posicao(ocorrencia.end() - 1, i)
+        trechos.append((ocorrencia, i, j))
+        primeiro_no = j
+    for ocorrencia, i, j in reversed(trechos):
+        valor = str(substituicoes.get(ocorrencia.group(0), ocorrencia.group(0)))
+        ini_rel = ocorrencia.start() - inicios[i]
+        fim_rel = ocorrencia.end() - inicios[j]
+        if i == j:
+            textos[i] = textos[i][:ini_rel] + valor + textos[i][fim_rel:]
+        else:
+            textos[i] = textos[i][:ini_rel] + valor
+            for k in range(i + 1, j):
+                textos[k] = ""
+            textos[j] = textos[j][fim_rel:]
+        alterados.update(range(i, j + 1))
+
+    for indice in alterados:
+        no = nos_texto[indice]
+        no.text = textos[indice]
+        no.set(XML_SPACE, "preserve")
+    return True
+
+def paragrafos_com_texto(raiz):
+    """
+    Percorre 'raiz' uma única vez e produz (parágrafo, nós <w:t> do parágrafo)
+    para cada <w:p>, inclusive os de tabelas aninhadas e caixas de texto. Os
+    <w:t> de um parágrafo aninhado pertencem só a ele, e ele é produzido antes
+    do parágrafo que o contém.
+    """
+    abertos = []
+    for evento, elemento in etree.iterwalk(raiz, events=("start", "end"), tag=(W_P, W_T)):
+        if elemento.tag == W_T:
+            if evento == "start" and abertos:
+                abertos[-1][1].append(elemento)
+        elif evento == "start":
+            abertos.append((elemento, []))
+        else:
+            yield abertos.pop()
+
+def nos_texto_do_paragrafo(paragrafo):
+    """<w:t> pertencentes a este parágrafo (exclui os de parágrafos aninhados, ex.: caixas de texto)."""
+    for elemento, nos_texto in paragrafos_com_texto(paragrafo):
+        if elemento is paragrafo:
+            return nos_texto
+    return []
+
+def substituir_na_arvore(raiz, regex, substituicoes):
+    """Substitui os placeholders em todos os parágrafos de 'raiz', em uma passada. Retorna True se algo mudou."""
+    alterou = False
+    for _, nos_texto in paragrafos_com_texto(raiz):
+        if substituir_em_paragrafo(nos_texto, regex, substituicoes):
+            alterou = True
+    return alterou
+
+def _serializar(raiz):
+    return etree.tostring(raiz, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+def _tipo_padrao(parte):
+    """Content type de um cabeçalho/rodapé sem <Override> próprio no [Content_Types].xml."""
+    tipo = "footer" if "footer" in parte else "header"
+    return f"application/vnd.openxmlformats-officedocument.wordprocessingml.{tipo}+xml"
+
+def _preparar_secao(secao):
+    """Cada seção começa em uma nova página, com a numeração de páginas reiniciada."""
+    tipo = secao.find(W_TYPE)
+    if tipo is not None:
+        tipo.set(W_VAL, "nextPage")
+    numeracao = secao.find(W_PGNUMTYPE)
+    if numeracao is None:
+        numeracao = etree.Element(W_PGNUMTYPE)
+        posterior = next((filho for filho in secao if filho.tag in _DEPOIS_DE_PGNUMTYPE), None)
+        if posterior is not None:
+            posterior.addprevious(numeracao)
+        else:
+            secao.append(numeracao)
+    numeracao.set(f"{{{W_NS}}}start", "1")
+
+
+class ModeloOoxml:
+    """
+    Modelo DOCX preparado para renderização direta. Os membros do zip que não
+    contêm placeholders ficam guardados já compactados e são reutilizados em
+    todas as renderizações.
+    """
+
+    def __init__(self, docx_bytes, placeholders):
+        self.docx_bytes = docx_bytes
+        self.hash = hashlib.sha256(docx_bytes).hexdigest()
+        self.placeholders = tuple(placeholders)
+        self._regex = re.compile("|".join(re.escape(p) for p in self.placeholders))
+
+        dados = memoryview(docx_bytes)
+        presentes = set()
+        self._itens = [] # (_Membro pronto, ou None) + info + árvore XML para as partes de texto
+        with zipfile.ZipFile(io.BytesIO(docx_bytes)) as zf:
+            for info in zf.infolist():
+                arvore = None
+                if PARTES_DE_TEXTO.match(info.filename):
+                    conteudo = zf.read(info)
+                    if b"{" in conteudo: # Sem chaves não há placeholder possível
+                        arvore = etree.fromstring(conteudo)
+                        encontrados = set()
+                        for _, nos_texto in paragrafos_com_texto(arvore):
+                            encontrados.update(self._regex.findall("".join(t.text or "" for t in nos_texto)))
+                        if not encontrados:
+                            arvore = None # Só chaves literais: a parte é copiada como está
+                        presentes |= encontrados
+                if arvore is not None:
+                    self._itens.append((None, info, arvore))
+                else:
+                    self._itens.append((_Membro.copiar_de(dados, info), info, None))
+
+        # Placeholders efetivamente usados pelo modelo, na ordem de 'placeholders'
+        self.placeholders_presentes = tuple(p for p in self.placeholders if p in presentes)
+
+    def substituir_texto(self, texto, substituicoes):
+        """Substitui todos os placeholders de 'texto' em uma única passada."""
+        return self._regex.sub(lambda m: str(substituicoes.get(m.group(0), m.group(0))), texto)
+
+    def renderizar_bytes(self, substituicoes):
+        """
+        Retorna os bytes de um novo .docx com os placeholders substituídos.
+        'substituicoes' é um dicionário como {'{{PLACEHOLDER}}': 'Valor Real'}.
+        """
+        membros = []
+        for membro, info, arvore in self._itens:
+            if membro is None:
+                raiz = copy.deepcopy(arvore)
+                substituir_na_arvore(raiz, self._regex, substituicoes)
+                membro = _Membro.compactar(info, _serializar(raiz))
+            membros.append(membro)
+        return montar_zip(membros)
+
+    def renderizar_varios_bytes(self, lista_substituicoes):
+        """
+        Retorna um único .docx com uma seção por item de 'lista_substituicoes':
+        o corpo do modelo é repetido, cada cópia começa em uma nova página e
+        reinicia a numeração de páginas. Cabeçalhos e rodapés com placeholders
+        são duplicados para cada seção. Placeholders em notas de rodapé/fim não
+        são suportados (ValueError).
+        """
+        lista_substituicoes = list(lista_substituicoes)
+        if not lista_substituicoes:
+            raise ValueError("Nenhum registro para renderizar.")
+        arvores = {info.filename: arvore for _, info, arvore in self._itens if arvore is not None}
+        notas = [nome for nome in arvores if nome.endswith(("footnotes.xml", "endnotes.xml"))]
+        if notas:
+            raise ValueError("Placeholders em notas de rodapé/fim não são suportados em um documento "
+                             "com várias declarações: " + ", ".join(notas))
+
+        with zipfile.ZipFile(io.BytesIO(self.docx_bytes)) as zf:
+            documento = arvores.get(PARTE_DOCUMENTO)
+            documento = copy.deepcopy(documento) if documento is not None \
+                else etree.fromstring(zf.read(PARTE_DOCUMENTO))
+            relacoes = etree.fromstring(zf.read(RELS_DOCUMENTO))
+            tipos = etree.fromstring(zf.read(TIPOS_DE_CONTEUDO))
+            nomes_no_zip = set(zf.namelist())
+            # Cabeçalhos/rodapés com placeholders: rId -> (parte, rels da parte ou None)
+            duplicar = {}
+            for relacao in relacoes:
+                parte = "word/" + relacao.get("Target", "").lstrip("/").replace("word/", "", 1)
+                if parte in arvores and parte != PARTE_DOCUMENTO:
+                    rels_parte = f"word/_rels/{parte[len('word/'):]}.rels"
+                    duplicar[relacao.get("Id")] = (parte, zf.read(rels_parte) if rels_parte in nomes_no_zip else None)
+
+        tipo_da_parte = {o.get("PartName"): o.get("ContentType") for o in tipos if o.get("PartName")}
+        corpo = documento.find(W_BODY)
+        filhos = list(corpo)
+        secao_final = filhos.pop() if filhos and filhos[-1].tag == W_SECTPR else etree.Element(W_SECTPR)
+        for filho in list(corpo):
+            corpo.remove(filho)
+
+        novos_membros = []
+        ids_desenho = itertools.count(1)
+        ids_marcador = itertools.count(1)
+        ultimo = len(lista_substituicoes) - 1
+        for indice, substituicoes in enumerate(lista_substituicoes):
+            copias = [copy.deepcopy(filho) for filho in filhos]
+            novos_ids = {}
+            for copia in copias:
+                substituir_na_arvore(copia, self._regex, substituicoes)
+                # Identificadores que o Word exige únicos no documento
+                for desenho in copia.iter(WP_DOCPR):
+                    desenho.set("id", str(next(ids_desenho)))
+                for marcador in copia.iter(*W_BOOKMARKS):
+                    antigo = marcador.get(W_ID)
+                    if antigo not in novos_ids:
+                        novos_ids[antigo] = str(next(ids_marcador))
+                    marcador.set(W_ID, novos_ids[antigo])
+                    if indice and marcador.get(W_NAME):
+                        marcador.set(W_NAME, f"{marcador.get(W_NAME)}_{indice}")
+
+            secao = copy.deepcopy(secao_final)
+            _preparar_secao(secao)
+            for referencia in secao:
+                rid = referencia.get(R_ID)
+                if rid not in duplicar:
+                    continue
+                parte, rels_parte = duplicar[rid]
+                base = parte[len("word/"):-len(".xml")]
+                nova_parte = f"word/{base}_decl{indice}.xml"
+                novo_rid = f"{rid}_decl{indice}"
+                raiz = copy.deepcopy(arvores[parte])
+                substituir_na_arvore(raiz, self._regex, substituicoes)
+                novos_membros.append(_Membro.compactar(zipfile.ZipInfo(nova_parte), _serializar(raiz)))
+                if rels_parte is not None:
+                    novos_membros.append(_Membro.compactar(
+                        zipfile.ZipInfo(f"word/_rels/{base}_decl{indice}.xml.rels"), rels_parte))
+                etree.SubElement(relacoes, f"{{{REL_NS}}}Relationship", Id=novo_rid,
+                                 Type=next(r.get("Type") for r in relacoes if r.get("Id") == rid),
+                                 Target=f"{base}_decl{indice}.xml")
+                etree.SubElement(tipos, f"{{{CT_NS}}}Override", PartName="/" + nova_parte,
+                                 ContentType=tipo_da_parte.get("/" + parte, _tipo_padrao(parte)))
+                referencia.set(R_ID, novo_rid)
+
+            if indice == ultimo:
+                corpo.extend(copias)
+                corpo.append(secao) # Seção final do documento
+                continue
+            # Quebra de seção: <w:sectPr> dentro do último parágrafo da cópia
+            if not copias or copias[-1].tag != W_P:
+                copias.append(etree.Element(W_P))
+            propriedades = copias[-1].find(W_PPR)
+            if propriedades is None:
+                propriedades = etree.Element(W_PPR)
+                copias[-1].insert(0, propriedades)
+            propriedades.append(secao)
+            corpo.extend(copias)
+
+        substituidos = {PARTE_DOCUMENTO: documento, RELS_DOCUMENTO: relacoes, TIPOS_DE_CONTEUDO: tipos}
+        membros = []
+        for membro, info, arvore in self._itens:
+            if info.filename in substituidos:
+                membro = _Membro.compactar(info, _serializar(substituidos[info.filename]))
+            elif membro is None:
+                # Parte original de um cabeçalho/rodapé duplicado: não é mais referenciada
+                raiz = copy.deepcopy(arvore)
+                substituir_na_arvore(raiz, self._regex, lista_substituicoes[0])
+                membro = _Membro.compactar(info, _serializar(raiz))
+            membros.append(membro)
+        return montar_zip(membros + novos_membros)
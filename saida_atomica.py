@@ -0,0 +1,65 @@
+# Ethyïos
+# Gravação dos arquivos de saída: o conteúdo é escrito em um arquivo
+# temporário na própria pasta de destino e só então publicado com o nome
+# final, de forma atômica. Nomes iguais (mesmo aluno e mesma data) recebem
+# um sufixo numérico em vez de se sobrescreverem, mesmo com várias gerações
+# simultâneas (threads, processos ou máquinas usando a mesma pasta).
+import os
+import uuid
+
+LIMITE_TENTATIVAS = 10000
+
+
+def _candidatos(nome_base, extensao):
+    yield f"{nome_base}{extensao}"
+    for numero in range(2, LIMITE_TENTATIVAS):
+        yield f"{nome_base}_{numero}{extensao}"
+
+def _gravar_temporario(pasta, dados):
+    temporario = os.path.join(pasta, f".tmp_{uuid.uuid4().hex}")
+    with open(temporario, "wb") as f:
+        f.write(dados)
+        f.flush()
+        os.fsync(f.fileno())
+    return temporario
+
+def substituir(caminho, dados):
+    """Grava 'dados' em 'caminho' de forma atômica, substituindo o arquivo se existir."""
+    pasta = os.path.dirname(caminho) or "."
+    temporario = _gravar_temporario(pasta, dados)
+    try:
+        os.replace(temporario, caminho)
+    except OSError:
+        os.remove(temporario)
+        raise
+
+def publicar(pasta, nome_base, extensao, dados):
+    """
+    Grava 'dados' em 'pasta' com o primeiro nome livre entre
+    nome_base+extensao, nome_base_2+extensao, ... e retorna o caminho final.
+    O arquivo final nunca é visto incompleto e nenhum arquivo existente é sobrescrito.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    temporario = _gravar_temporario(pasta, dados)
+    try:
+        for nome in _candidatos(nome_base, extensao):
+            destino = os.path.join(pasta, nome)
+            try:
+                # link() falha se o destino já existe: reserva e publica em um só passo
+                os.link(temporario, destino)
+                return destino
+            except FileExistsError:
+                continue
+            except OSError:
+                # Sistemas de arquivos sem hard links (ex.: alguns compartilhamentos de rede):
+                # reserva o nome com O_EXCL e substitui a reserva pelo conteúdo completo
+                try:
+                    os.close(os.open(destino, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                except FileExistsError:
+                    continue
+                os.replace(temporario, destino)
+                return destino
+        raise FileExistsError(f"Não há nome livre para '{nome_base}{extensao}' em '{pasta}'.")
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
@@ -0,0 +1,267 @@
+# Ethyïos
+# Modo servidor: expõe a geração de declarações em HTTP local (somente a
+# biblioteca padrão), para que outros sistemas da escola peçam declarações
+# sem redigitar os dados no formulário.
+#   POST /declaracoes  corpo JSON com os campos de PLACEHOLDERS (e "tipo", o
+#                      nome do modelo, opcional) -> o PDF na resposta
+#   GET  /saude        estado do serviço
+#   GET  /metricas     contadores, fila, cache de PDFs e p50/p95 de cada etapa
+# As declarações são geradas por uma FilaTrabalhos com poucos trabalhadores.
+# Quando trabalhos em execução + na fila atingem a capacidade, novas
+# requisições recebem 429 imediatamente (com Retry-After), em vez de esperar
+# sem limite. Com --spool (ou a variável DECLARACAO_SPOOL), a geração é feita
+# pelos trabalhadores de uma fila compartilhada (ver fila_spool.py).
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import unicodedata
+import urllib.parse
+import metricas_etapas
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from conversores import CONVERSORES, obter_conversor
+from fila_trabalhos import FilaTrabalhos, ERRO, CANCELADO
+from motor_declaracao import (
+    PLACEHOLDERS, configurar_log_etapas, gerar_pdf_bytes, nome_base_declaracao, obter_cache, obter_registro,
+    validar_registro,
+)
+from registro_modelos import NOME_PADRAO, validar_nome
+
+HOST_PADRAO = "127.0.0.1"
+PORTA_PADRAO = 8765
+TRABALHADORES_PADRAO = 1 # O conversor (Word/LibreOffice) processa um documento por vez
+TAMANHO_FILA_PADRAO = 8
+TEMPO_LIMITE_PADRAO = 120 # Segundos que uma requisição espera pelo seu PDF
+TAMANHO_MAXIMO_CORPO = 64 * 1024
+TAMANHO_BLOCO = 64 * 1024
+ESPERA_SUGERIDA = 2 # Segundos, no cabeçalho Retry-After das respostas 429
+
+
+class ServicoOcupado(Exception):
+    """A fila de geração está cheia."""
+
+
+class ServicoDeclaracoes:
+    """Fila de geração do servidor, controle de admissão e métricas."""
+
+    def __init__(self, trabalhadores=TRABALHADORES_PADRAO, tamanho_fila=TAMANHO_FILA_PADRAO,
+                 conversor=None, tempo_limite=TEMPO_LIMITE_PADRAO, pasta_spool=None):
+        self.conversor = conversor
+        self.pasta_spool = pasta_spool
+        self.tempo_limite = tempo_limite
+        self.capacidade = max(1, trabalhadores) + max(0, tamanho_fila)
+        # Uma vaga por trabalho admitido; liberada quando o trabalho termina (não quando o cliente desiste)
+        self._vagas = threading.BoundedSemaphore(self.capacidade)
+        self._trava = threading.Lock()
+        self.contadores = {"requisicoes": 0, "geradas": 0, "erros": 0, "rejeitadas": 0, "expiradas": 0}
+        self._tempo_total = 0.0
+        self.iniciado_em = time.time()
+        self.fila = FilaTrabalhos(self._executar, trabalhadores, self._ao_atualizar)
+
+    def _contar(self, contador):
+        with self._trava:
+            self.contadores[contador] += 1
+
+    def _executar(self, trabalho, ao_progredir):
+        registro, tipo, _, admitido_em = trabalho.dados
+        inicio = time.perf_counter()
+        metricas_etapas.registrar("espera_fila", inicio - admitido_em)
+        with metricas_etapas.medir("obter_modelo", tipo=tipo):
+            modelo = obter_registro().obter(tipo) # Relê o modelo apenas se os arquivos mudaram
+        if self.pasta_spool:
+            import fila_spool
+            caminho_pdf = fila_spool.gerar_via_spool(self.pasta_spool, modelo.docx_bytes, registro, ao_progredir,
+                                                     tempo_limite=self.tempo_limite)
+            with open(caminho_pdf, "rb") as f:
+                pdf_bytes = f.read()
+        else:
+            pdf_bytes = gerar_pdf_bytes(modelo.docx_bytes, registro, ao_progredir, conversor=self.conversor)
+        with self._trava:
+            self._tempo_total += time.perf_counter() - inicio
+        return pdf_bytes
+
+    def _ao_atualizar(self, trabalho):
+        if trabalho.finalizado:
+            self.fila.esquecer(trabalho.id)
+            self._vagas.release()
+            trabalho.dados[2].set()
+
+    def gerar(self, registro, tipo=NOME_PADRAO):
+        """
+        Gera a declaração e retorna os bytes do PDF. Lança ServicoOcupado se a
+        fila estiver cheia, TimeoutError se o PDF não ficar pronto em
+        'tempo_limite' segundos, ou o erro da geração.
+        """
+        self._contar("requisicoes")
+        if not self._vagas.acquire(blocking=False):
+            self._contar("rejeitadas")
+            raise ServicoOcupado()
+        pronto = threading.Event()
+        trabalho = self.fila.adicionar((registro, tipo, pronto, time.perf_counter()))
+        if not pronto.wait(self.tempo_limite):
+            self.fila.cancelar(trabalho.id) # Só tem efeito se ainda estiver na fila
+            self._contar("expiradas")
+            raise TimeoutError(f"A declaração não ficou pronta em {self.tempo_limite} segundos.")
+        if trabalho.estado == ERRO:
+            self._contar("erros")
+            raise trabalho.erro
+        if trabalho.estado == CANCELADO:
+            raise TimeoutError("A geração foi cancelada.")
+        self._contar("geradas")
+        return trabalho.resultado
+
+    def metricas(self):
+        with self._trava:
+            contadores = dict(self.contadores)
+            tempo_medio = self._tempo_total / contadores["geradas"] if contadores["geradas"] else None
+        contagem = self.fila.contagem()
+        return {
+            **contadores,
+            "em_execucao": contagem["executando"],
+            "na_fila": contagem["pendente"],
+            "capacidade": self.capacidade,
+            "tempo_medio_geracao_s": round(tempo_medio, 4) if tempo_medio is not None else None,
+            "ativo_ha_s": round(time.time() - self.iniciado_em, 1),
+            "cache_pdf": obter_cache().estatisticas(),
+            "etapas": metricas_etapas.percentis(),
+        }
+
+    def encerrar(self):
+        self.fila.encerrar()
+
+
+def cabecalho_anexo(nome_arquivo):
+    """
+    Valor do Content-Disposition para baixar 'nome_arquivo'. Os cabeçalhos HTTP
+    são Latin-1: o nome vai em ASCII em 'filename' (acentos removidos, para
+    clientes antigos) e completo, em UTF-8, em 'filename*' (RFC 6266).
+    """
+    sem_acentos = "".join(c for c in unicodedata.normalize("NFKD", nome_arquivo) if not unicodedata.combining(c))
+    # Letras sem equivalente ASCII (ex.: "Ł"), aspas e barras invertidas viram "_"
+    nome_ascii = "".join(c if " " <= c <= "~" and c not in '"\\' else "_" for c in sem_acentos)
+    return f"attachment; filename=\"{nome_ascii}\"; filename*=UTF-8''{urllib.parse.quote(nome_arquivo)}"
+
+
+class ManipuladorHttp(BaseHTTPRequestHandler):
+    """Traduz as requisições HTTP para o ServicoDeclaracoes do servidor (self.server.servico)."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "GeradorDeclaracao/1.0"
+
+    def _responder_json(self, status, dados, cabecalhos=()):
+        corpo = json.dumps(dados, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        for nome, valor in cabecalhos:
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _erro(self, status, mensagem, cabecalhos=()):
+        self._responder_json(status, {"erro": mensagem}, cabecalhos)
+
+    def do_GET(self):
+        if self.path == "/saude":
+            self._responder_json(200, {"estado": "ok", "modelos": obter_registro().nomes()})
+        elif self.path == "/metricas":
+            self._responder_json(200, self.server.servico.metricas())
+        else:
+            self._erro(404, "Recurso não encontrado.")
+
+    def do_POST(self):
+        if self.path != "/declaracoes":
+            self._erro(404, "Recurso não encontrado.")
+            return
+        tamanho = self.headers.get("Content-Length")
+        if tamanho is None or not tamanho.isdigit():
+            self._erro(411, "Content-Length é obrigatório.")
+            return
+        if int(tamanho) > TAMANHO_MAXIMO_CORPO:
+            self.close_connection = True # O corpo não é lido
+            self._erro(413, f"Corpo maior que {TAMANHO_MAXIMO_CORPO} bytes.")
+            return
+        try:
+            dados = json.loads(self.rfile.read(int(tamanho)).decode("utf-8"))
+            if not isinstance(dados, dict):
+                raise ValueError("o corpo deve ser um objeto JSON")
+            tipo = validar_nome(dados.get("tipo") or NOME_PADRAO)
+        except (ValueError, UnicodeDecodeError) as e:
+            self._erro(400, f"Requisição inválida: {e}")
+            return
+        registro = {campo: str(dados.get(campo) or "") for campo in PLACEHOLDERS}
+        faltando = validar_registro(registro)
+        if faltando: # Recusado antes de ocupar uma vaga na fila
+            self._erro(400, f"Campos obrigatórios ausentes: {', '.join(faltando)}")
+            return
+
+        try:
+            pdf_bytes = self.server.servico.gerar(registro, tipo)
+        except ServicoOcupado:
+            self._erro(429, "Fila de geração cheia; tente novamente em instantes.",
+                       [("Retry-After", str(ESPERA_SUGERIDA))])
+            return
+        except TimeoutError as e:
+            self._erro(504, str(e))
+            return
+        except FileNotFoundError:
+            self._erro(404, f"Modelo '{tipo}' não encontrado.")
+            return
+        except Exception as e:
+            self._erro(500, f"Erro ao gerar a declaração: {e}")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(pdf_bytes)))
+        self.send_header("Content-Disposition", cabecalho_anexo(f"{nome_base_declaracao(registro)}.pdf"))
+        self.end_headers()
+        visao = memoryview(pdf_bytes)
+        for inicio in range(0, len(visao), TAMANHO_BLOCO):
+            self.wfile.write(visao[inicio:inicio + TAMANHO_BLOCO])
+
+
+def criar_servidor(host=HOST_PADRAO, porta=PORTA_PADRAO, servico=None):
+    """Cria o servidor HTTP (porta 0 escolhe uma porta livre). Chame serve_forever() para atender."""
+    servidor = ThreadingHTTPServer((host, porta), ManipuladorHttp)
+    servidor.daemon_threads = True
+    servidor.servico = servico or ServicoDeclaracoes()
+    return servidor
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço HTTP local de geração de declarações em PDF.")
+    parser.add_argument("--host", default=HOST_PADRAO, help="Endereço de escuta (padrão: %(default)s).")
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO, help="Porta (padrão: %(default)s).")
+    parser.add_argument("--trabalhadores", type=int, default=TRABALHADORES_PADRAO,
+                        help="Declarações geradas ao mesmo tempo (padrão: %(default)s).")
+    parser.add_argument("--fila", type=int, default=TAMANHO_FILA_PADRAO,
+                        help="Requisições que podem aguardar na fila antes de receber 429 (padrão: %(default)s).")
+    parser.add_argument("--tempo-limite", type=float, default=TEMPO_LIMITE_PADRAO,
+                        help="Segundos de espera por um PDF antes de responder 504 (padrão: %(default)s).")
+    parser.add_argument("--conversor", choices=sorted(CONVERSORES), default=None,
+                        help="Backend de conversão DOCX->PDF ('falso' para testes sem Office).")
+    parser.add_argument("--spool", default=os.environ.get("DECLARACAO_SPOOL"),
+                        help="Pasta de uma fila compartilhada: as declarações são geradas pelos trabalhadores "
+                             "dela (padrão: variável DECLARACAO_SPOOL, se definida).")
+    args = parser.parse_args(argv)
+
+    configurar_log_etapas()
+    if not args.spool:
+        obter_conversor(args.conversor) # Inicializa o conversor antes da primeira requisição
+    servico = ServicoDeclaracoes(args.trabalhadores, args.fila, args.conversor, args.tempo_limite, args.spool)
+    servidor = criar_servidor(args.host, args.porta, servico)
+    host, porta = servidor.server_address[:2]
+    print(f"Servindo declarações em http://{host}:{porta}/ (Ctrl+C para encerrar)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        servico.encerrar()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
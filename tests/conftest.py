@@ -0,0 +1,27 @@
+# Ethyïos
+# Os módulos da aplicação ficam na raiz do repositório (sem pacote): os testes
+# os importam diretamente de lá.
+import os
+import sys
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+
+@pytest.fixture
+def pasta_aplicacao(tmp_path, monkeypatch):
+    """
+    Pasta da aplicação temporária (modelo, índice e cache do motor), com o
+    modelo padrão importado: os testes não tocam a pasta oculta do repositório.
+    """
+    import motor_declaracao
+    from registro_modelos import NOME_PADRAO
+    monkeypatch.setattr(motor_declaracao, "get_application_path", lambda: str(tmp_path))
+    for nome in ("_registro_modelos", "_cache_compartilhado", "_indice"):
+        monkeypatch.setattr(motor_declaracao, nome, None)
+    docx_bytes = motor_declaracao.carregar_docx_bytes(os.path.join(RAIZ, "declaracao_base_bytes.py"))
+    motor_declaracao.obter_registro().importar(NOME_PADRAO, docx_bytes, "modelo.docx",
+                                               motor_declaracao.extrair_placeholders(docx_bytes))
+    return tmp_path
@@ -0,0 +1,52 @@
+# Ethyïos
+import os
+import motor_declaracao
+from cache_pdf import VARIAVEL_LIMITE, CachePdf, chave_cache
+
+
+def envelhecer(cache, chave, segundos_atras):
+    caminho = os.path.join(cache.pasta, chave + ".pdf")
+    instante = os.stat(caminho).st_mtime - segundos_atras
+    os.utime(caminho, (instante, instante))
+
+
+def test_acertos_falhas_e_remocao_do_menos_usado(tmp_path):
+    cache = CachePdf(str(tmp_path), limite_bytes=250)
+    assert cache.obter("a") is None
+    cache.guardar("a", b"a" * 100)
+    cache.guardar("b", b"b" * 100)
+    envelhecer(cache, "a", 20)
+    envelhecer(cache, "b", 10)
+    assert cache.obter("a") == b"a" * 100 # Usado agora: "b" passa a ser o menos usado
+    cache.guardar("c", b"c" * 100) # 300 bytes > 250: remove "b"
+
+    assert cache.obter("b") is None
+    assert cache.obter("c") == b"c" * 100
+    estatisticas = cache.estatisticas()
+    assert (estatisticas["acertos"], estatisticas["falhas"], estatisticas["remocoes"]) == (2, 2, 1)
+    assert (estatisticas["entradas"], estatisticas["tamanho_bytes"]) == (2, 200)
+
+def test_limite_de_tamanho(tmp_path):
+    cache = CachePdf(str(tmp_path), limite_bytes=100)
+    cache.guardar("grande", b"x" * 101) # Maior que o cache inteiro: não é guardado
+    assert cache.obter("grande") is None
+    desativado = CachePdf(str(tmp_path / "desativado"), limite_bytes=0)
+    desativado.guardar("a", b"a")
+    assert desativado.obter("a") is None
+    assert not os.path.exists(desativado.pasta)
+
+def test_chave_depende_do_modelo_dos_valores_e_da_variante():
+    valores = {"{{NOME_FILHO}}": "Ana"}
+    chave = chave_cache("modelo1", valores, "carimbo")
+    assert chave == chave_cache("modelo1", dict(valores), "carimbo")
+    assert chave != chave_cache("modelo2", valores, "carimbo")
+    assert chave != chave_cache("modelo1", {"{{NOME_FILHO}}": "Bruno"}, "carimbo")
+    assert chave != chave_cache("modelo1", valores, "conversao:falso")
+
+def test_importar_um_modelo_nao_apaga_os_pdfs_dos_outros(pasta_aplicacao, monkeypatch):
+    monkeypatch.setenv(VARIAVEL_LIMITE, "10")
+    cache = motor_declaracao.obter_cache()
+    cache.guardar(chave_cache("outro_modelo", {"{{NOME_FILHO}}": "Ana"}), b"%PDF outro")
+    cache.guardar(chave_cache("substituido", {"{{NOME_FILHO}}": "Ana"}), b"%PDF antigo")
+    motor_declaracao.invalidar_cache("substituido")
+    assert cache.obter(chave_cache("outro_modelo", {"{{NOME_FILHO}}": "Ana"})) == b"%PDF outro"
@@ -0,0 +1,65 @@
+# Ethyïos
+import os
+import motor_declaracao
+from entrada_lote import LoteRetomavel
+
+LINHAS = 12
+INVALIDA = 5
+
+
+def escrever_entrada(pasta):
+    caminho = os.path.join(pasta, "registros.csv")
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write("nome_responsavel;nome_filho;serie;data;periodo\n")
+        for i in range(LINHAS):
+            responsavel = "" if i == INVALIDA else f"Resp {i}"
+            f.write(f"{responsavel};Aluno {i};5A;01/02/2025;Matutino\n")
+    return caminho
+
+def pdfs_gerados(pasta):
+    return sorted(nome for _, _, arquivos in os.walk(pasta) for nome in arquivos if nome.endswith(".pdf"))
+
+def lote(entrada, saida, docx_bytes):
+    return LoteRetomavel(entrada, docx_bytes, saida, processos=2, conversor="falso", usar_cache=False)
+
+
+def test_retomar_depois_de_interromper_nao_duplica_pdfs(pasta_aplicacao):
+    docx_bytes = motor_declaracao.carregar_docx_bytes()
+    entrada = escrever_entrada(str(pasta_aplicacao))
+    saida = str(pasta_aplicacao / "saida")
+
+    resultados = lote(entrada, saida, docx_bytes).resultados()
+    for _ in range(3): # Interrompe com registros ainda em execução no pool
+        next(resultados)
+    resultados.close()
+
+    retomado = lote(entrada, saida, docx_bytes)
+    list(retomado.resultados())
+    assert retomado.pulados > 0
+    esperados = [f"Declaracao_Aluno_{i}_01_02_2025.pdf" for i in range(LINHAS) if i != INVALIDA]
+    assert pdfs_gerados(saida) == sorted(esperados)
+
+    # Só a linha inválida falhou: o diário fica, e rodar de novo só a aponta outra vez
+    novamente = lote(entrada, saida, docx_bytes)
+    assert [(r.indice, r.sucesso) for r in novamente.resultados()] == [(INVALIDA, False)]
+    assert novamente.pulados == LINHAS - 1
+    assert novamente.erros_de_geracao == 0
+    assert pdfs_gerados(saida) == sorted(esperados)
+
+def test_linha_invalida_e_informada_de_novo_pela_linha_de_comando(pasta_aplicacao, capsys):
+    entrada = escrever_entrada(str(pasta_aplicacao))
+    argumentos = [entrada, "--saida", str(pasta_aplicacao / "saida"), "--conversor", "falso", "--processos", "2",
+                  "--sem-cache"]
+    assert motor_declaracao.main(argumentos) == 1
+    saida, erros = capsys.readouterr()
+    assert f"{LINHAS - 1} de {LINHAS} declarações geradas" in saida
+    assert "Execute de novo" not in saida # Não há erro de geração para tentar de novo
+    assert f"ERRO [{INVALIDA}]" in erros and "corrija" in erros
+
+    assert motor_declaracao.main(argumentos) == 1
+    saida, erros = capsys.readouterr()
+    assert "interrompido" not in saida
+    assert "Lote já executado" in saida
+    assert f"0 de 1 declarações geradas (0 do cache, {LINHAS - 1} já concluídas antes)" in saida
+    assert f"ERRO [{INVALIDA}] Campos obrigatórios ausentes: nome_responsavel" in erros
+    assert len(pdfs_gerados(str(pasta_aplicacao / "saida"))) == LINHAS - 1
@@ -0,0 +1,74 @@
+# Ethyïos
+import io
+import os
+import sys
+import types
+import zipfile
+import motor_declaracao
+from exportar_zip import ZipEmFluxo, exportar_lote_zip
+
+FIM_DO_DIRETORIO_CENTRAL = b"PK\x05\x06"
+
+
+class Pipe:
+    """Saída sem tell/seek, como um pipe: o zipfile grava sem voltar atrás."""
+
+    def __init__(self):
+        self.dados = io.BytesIO()
+
+    def write(self, dados):
+        return self.dados.write(dados)
+
+    def flush(self):
+        pass
+
+
+def escrever_entrada(pasta):
+    caminho = os.path.join(pasta, "registros.csv")
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write("nome_responsavel;nome_filho;serie;data;periodo\n")
+        for responsavel, aluno in (("Resp 0", "Ana"), ("Resp 1", "Bruno"), ("", "Carla"), ("Resp 3", "Ana")):
+            f.write(f"{responsavel};{aluno};5A;01/02/2025;Matutino\n")
+    return caminho
+
+def exportar(pasta_aplicacao, destino):
+    entrada = escrever_entrada(str(pasta_aplicacao))
+    return exportar_lote_zip(entrada, motor_declaracao.carregar_docx_bytes(), destino, processos=2,
+                             conversor="falso", usar_cache=False)
+
+
+def test_zip_valido_com_os_pdfs_sem_compressao(pasta_aplicacao):
+    destino = str(pasta_aplicacao / "declaracoes.zip")
+    resultados = sorted(exportar(pasta_aplicacao, destino), key=lambda r: r.indice)
+    assert [r.sucesso for r in resultados] == [True, True, False, True]
+    with zipfile.ZipFile(destino) as arquivo_zip:
+        assert arquivo_zip.testzip() is None
+        infos = arquivo_zip.infolist()
+        assert sorted(info.filename for info in infos) == [
+            "Declaracao_Ana_01_02_2025.pdf", "Declaracao_Ana_01_02_2025_2.pdf", "Declaracao_Bruno_01_02_2025.pdf"]
+        assert {info.compress_type for info in infos} == {zipfile.ZIP_STORED}
+        assert all(arquivo_zip.read(info).startswith(b"%PDF") for info in infos)
+
+def test_exportacao_interrompida_nao_deixa_arquivos(pasta_aplicacao):
+    destino = str(pasta_aplicacao / "declaracoes.zip")
+    resultados = exportar(pasta_aplicacao, destino)
+    next(resultados)
+    resultados.close()
+    assert not os.path.exists(destino)
+    assert not [nome for nome in os.listdir(pasta_aplicacao) if nome.startswith(".tmp_")]
+
+def test_saida_padrao_sem_tell(monkeypatch):
+    for concluido in (True, False):
+        pipe = Pipe()
+        monkeypatch.setattr(sys, "stdout", types.SimpleNamespace(buffer=pipe))
+        arquivo_zip = ZipEmFluxo("-")
+        arquivo_zip.adicionar("Declaracao_Ana", ".pdf", b"%PDF-1.4 teste")
+        arquivo_zip.fechar(concluido)
+        dados = pipe.dados.getvalue()
+        if concluido:
+            with zipfile.ZipFile(io.BytesIO(dados)) as lido:
+                assert lido.read("Declaracao_Ana.pdf") == b"%PDF-1.4 teste"
+                assert lido.getinfo("Declaracao_Ana.pdf").compress_type == zipfile.ZIP_STORED
+        else:
+            # Interrompido: o conteúdo já enviado fica, mas sem o diretório central
+            assert dados and FIM_DO_DIRETORIO_CENTRAL not in dados
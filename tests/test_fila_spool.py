@@ -0,0 +1,131 @@
+# Ethyïos
+import os
+import sys
+import time
+import subprocess
+import pytest
+import armazenamento_modelo
+import fila_spool
+import motor_declaracao
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONCESSAO = 1.0
+TRABALHADOR = (
+    "import sys, time, fila_spool, motor_declaracao\n"
+    "motor_declaracao.get_application_path = lambda: sys.argv[2]\n"
+    "if sys.argv[3] == 'travado':\n"
+    "    fila_spool.gerar_pdf_bytes = lambda *args, **kwargs: time.sleep(3600)\n"
+    "fila_spool.trabalhar(sys.argv[1], conversor='falso', tempo_concessao=float(sys.argv[4]), intervalo=0.1)\n")
+
+
+def iniciar_trabalhador(pasta_spool, pasta_aplicacao, comportamento):
+    ambiente = {**os.environ, "DECLARACAO_CACHE_MB": "0"}
+    return subprocess.Popen([sys.executable, "-c", TRABALHADOR, pasta_spool, pasta_aplicacao, comportamento,
+                             str(CONCESSAO)], cwd=RAIZ, env=ambiente)
+
+def em_andamento(pasta_spool):
+    return os.listdir(os.path.join(pasta_spool, fila_spool.EM_ANDAMENTO))
+
+def esperar(condicao, tempo_limite=30):
+    limite = time.monotonic() + tempo_limite
+    while not condicao():
+        assert time.monotonic() < limite
+        time.sleep(0.05)
+
+def registro():
+    return {"nome_responsavel": "Maria Souza", "nome_filho": "Ana", "serie": "5º Ano",
+            "data": "10/02/2025", "periodo": "Matutino"}
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink") or sys.platform == "win32", reason="requer links simbólicos")
+def test_trabalho_de_trabalhador_morto_e_retomado_por_outro(tmp_path):
+    pasta_spool = str(tmp_path / "spool")
+    montagem = str(tmp_path / "montagem") # O mesmo spool visto por outro caminho, como em outra máquina
+    fila = fila_spool.FilaSpool(pasta_spool, tempo_concessao=CONCESSAO)
+    os.symlink(pasta_spool, montagem)
+    docx_bytes = motor_declaracao.carregar_docx_bytes(os.path.join(RAIZ, "declaracao_base_bytes.py"))
+    id_trabalho = fila_spool.FilaSpool(montagem).enviar(registro(), docx_bytes)
+
+    travado = iniciar_trabalhador(pasta_spool, str(tmp_path / "app1"), "travado")
+    outro = None
+    try:
+        esperar(lambda: em_andamento(pasta_spool))
+        [reivindicado] = em_andamento(pasta_spool)
+        assert f"_{travado.pid}_" in reivindicado
+        # Enquanto o primeiro renova a concessão, o segundo não toma o trabalho
+        outro = iniciar_trabalhador(pasta_spool, str(tmp_path / "app2"), "normal")
+        time.sleep(3 * CONCESSAO)
+        assert em_andamento(pasta_spool) == [reivindicado]
+
+        travado.kill() # Morre sem liberar o trabalho: a concessão expira e o outro o retoma
+        travado.wait(timeout=30)
+        estado, dados = None, None
+
+        def concluido():
+            nonlocal estado, dados
+            estado, dados = fila.estado(id_trabalho)
+            return estado == "concluido"
+
+        esperar(concluido)
+        assert dados["tentativas"] == 1
+        assert f"_{outro.pid}_" in dados["trabalhador"]
+        caminho_pdf = fila_spool.FilaSpool(montagem).aguardar(id_trabalho, tempo_limite=5)
+        assert caminho_pdf.startswith(os.path.join(montagem, fila_spool.SAIDA) + os.sep)
+        with open(caminho_pdf, "rb") as f:
+            assert f.read(5) == b"%PDF-"
+    finally:
+        for processo in (travado, outro):
+            if processo is not None and processo.poll() is None:
+                processo.kill()
+                processo.wait(timeout=30)
+
+def test_sem_trabalhadores_o_pedido_expira_e_sai_da_fila(tmp_path):
+    pasta_spool = str(tmp_path / "spool")
+    docx_bytes = motor_declaracao.carregar_docx_bytes(os.path.join(RAIZ, "declaracao_base_bytes.py"))
+    with pytest.raises(TimeoutError):
+        fila_spool.gerar_via_spool(pasta_spool, docx_bytes, registro(), tempo_limite=0.5)
+    assert fila_spool.FilaSpool(pasta_spool).contagem()[fila_spool.PENDENTES] == 0
+
+def pdfs_gerados(pasta):
+    return sorted(nome for _, _, arquivos in os.walk(pasta) for nome in arquivos if nome.endswith(".pdf"))
+
+def test_concessao_expirada_durante_a_geracao_nao_publica_nem_indexa(pasta_aplicacao, monkeypatch):
+    pasta_spool = str(pasta_aplicacao / "spool")
+    saida = str(pasta_aplicacao / "saida")
+    fila = fila_spool.FilaSpool(pasta_spool)
+    docx_bytes = motor_declaracao.carregar_docx_bytes()
+    id_trabalho = fila.enviar(registro(), docx_bytes)
+    trabalho = fila.reivindicar("lento")
+    gerar_pdf_bytes = fila_spool.gerar_pdf_bytes
+
+    def gerar_e_perder_a_concessao(*args, **kwargs):
+        # O trabalhador fica parado além da concessão: outro devolve o trabalho à fila
+        antigo = time.time() - 2 * fila.tempo_concessao
+        os.utime(trabalho.caminho, (antigo, antigo))
+        assert fila_spool.FilaSpool(pasta_spool).recolocar_expirados() == 1
+        return gerar_pdf_bytes(*args, **kwargs)
+
+    monkeypatch.setattr(fila_spool, "gerar_pdf_bytes", gerar_e_perder_a_concessao)
+    assert fila_spool.processar(fila, trabalho, "lento", saida, "falso") is False
+    assert pdfs_gerados(saida) == []
+    assert motor_declaracao.obter_indice().contar() == 0
+
+    monkeypatch.setattr(fila_spool, "gerar_pdf_bytes", gerar_pdf_bytes)
+    novamente = fila.reivindicar("outro")
+    assert novamente.dados["tentativas"] == 1
+    assert fila_spool.processar(fila, novamente, "outro", saida, "falso") is True
+    assert pdfs_gerados(saida) == ["Declaracao_Ana_10_02_2025.pdf"]
+    assert motor_declaracao.obter_indice().contar() == 0 # Quem indexa é quem pediu
+    hash_modelo = armazenamento_modelo.calcular_hash(docx_bytes)
+    fila_spool.aguardar_e_indexar(fila, id_trabalho, registro(), hash_modelo, tempo_limite=5)
+    assert motor_declaracao.obter_indice().contar() == 1
+
+def test_concessao_perdida_ao_concluir_remove_o_pdf_publicado(pasta_aplicacao, monkeypatch):
+    saida = str(pasta_aplicacao / "saida")
+    fila = fila_spool.FilaSpool(str(pasta_aplicacao / "spool"))
+    fila.enviar(registro(), motor_declaracao.carregar_docx_bytes())
+    trabalho = fila.reivindicar("lento")
+    monkeypatch.setattr(fila, "concluir", lambda *args: False)
+    assert fila_spool.processar(fila, trabalho, "lento", saida, "falso") is False
+    assert pdfs_gerados(saida) == []
+    assert motor_declaracao.obter_indice().contar() == 0
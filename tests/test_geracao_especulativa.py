@@ -0,0 +1,92 @@
+# Ethyïos
+import threading
+import motor_declaracao
+from geracao_especulativa import EspeculacaoCancelada, GeradorEspeculativo
+
+TEMPO_LIMITE = 10
+
+
+class GeracaoControlada:
+    """Função de geração que só termina quando 'liberar' é sinalizado, passando por duas etapas."""
+
+    def __init__(self):
+        self.liberar = threading.Event()
+        self.comecou = threading.Event()
+        self.chamadas = []
+
+    def __call__(self, dados, ao_progredir):
+        self.chamadas.append(dados)
+        self.comecou.set()
+        assert self.liberar.wait(TEMPO_LIMITE)
+        ao_progredir(50, "convertendo") # Próxima etapa do pipeline: onde a cancelada para
+        return f"%PDF-{dados}".encode()
+
+
+def test_tomar_a_mesma_chave_aproveita_a_geracao_em_andamento():
+    gerar = GeracaoControlada()
+    especulador = GeradorEspeculativo(gerar)
+    especulacao = especulador.iniciar("ana", "Ana")
+    assert especulador.iniciar("ana", "Ana") is especulacao # Não gera duas vezes os mesmos valores
+    assert gerar.comecou.wait(TEMPO_LIMITE)
+
+    assert especulador.tomar("ana") is especulacao
+    assert not especulacao.terminou
+    gerar.liberar.set()
+    assert especulacao.aguardar(TEMPO_LIMITE) == b"%PDF-Ana"
+    assert gerar.chamadas == ["Ana"]
+    assert especulador.tomar("ana") is None # Já foi tomada
+
+def test_valores_novos_cancelam_a_especulacao_anterior():
+    gerar = GeracaoControlada()
+    especulador = GeradorEspeculativo(gerar)
+    antiga = especulador.iniciar("ana", "Ana")
+    assert gerar.comecou.wait(TEMPO_LIMITE)
+    nova = especulador.iniciar("bia", "Bia")
+    assert antiga.cancelada and not nova.cancelada
+    gerar.liberar.set()
+    assert antiga.aguardar(TEMPO_LIMITE) is None
+    assert isinstance(antiga.erro, EspeculacaoCancelada)
+    assert especulador.tomar("ana") is None # Outra chave: a especulação de 'bia' é cancelada também
+    assert nova.cancelada
+
+def test_especulacao_cancelada_enquanto_espera_a_geracao_normal_nao_gera():
+    gerar = GeracaoControlada()
+    gerar.liberar.set()
+    trava = threading.Lock()
+    especulador = GeradorEspeculativo(gerar, trava)
+    with trava: # Uma geração normal está usando o conversor
+        especulacao = especulador.iniciar("ana", "Ana")
+        especulador.cancelar()
+    assert especulacao.aguardar(TEMPO_LIMITE) is None
+    assert gerar.chamadas == []
+
+def test_cancelar_preserva_a_chave_informada():
+    gerar = GeracaoControlada()
+    gerar.liberar.set()
+    especulador = GeradorEspeculativo(gerar)
+    especulacao = especulador.iniciar("ana", "Ana")
+    especulador.cancelar(exceto_chave="ana")
+    assert especulador.tomar("ana") is especulacao
+    assert especulacao.aguardar(TEMPO_LIMITE) == b"%PDF-Ana"
+
+def test_especulacao_que_falhou_nao_e_tomada():
+    def falhar(dados, ao_progredir):
+        raise RuntimeError("conversor indisponível")
+
+    especulador = GeradorEspeculativo(falhar)
+    especulacao = especulador.iniciar("ana", "Ana")
+    assert especulacao.aguardar(TEMPO_LIMITE) is None
+    assert isinstance(especulacao.erro, RuntimeError)
+    assert especulador.tomar("ana") is None # A geração normal é feita de novo e mostra o erro
+
+def test_especulacao_com_o_motor_nao_publica_nem_indexa(pasta_aplicacao):
+    docx_bytes = motor_declaracao.carregar_docx_bytes()
+    registro = {"nome_responsavel": "Maria Souza", "nome_filho": "Ana", "serie": "5º Ano",
+                "data": "10/02/2025", "periodo": "Matutino"}
+    especulador = GeradorEspeculativo(lambda dados, ao_progredir: motor_declaracao.gerar_pdf_bytes(
+        docx_bytes, dados, ao_progredir, conversor="falso", cache=False))
+    especulador.iniciar("ana", registro)
+    especulacao = especulador.tomar("ana")
+    assert especulacao.aguardar(TEMPO_LIMITE).startswith(b"%PDF-")
+    assert sorted(p.name for p in pasta_aplicacao.iterdir()) == [motor_declaracao.HIDDEN_FOLDER_NAME]
+    assert motor_declaracao.obter_indice().contar() == 0
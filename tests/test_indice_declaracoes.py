@@ -0,0 +1,87 @@
+# Ethyïos
+import os
+import sys
+import threading
+import pytest
+import fila_spool
+import indice_declaracoes
+import motor_declaracao
+from indice_declaracoes import IndiceDeclaracoes
+
+
+def registro(nome_filho="Ana", nome_responsavel="Maria Souza", data="10/02/2025"):
+    return {"nome_responsavel": nome_responsavel, "nome_filho": nome_filho, "serie": "5º Ano",
+            "data": data, "periodo": "Matutino"}
+
+def nomes(declaracoes):
+    return [d["nome_filho"] for d in declaracoes]
+
+
+@pytest.fixture
+def indice(tmp_path):
+    indice = IndiceDeclaracoes(str(tmp_path / "indice.sqlite3"))
+    for nome_filho, nome_responsavel, data in (
+            ("João Pedro", "Márcia Lima", "05/01/2025"),
+            ("joão paulo", "Carlos Lima", "28/02/2025"),
+            ("Joana", "Ângela Souza", "01/03/2025"),
+            ("Pedro João", "Marcia Alves", "15/02/2025")):
+        indice.registrar(f"/saida/{nome_filho}.pdf", registro(nome_filho, nome_responsavel, data), "hash")
+    yield indice
+    indice.fechar()
+
+def test_busca_pelo_inicio_do_nome_sem_diferenciar_acentos_e_maiusculas(indice):
+    assert nomes(indice.buscar("JOAO  p")) == ["joão paulo", "João Pedro"]
+    assert nomes(indice.buscar("joão ped")) == ["João Pedro"]
+    assert nomes(indice.buscar("jo")) == ["Joana", "joão paulo", "João Pedro"] # Mais recentes primeiro
+    assert indice.buscar("pedro j") and not indice.buscar("pedro jr") and not indice.buscar("edro")
+    assert nomes(indice.buscar(nome_responsavel="marcia")) == ["Pedro João", "João Pedro"]
+    assert nomes(indice.buscar(nome_responsavel="angela")) == ["Joana"]
+    assert nomes(indice.buscar("jo", nome_responsavel="carlos")) == ["joão paulo"]
+
+def test_busca_por_data_com_prefixos_e_limite(indice):
+    assert nomes(indice.buscar(desde="2025-02", ate="2025-02")) == ["Pedro João", "joão paulo"]
+    assert nomes(indice.buscar(desde="2025-02-16")) == ["Joana", "joão paulo"]
+    assert nomes(indice.buscar(ate="2025-02-28")) == ["Pedro João", "joão paulo", "João Pedro"]
+    assert nomes(indice.buscar(limite=2)) == ["Pedro João", "Joana"]
+    assert indice.contar() == 4
+
+def test_reimprimir_gera_de_novo_um_pdf_apagado(pasta_aplicacao):
+    docx_bytes = motor_declaracao.carregar_docx_bytes()
+    saida = str(pasta_aplicacao / "saida")
+    caminho_pdf = motor_declaracao.gerar_documento_pdf(docx_bytes, registro(), saida, conversor="falso")
+    [declaracao] = motor_declaracao.obter_indice().buscar("ana")
+    assert declaracao["caminho_pdf"] == caminho_pdf
+    assert indice_declaracoes.reimprimir(declaracao["id"], "falso") == (caminho_pdf, False, None)
+
+    os.remove(caminho_pdf)
+    caminho, gerada_de_novo, aviso = indice_declaracoes.reimprimir(declaracao["id"], "falso")
+    assert gerada_de_novo and aviso is None
+    assert caminho.startswith(os.path.join(saida, "2025", "02") + os.sep)
+    with open(caminho, "rb") as f:
+        assert f.read(5) == b"%PDF-"
+    assert motor_declaracao.obter_indice().obter(declaracao["id"])["caminho_pdf"] == caminho
+    assert motor_declaracao.obter_indice().contar() == 1
+    assert indice_declaracoes.reimprimir(declaracao["id"], "falso") == (caminho, False, None)
+    with pytest.raises(KeyError):
+        indice_declaracoes.reimprimir(declaracao["id"] + 1)
+
+@pytest.mark.skipif(not hasattr(os, "symlink") or sys.platform == "win32", reason="requer links simbólicos")
+def test_declaracao_da_fila_e_indexada_por_quem_a_pediu(pasta_aplicacao):
+    pasta_spool = str(pasta_aplicacao / "spool")
+    montagem = str(pasta_aplicacao / "montagem") # O spool como o vê a máquina que pede a declaração
+    os.makedirs(pasta_spool)
+    os.symlink(pasta_spool, montagem)
+    parar = threading.Event()
+    trabalhador = threading.Thread(target=fila_spool.trabalhar, args=(pasta_spool,),
+                                   kwargs={"conversor": "falso", "parar": parar, "intervalo": 0.05})
+    trabalhador.start()
+    try:
+        caminho_pdf = fila_spool.gerar_via_spool(montagem, motor_declaracao.carregar_docx_bytes(), registro(),
+                                                 tempo_limite=30)
+    finally:
+        parar.set()
+        trabalhador.join()
+    assert caminho_pdf.startswith(os.path.join(montagem, fila_spool.SAIDA) + os.sep)
+    [declaracao] = motor_declaracao.obter_indice().buscar()
+    assert declaracao["caminho_pdf"] == caminho_pdf
+    assert indice_declaracoes.reimprimir(declaracao["id"]) == (caminho_pdf, False, None)
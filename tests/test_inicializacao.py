@@ -0,0 +1,59 @@
+# Ethyïos
+# Orçamento de inicialização (ORCAMENTO_INICIALIZACAO em gerador_declaracao).
+# Tudo é medido em um processo novo: os módulos que o pytest já importou não
+# podem mascarar uma importação pesada.
+import os
+import ast
+import sys
+import json
+import subprocess
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Dependências que só podem ser importadas na primeira geração (ou no aquecimento em segundo plano)
+MODULOS_PESADOS = ("docx", "lxml", "pypdf", "docx2pdf")
+# O que gerador_declaracao importa antes de criar a janela
+MODULOS_DA_JANELA = ("motor_declaracao", "indice_declaracoes", "geracao_especulativa",
+                     "registro_modelos", "conversores", "fila_trabalhos")
+
+
+def orcamento_inicializacao():
+    """Lê ORCAMENTO_INICIALIZACAO sem importar a GUI (que cria a janela ao ser importada)."""
+    with open(os.path.join(RAIZ, "gerador_declaracao.py"), encoding="utf-8") as f:
+        arvore = ast.parse(f.read())
+    for no in arvore.body:
+        if isinstance(no, ast.Assign) and any(getattr(alvo, "id", None) == "ORCAMENTO_INICIALIZACAO"
+                                              for alvo in no.targets):
+            return ast.literal_eval(no.value)
+    raise AssertionError("ORCAMENTO_INICIALIZACAO não encontrado em gerador_declaracao.py")
+
+def executar_python(codigo):
+    resultado = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, capture_output=True, text=True,
+                               timeout=120)
+    assert resultado.returncode == 0, resultado.stderr
+    return json.loads(resultado.stdout.strip().splitlines()[-1])
+
+
+def test_importar_o_motor_nao_carrega_dependencias_pesadas():
+    carregados = executar_python(
+        "import sys, json\n"
+        f"import {', '.join(MODULOS_DA_JANELA)}\n"
+        f"print(json.dumps(sorted(m for m in sys.modules if m.split('.')[0] in {MODULOS_PESADOS!r})))")
+    assert carregados == []
+
+def test_importar_o_motor_cabe_no_orcamento_da_janela():
+    tempo = executar_python(
+        "import time, json\n"
+        "inicio = time.perf_counter()\n"
+        f"import {', '.join(MODULOS_DA_JANELA)}\n"
+        "print(json.dumps(time.perf_counter() - inicio))")
+    assert tempo < orcamento_inicializacao()["janela"]
+
+@pytest.mark.skipif(sys.platform.startswith("linux") and not os.environ.get("DISPLAY"),
+                    reason="a GUI precisa de um display")
+def test_gui_cabe_no_orcamento_de_inicializacao():
+    resultado = subprocess.run([sys.executable, "gerador_declaracao.py", "--medir-inicializacao"], cwd=RAIZ,
+                               capture_output=True, text=True, timeout=120)
+    relatorio = json.loads(resultado.stdout.strip().splitlines()[-1])
+    assert relatorio["dentro_do_orcamento"], relatorio
+    assert resultado.returncode == 0
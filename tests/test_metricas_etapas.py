@@ -0,0 +1,40 @@
+# Ethyïos
+import os
+import sys
+import time
+import subprocess
+import metricas_etapas
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MEDICOES_POR_PROCESSO = 300
+
+
+def test_processos_simultaneos_nao_perdem_medicoes_na_rotacao(tmp_path):
+    codigo = (
+        "import sys, metricas_etapas\n"
+        "metricas_etapas.configurar(sys.argv[1], tamanho_maximo=2048, copias=1000)\n"
+        f"for i in range({MEDICOES_POR_PROCESSO}):\n"
+        "    metricas_etapas.registrar('converter', 0.001 * i)\n")
+    processos = [subprocess.Popen([sys.executable, "-c", codigo, str(tmp_path)], cwd=RAIZ) for _ in range(3)]
+    assert [processo.wait(timeout=60) for processo in processos] == [0, 0, 0]
+
+    assert len(metricas_etapas.ler_log(str(tmp_path))["converter"]) == 3 * MEDICOES_POR_PROCESSO
+    # Cada arquivo (e as suas cópias rotacionadas) pertence a um único processo
+    pids = {os.path.basename(arquivo).split(".")[2] for arquivo in metricas_etapas.arquivos_de_log(str(tmp_path))}
+    assert len(pids) == 3
+
+def test_logs_antigos_sao_apagados_ao_configurar(tmp_path):
+    antigo = tmp_path / "etapas.outra.123.jsonl"
+    antigo.write_text('{"etapa": "converter", "duracao_ms": 1}\n', encoding="utf-8")
+    ha_um_ano = time.time() - 365 * 86400
+    os.utime(antigo, (ha_um_ano, ha_um_ano))
+    recente = tmp_path / "etapas.outra.456.jsonl"
+    recente.write_text('{"etapa": "converter", "duracao_ms": 2}\n', encoding="utf-8")
+
+    caminho = metricas_etapas.configurar(str(tmp_path))
+    try:
+        assert os.path.basename(caminho) == metricas_etapas.nome_log_do_processo()
+        assert not antigo.exists()
+        assert metricas_etapas.ler_log(str(tmp_path)) == {"converter": [2.0]}
+    finally:
+        metricas_etapas.configurar(str(tmp_path / "descartar")) # Solta o arquivo do processo do pytest
@@ -0,0 +1,94 @@
+# Ethyïos
+import io
+import os
+import zipfile
+from lxml import etree
+import motor_declaracao
+from modelo_compilado import ModeloCompilado, abrir_documento, partes_de_texto
+from renderizador_ooxml import W_T
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CABECALHO = "<w:p><w:r><w:t>Aluno: {{NOME_</w:t></w:r><w:r><w:rPr><w:b/></w:rPr><w:t>FILHO}}</w:t></w:r></w:p>"
+RODAPE = ("<w:tbl><w:tr><w:tc><w:tbl><w:tr><w:tc><w:p><w:r><w:t>Série {{SERIE}}</w:t></w:r></w:p></w:tc></w:tr>"
+          "</w:tbl><w:p/></w:tc></w:tr></w:tbl><w:p/>")
+NOTA = '<w:footnote w:id="9"><w:p><w:r><w:t>Período: {{PERIODO}}</w:t></w:r></w:p></w:footnote>'
+
+
+def modelo_com_marcadores_espalhados():
+    """Modelo padrão com placeholders no cabeçalho (dividido em duas runs), em uma tabela aninhada do rodapé e em uma nota."""
+    alteracoes = {
+        "word/header1.xml": lambda xml: xml.replace("</w:hdr>", CABECALHO + "</w:hdr>"),
+        "word/footer1.xml": lambda xml: xml.replace("</w:ftr>", RODAPE + "</w:ftr>"),
+        "word/footnotes.xml": lambda xml: xml.replace("</w:footnotes>", NOTA + "</w:footnotes>"),
+    }
+    docx_bytes = motor_declaracao.carregar_docx_bytes(os.path.join(RAIZ, "declaracao_base_bytes.py"))
+    saida = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as origem, zipfile.ZipFile(saida, "w") as destino:
+        for info in origem.infolist():
+            conteudo = origem.read(info)
+            if info.filename in alteracoes:
+                conteudo = alteracoes[info.filename](conteudo.decode("utf-8")).encode("utf-8")
+            destino.writestr(info, conteudo)
+    return saida.getvalue()
+
+def texto_das_partes(docx_bytes):
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as z:
+        return {nome: "".join(t.text or "" for t in etree.fromstring(z.read(nome)).iter(W_T))
+                for nome in ("word/document.xml", "word/header1.xml", "word/footer1.xml", "word/footnotes.xml")}
+
+def substituicoes(nome_filho="Ana Clara"):
+    return motor_declaracao.montar_substituicoes({
+        "nome_responsavel": "Maria Souza", "nome_filho": nome_filho, "serie": "5º Ano",
+        "data": "10/02/2025", "periodo": "Matutino"})
+
+
+def test_substitui_em_cabecalhos_rodapes_tabelas_aninhadas_e_notas():
+    modelo = ModeloCompilado(modelo_com_marcadores_espalhados(), motor_declaracao.PLACEHOLDERS.values())
+    assert set(modelo.locais) >= {"word/header1.xml", "word/footer1.xml", "word/footnotes.xml"}
+    textos = texto_das_partes(modelo.renderizar_bytes(substituicoes()))
+    assert "Aluno: Ana Clara" in textos["word/header1.xml"]
+    assert "Série 5º Ano" in textos["word/footer1.xml"]
+    assert "Período: Matutino" in textos["word/footnotes.xml"]
+    assert not any("{{" in texto for texto in textos.values())
+
+def test_apply_replacements_grava_as_notas_mesmo_se_o_laco_parar_antes():
+    documento = abrir_documento(modelo_com_marcadores_espalhados())
+    motor_declaracao.apply_replacements(documento, substituicoes())
+    saida = io.BytesIO()
+    documento.save(saida)
+    textos = texto_das_partes(saida.getvalue())
+    assert "Aluno: Ana Clara" in textos["word/header1.xml"]
+    assert "Período: Matutino" in textos["word/footnotes.xml"]
+
+    # A alteração vale assim que é feita: não depende de o gerador chegar à próxima parte
+    documento = abrir_documento(modelo_com_marcadores_espalhados())
+    for nome, raiz in partes_de_texto(documento):
+        if nome == "word/footnotes.xml":
+            for no in raiz.iter(W_T):
+                no.text = (no.text or "").replace("{{PERIODO}}", "Vespertino")
+            break
+    saida = io.BytesIO()
+    documento.save(saida)
+    assert "Período: Vespertino" in texto_das_partes(saida.getvalue())["word/footnotes.xml"]
+
+def test_renderizacoes_nao_analisam_o_modelo_de_novo(monkeypatch):
+    import modelo_compilado
+    modelo = ModeloCompilado(modelo_com_marcadores_espalhados(), motor_declaracao.PLACEHOLDERS.values())
+
+    def analisar(*args, **kwargs):
+        raise AssertionError("O modelo foi analisado de novo ao renderizar.")
+
+    monkeypatch.setattr(modelo_compilado, "Document", analisar)
+    for nome in ("Ana Clara", "Bruno", "Ana Clara"): # O modelo volta ao original após cada renderização
+        textos = texto_das_partes(modelo.renderizar_bytes(substituicoes(nome)))
+        assert f"Aluno: {nome}" in textos["word/header1.xml"]
+        assert not any("{{" in texto for texto in textos.values())
+
+def test_renderizacoes_simultaneas_nao_se_misturam():
+    from concurrent.futures import ThreadPoolExecutor
+    modelo = ModeloCompilado(modelo_com_marcadores_espalhados(), motor_declaracao.PLACEHOLDERS.values())
+    nomes = [f"Aluno {numero}" for numero in range(16)]
+    with ThreadPoolExecutor(4) as executor:
+        documentos = list(executor.map(lambda nome: modelo.renderizar_bytes(substituicoes(nome)), nomes))
+    for nome, docx_bytes in zip(nomes, documentos):
+        assert texto_das_partes(docx_bytes)["word/header1.xml"].endswith(f"Aluno: {nome}")
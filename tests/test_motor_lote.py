@@ -0,0 +1,122 @@
+# Ethyïos
+import os
+import json
+import multiprocessing
+import concurrent.futures
+import pytest
+import armazenamento_modelo
+import motor_declaracao
+from renderizador_ooxml import ModeloOoxml
+
+LINHAS = 10
+
+
+def escrever_entrada(pasta, linhas=LINHAS):
+    caminho = os.path.join(pasta, "registros.csv")
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write("nome_responsavel,nome_filho,serie,data,periodo\n")
+        for i in range(linhas):
+            f.write(f"Resp {i},Aluno {i},5A,01/02/2025,Matutino\n")
+    return caminho
+
+def pdfs_gerados(pasta):
+    return sorted(nome for _, _, arquivos in os.walk(pasta) for nome in arquivos if nome.endswith(".pdf"))
+
+def registros(quantidade):
+    for i in range(quantidade):
+        yield i, {"nome_responsavel": f"Resp {i}", "nome_filho": f"Aluno {i}", "serie": "5A",
+                  "data": "01/02/2025", "periodo": "Matutino"}
+
+
+def test_lote_pela_linha_de_comando_gera_um_pdf_por_linha(pasta_aplicacao, capsys):
+    entrada = escrever_entrada(str(pasta_aplicacao))
+    saida = str(pasta_aplicacao / "saida")
+    relatorio = str(pasta_aplicacao / "relatorio.json")
+    assert motor_declaracao.main([entrada, "--saida", saida, "--conversor", "falso", "--processos", "2",
+                                  "--sem-cache", "--relatorio", relatorio]) == 0
+    assert f"{LINHAS} de {LINHAS} declarações geradas" in capsys.readouterr().out
+    assert pdfs_gerados(saida) == sorted(f"Declaracao_Aluno_{i}_01_02_2025.pdf" for i in range(LINHAS))
+    with open(relatorio, encoding="utf-8") as f:
+        itens = json.load(f)
+    assert [item["indice"] for item in itens] == list(range(LINHAS))
+    assert all(item["sucesso"] and os.path.isfile(item["caminho_pdf"]) for item in itens)
+    assert motor_declaracao.obter_indice().contar() == LINHAS
+
+def test_lote_le_a_entrada_aos_poucos(pasta_aplicacao):
+    docx_bytes = motor_declaracao.carregar_docx_bytes()
+    lidos = 0
+
+    def pares():
+        nonlocal lidos
+        for par in registros(20):
+            lidos += 1
+            yield par
+
+    entregues = 0
+    for resultado in motor_declaracao.gerar_lote_indexado_iter(
+            pares(), docx_bytes, str(pasta_aplicacao / "saida"), processos=2, conversor="falso",
+            usar_cache=False, max_em_andamento=3):
+        assert resultado.sucesso, resultado.erro
+        # Nunca mais que 'max_em_andamento' registros lidos e ainda não entregues
+        assert lidos - entregues <= 3
+        entregues += 1
+    assert entregues == lidos == 20
+
+def test_erro_de_geracao_volta_como_resultado_sem_derrubar_o_pool(pasta_aplicacao):
+    resultados = motor_declaracao.gerar_lote([registro for _, registro in registros(3)],
+                                             pasta_saida=str(pasta_aplicacao / "saida"), processos=2,
+                                             conversor="inexistente", usar_cache=False)
+    assert [r.indice for r in resultados] == [0, 1, 2]
+    assert all(not r.sucesso and r.erro for r in resultados)
+    assert pdfs_gerados(str(pasta_aplicacao / "saida")) == []
+
+def test_tarefas_levam_so_o_hash_do_modelo(pasta_aplicacao, monkeypatch):
+    docx_bytes = motor_declaracao.carregar_docx_bytes()
+    iniciais, tarefas = [], []
+
+    class PoolObservado(concurrent.futures.ProcessPoolExecutor):
+        def __init__(self, *args, initargs=(), **kwargs):
+            iniciais.append(initargs)
+            super().__init__(*args, initargs=initargs, **kwargs)
+
+        def submit(self, funcao, *args, **kwargs):
+            tarefas.append(args)
+            return super().submit(funcao, *args, **kwargs)
+
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", PoolObservado)
+    resultados = list(motor_declaracao.gerar_lote_indexado_iter(
+        registros(4), docx_bytes, str(pasta_aplicacao / "saida"), processos=2, conversor="falso", usar_cache=False))
+    assert all(r.sucesso for r in resultados)
+    assert len(iniciais) == 1 and iniciais[0][0] is docx_bytes # O modelo vai uma vez para cada processo
+    assert len(tarefas) == 4
+    for argumentos in tarefas:
+        assert armazenamento_modelo.calcular_hash(docx_bytes) in argumentos
+        assert not any(isinstance(argumento, bytes) for argumento in argumentos)
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="a contagem é herdada pelo fork")
+def test_cada_processo_compila_o_modelo_uma_unica_vez(pasta_aplicacao, monkeypatch):
+    compilacoes = str(pasta_aplicacao / "compilacoes.txt")
+
+    class ModeloContado(ModeloOoxml):
+        def __init__(self, *args, **kwargs):
+            with open(compilacoes, "a", encoding="utf-8") as f:
+                f.write(f"{os.getpid()}\n")
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(motor_declaracao, "_classe_renderizador", lambda renderizador: ModeloContado)
+    monkeypatch.setattr(motor_declaracao, "_modelos_compilados", {})
+    resultados = list(motor_declaracao.gerar_lote_indexado_iter(
+        registros(12), motor_declaracao.carregar_docx_bytes(), str(pasta_aplicacao / "saida"), processos=2,
+        conversor="falso", usar_cache=False))
+    assert all(r.sucesso for r in resultados)
+    with open(compilacoes, encoding="utf-8") as f:
+        processos = f.read().split()
+    assert 1 <= len(processos) <= 2
+    assert len(set(processos)) == len(processos) and str(os.getpid()) not in processos
+
+def test_modelo_invalido_e_informado_em_cada_registro(pasta_aplicacao):
+    resultados = motor_declaracao.gerar_lote([registro for _, registro in registros(3)], b"invalido",
+                                             str(pasta_aplicacao / "saida"), processos=2, conversor="falso",
+                                             usar_cache=False)
+    assert [r.indice for r in resultados] == [0, 1, 2]
+    assert all(r.erro.startswith("ErroModelo") for r in resultados)
@@ -0,0 +1,35 @@
+# Ethyïos
+import os
+import registro_modelos
+import armazenamento_modelo
+
+
+def test_docx_trocado_sem_reimportar_e_recarregado(tmp_path):
+    carregados = []
+    registro = registro_modelos.RegistroModelos(str(tmp_path), ao_carregar=carregados.append)
+    registro.importar("matricula", b"modelo antigo", "matricula.docx")
+    antigo = registro.obter("matricula")
+
+    # O manifesto continua com o hash antigo: só os bytes do .docx mudam
+    caminho_docx = os.path.join(registro.pasta_do_modelo("matricula"), armazenamento_modelo.MODEL_DOCX_BASENAME)
+    with open(caminho_docx, "wb") as f:
+        f.write(b"modelo novo, maior")
+
+    novo = registro.obter("matricula")
+    assert novo is not antigo
+    assert novo.docx_bytes == b"modelo novo, maior"
+    assert novo.hash == armazenamento_modelo.calcular_hash(b"modelo novo, maior")
+    assert len(carregados) == 2
+
+def test_arquivos_tocados_com_o_mesmo_conteudo_mantem_o_modelo_aquecido(tmp_path):
+    carregados = []
+    registro = registro_modelos.RegistroModelos(str(tmp_path), ao_carregar=carregados.append)
+    registro.importar("padrao", b"modelo", "padrao.docx")
+    atual = registro.obter()
+
+    caminho_docx = os.path.join(str(tmp_path), armazenamento_modelo.MODEL_DOCX_BASENAME)
+    info = os.stat(caminho_docx)
+    os.utime(caminho_docx, ns=(info.st_atime_ns, info.st_mtime_ns + 10**9))
+
+    assert registro.obter() is atual
+    assert len(carregados) == 1
@@ -0,0 +1,73 @@
+# Ethyïos
+import io
+import os
+import struct
+import zipfile
+import motor_declaracao
+import renderizador_ooxml
+from renderizador_ooxml import ModeloOoxml
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Compactado de um jeito que o renderizador nunca usaria: só sai igual se for copiado byte a byte
+INTOCADO = "word/styles.xml"
+
+
+def modelo_base():
+    docx_bytes = motor_declaracao.carregar_docx_bytes(os.path.join(RAIZ, "declaracao_base_bytes.py"))
+    saida = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as origem, zipfile.ZipFile(saida, "w") as destino:
+        for info in origem.infolist():
+            metodo = zipfile.ZIP_BZIP2 if info.filename == INTOCADO else info.compress_type
+            destino.writestr(info, origem.read(info), compress_type=metodo)
+    return saida.getvalue()
+
+def dados_compactados(docx_bytes):
+    """Nome -> (método, CRC, bytes compactados) de cada membro, lidos direto do zip."""
+    membros = {}
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as zf:
+        for info in zf.infolist():
+            cabecalho = docx_bytes[info.header_offset:info.header_offset + 30]
+            tamanho_nome, tamanho_extra = struct.unpack("<HH", cabecalho[26:30])
+            inicio = info.header_offset + 30 + tamanho_nome + tamanho_extra
+            with zf.open(info) as f: # Confere o CRC
+                f.read()
+            bruto = docx_bytes[inicio:inicio + info.compress_size]
+            membros[info.filename] = (info.compress_type, info.CRC, bruto)
+    return membros
+
+def substituicoes():
+    return motor_declaracao.montar_substituicoes({
+        "nome_responsavel": "Maria Souza", "nome_filho": "Ana", "serie": "5º Ano",
+        "data": "10/02/2025", "periodo": "Matutino"})
+
+
+def test_membros_sem_placeholders_sao_copiados_sem_recompactar(monkeypatch):
+    docx_bytes = modelo_base()
+    modelo = ModeloOoxml(docx_bytes, motor_declaracao.extrair_placeholders(docx_bytes))
+    compactados = []
+    compactar = renderizador_ooxml._Membro.compactar.__func__
+    monkeypatch.setattr(renderizador_ooxml._Membro, "compactar",
+                        classmethod(lambda cls, info, conteudo: compactados.append(info.filename)
+                                    or compactar(cls, info, conteudo)))
+
+    renderizado = modelo.renderizar_bytes(substituicoes())
+    originais, novos = dados_compactados(docx_bytes), dados_compactados(renderizado)
+    assert list(novos) == list(originais)
+    reescritos = {nome for nome, (_, crc, _) in novos.items() if crc != originais[nome][1]}
+    assert reescritos == set(compactados) == {renderizador_ooxml.PARTE_DOCUMENTO}
+    for nome in set(originais) - reescritos:
+        assert novos[nome] == originais[nome], nome
+    assert novos[INTOCADO][0] == zipfile.ZIP_BZIP2
+    assert novos["word/media/image1.png"][0] == zipfile.ZIP_STORED
+
+    with zipfile.ZipFile(io.BytesIO(renderizado)) as zf:
+        documento = zf.read(renderizador_ooxml.PARTE_DOCUMENTO).decode("utf-8")
+    assert "Maria Souza" in documento and "{{" not in documento
+
+def test_membros_copiados_sao_preparados_uma_unica_vez(monkeypatch):
+    docx_bytes = modelo_base()
+    modelo = ModeloOoxml(docx_bytes, motor_declaracao.extrair_placeholders(docx_bytes))
+    monkeypatch.setattr(renderizador_ooxml._Membro, "copiar_de",
+                        classmethod(lambda *args: (_ for _ in ()).throw(AssertionError("copiado de novo"))))
+    primeiro = modelo.renderizar_bytes(substituicoes())
+    assert modelo.renderizar_bytes(substituicoes()) == primeiro
@@ -0,0 +1,79 @@
+# Ethyïos
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pytest
+import motor_declaracao
+import saida_atomica
+
+SIMULTANEAS = 12
+
+
+def publicar_varias(pasta, executor):
+    # Todas começam juntas e disputam o mesmo nome
+    dados = [f"declaracao {i}".encode() * 1000 for i in range(SIMULTANEAS)]
+    caminhos = list(executor.map(saida_atomica.publicar, [pasta] * SIMULTANEAS, ["Declaracao_Ana"] * SIMULTANEAS,
+                                 [".pdf"] * SIMULTANEAS, dados))
+    return dados, caminhos
+
+def conferir(pasta, dados, caminhos):
+    esperados = ["Declaracao_Ana.pdf"] + [f"Declaracao_Ana_{n}.pdf" for n in range(2, SIMULTANEAS + 1)]
+    assert sorted(map(os.path.basename, caminhos)) == sorted(esperados)
+    assert sorted(os.listdir(pasta)) == sorted(esperados) # Nenhum temporário deixado para trás
+    for conteudo, caminho in zip(dados, caminhos):
+        with open(caminho, "rb") as f:
+            assert f.read() == conteudo
+
+
+def test_publicacoes_simultaneas_recebem_sufixos_sem_sobrescrever(tmp_path):
+    pasta = str(tmp_path / "saida")
+    with ThreadPoolExecutor(SIMULTANEAS) as executor:
+        conferir(pasta, *publicar_varias(pasta, executor))
+
+def test_publicacoes_de_varios_processos(tmp_path):
+    pasta = str(tmp_path / "saida")
+    with ProcessPoolExecutor(4) as executor:
+        conferir(pasta, *publicar_varias(pasta, executor))
+
+def test_sem_hard_links_reserva_o_nome_com_o_excl(tmp_path, monkeypatch):
+    def sem_link(origem, destino):
+        raise PermissionError("hard links não suportados")
+
+    monkeypatch.setattr(os, "link", sem_link)
+    pasta = str(tmp_path / "saida")
+    with ThreadPoolExecutor(SIMULTANEAS) as executor:
+        conferir(pasta, *publicar_varias(pasta, executor))
+
+def test_sem_nome_livre_falha_e_remove_o_temporario(tmp_path, monkeypatch):
+    monkeypatch.setattr(saida_atomica, "LIMITE_TENTATIVAS", 3)
+    pasta = str(tmp_path)
+    for _ in range(2):
+        saida_atomica.publicar(pasta, "Declaracao_Ana", ".pdf", b"%PDF-")
+    with pytest.raises(FileExistsError):
+        saida_atomica.publicar(pasta, "Declaracao_Ana", ".pdf", b"%PDF-")
+    assert sorted(os.listdir(pasta)) == ["Declaracao_Ana.pdf", "Declaracao_Ana_2.pdf"]
+
+def test_substituir_troca_o_arquivo_inteiro(tmp_path):
+    caminho = str(tmp_path / "indice.json")
+    saida_atomica.substituir(caminho, b"antigo" * 1000)
+    saida_atomica.substituir(caminho, b"novo")
+    with open(caminho, "rb") as f:
+        assert f.read() == b"novo"
+    assert os.listdir(tmp_path) == ["indice.json"]
+
+def test_geracao_so_deixa_o_pdf_na_pasta_de_saida(pasta_aplicacao):
+    docx_bytes = motor_declaracao.carregar_docx_bytes()
+    saida = str(pasta_aplicacao / "saida")
+    registro = {"nome_responsavel": "Maria Souza", "nome_filho": "Ana", "serie": "5º Ano",
+                "data": "10/02/2025", "periodo": "Matutino"}
+    caminhos = []
+    threads = [threading.Thread(target=lambda: caminhos.append(motor_declaracao.gerar_documento_pdf(
+        docx_bytes, registro, saida, conversor="falso", cache=False))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pasta_mes = os.path.join(saida, "2025", "02")
+    esperados = ["Declaracao_Ana_10_02_2025.pdf"] + [f"Declaracao_Ana_10_02_2025_{n}.pdf" for n in range(2, 5)]
+    assert sorted(os.listdir(pasta_mes)) == sorted(esperados) # Nenhum .docx intermediário
+    assert sorted(map(os.path.basename, caminhos)) == sorted(esperados)
@@ -0,0 +1,82 @@
+# Ethyïos
+import json
+import time
+import threading
+import http.client
+import urllib.parse
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from conversores import ConversorFalso
+from servidor_declaracao import ESPERA_SUGERIDA, ServicoDeclaracoes, criar_servidor
+
+
+@contextmanager
+def servidor_local(servico):
+    servidor = criar_servidor("127.0.0.1", 0, servico)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    try:
+        yield servidor.server_address[:2]
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+        servico.encerrar()
+
+def pedir(endereco, nome_filho):
+    """POST /declaracoes; retorna (status, cabeçalhos, corpo)."""
+    conexao = http.client.HTTPConnection(*endereco, timeout=30)
+    corpo = json.dumps({"nome_responsavel": "Maria Souza", "nome_filho": nome_filho, "serie": "5º Ano",
+                        "data": "10/02/2025", "periodo": "Matutino"}).encode("utf-8")
+    conexao.request("POST", "/declaracoes", corpo, {"Content-Type": "application/json"})
+    resposta = conexao.getresponse()
+    try:
+        return resposta.status, dict(resposta.getheaders()), resposta.read()
+    finally:
+        conexao.close()
+
+def metricas(endereco):
+    conexao = http.client.HTTPConnection(*endereco, timeout=30)
+    conexao.request("GET", "/metricas")
+    try:
+        return json.loads(conexao.getresponse().read())
+    finally:
+        conexao.close()
+
+
+def test_nome_fora_do_latin1_vai_no_content_disposition(pasta_aplicacao):
+    with servidor_local(ServicoDeclaracoes(conversor="falso", tempo_limite=30)) as endereco:
+        status, cabecalhos, pdf_bytes = pedir(endereco, "Nguyễn Łukasz")
+    assert status == 200
+    assert pdf_bytes.startswith(b"%PDF")
+    disposicao = cabecalhos["Content-Disposition"]
+    assert 'filename="Declaracao_Nguyen__ukasz_10_02_2025.pdf"' in disposicao
+    assert "filename*=UTF-8''" + urllib.parse.quote("Declaracao_Nguyễn_Łukasz_10_02_2025.pdf") in disposicao
+
+def test_fila_cheia_responde_429_e_as_metricas_contam(pasta_aplicacao):
+    # Capacidade 2: um trabalhador e uma vaga na fila
+    servico = ServicoDeclaracoes(trabalhadores=1, tamanho_fila=1, conversor=ConversorFalso(atraso=1.0),
+                                 tempo_limite=30)
+    with servidor_local(servico) as endereco, ThreadPoolExecutor(2) as executor:
+        admitidas = [executor.submit(pedir, endereco, nome) for nome in ("Ana", "Bruno")]
+        limite = time.monotonic() + 10
+        while servico.metricas()["em_execucao"] + servico.metricas()["na_fila"] < 2:
+            assert time.monotonic() < limite
+            time.sleep(0.02)
+
+        status, cabecalhos, _ = pedir(endereco, "Carla")
+        assert status == 429
+        assert cabecalhos["Retry-After"] == str(ESPERA_SUGERIDA)
+        assert [futuro.result()[0] for futuro in admitidas] == [200, 200]
+
+        dados = metricas(endereco)
+    assert dados["capacidade"] == 2
+    assert (dados["requisicoes"], dados["geradas"], dados["rejeitadas"], dados["erros"]) == (3, 2, 1, 0)
+    assert dados["tempo_medio_geracao_s"] >= 1.0
+    assert (dados["em_execucao"], dados["na_fila"]) == (0, 0)
+
+def test_declaracao_que_demora_responde_504(pasta_aplicacao):
+    servico = ServicoDeclaracoes(conversor=ConversorFalso(atraso=2.0), tempo_limite=0.3)
+    with servidor_local(servico) as endereco:
+        status, _, corpo = pedir(endereco, "Ana")
+        assert status == 504
+        assert "não ficou pronta" in json.loads(corpo)["erro"]
+        assert metricas(endereco)["expiradas"] == 1
@@ -0,0 +1,56 @@
+# Ethyïos
+import io
+import os
+import zipfile
+import motor_declaracao
+from declaracao_turma import gerar_pdf_turma
+from renderizador_ooxml import ModeloOoxml
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def modelo_padrao():
+    return motor_declaracao.carregar_docx_bytes(os.path.join(RAIZ, "declaracao_base_bytes.py"))
+
+def com_partes_alteradas(docx_bytes, alteracoes):
+    """Cópia do .docx com alteracoes[parte](xml) aplicada ao XML de cada parte indicada."""
+    saida = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as origem, zipfile.ZipFile(saida, "w") as destino:
+        for info in origem.infolist():
+            conteudo = origem.read(info)
+            if info.filename in alteracoes:
+                conteudo = alteracoes[info.filename](conteudo.decode("utf-8")).encode("utf-8")
+            destino.writestr(info, conteudo)
+    return saida.getvalue()
+
+def registro(nome_filho, data):
+    return {"nome_responsavel": "Maria Souza", "nome_filho": nome_filho, "serie": "5º Ano",
+            "data": data, "periodo": "Matutino"}
+
+
+def test_chaves_literais_em_notas_e_cabecalhos_nao_contam_como_placeholders():
+    docx = com_partes_alteradas(modelo_padrao(), {
+        "word/footnotes.xml": lambda xml: xml.replace(
+            "</w:footnotes>", '<w:footnote w:id="9"><w:p><w:r><w:t>Ver anexo {A}</w:t></w:r></w:p></w:footnote>'
+                              "</w:footnotes>"),
+        "word/header1.xml": lambda xml: xml.replace("</w:hdr>", "<w:p><w:r><w:t>{ }</w:t></w:r></w:p></w:hdr>"),
+    })
+    modelo = ModeloOoxml(docx, motor_declaracao.PLACEHOLDERS.values())
+    turma = modelo.renderizar_varios_bytes([motor_declaracao.montar_substituicoes(registro(nome, "10/02/2025"))
+                                            for nome in ("Ana", "Bruno")])
+    with zipfile.ZipFile(io.BytesIO(turma)) as zf:
+        nomes = zf.namelist()
+        assert b"{A}" in zf.read("word/footnotes.xml")
+    assert not any(nome.startswith("word/header1_decl") for nome in nomes)
+
+def test_pdfs_separados_vao_para_a_pasta_da_data_de_cada_aluno(tmp_path, monkeypatch):
+    monkeypatch.setattr(motor_declaracao, "get_application_path", lambda: str(tmp_path))
+    monkeypatch.setattr(motor_declaracao, "_indice", None)
+    pasta_saida = str(tmp_path / "saida")
+
+    resultado = gerar_pdf_turma([registro("Ana", "10/02/2025"), registro("Bruno", "05/03/2025")],
+                                modelo_padrao(), pasta_saida, conversor="falso", separar=True)
+
+    assert os.path.dirname(resultado.caminho_pdf) == os.path.join(pasta_saida, "2025", "02")
+    pastas = [os.path.dirname(entrada["caminho_pdf"]) for entrada in resultado.entradas]
+    assert pastas == [os.path.join(pasta_saida, "2025", "02"), os.path.join(pasta_saida, "2025", "03")]